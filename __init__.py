@@ -5,7 +5,7 @@ import importlib
 
 from bpy.utils import register_class, unregister_class
 
-from . import tools, ui
+from . import executor, tools, ui, watcher
 
 bl_info = {
     "name": "Blendgit",
@@ -22,6 +22,8 @@ bl_info = {
 modules = [
     tools,
     ui,
+    watcher,
+    executor,
 ]
 
 logging.basicConfig(level=logging.WARN)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""Measures what Blendgit costs Blender, without Blender
+
+Loads the add-on against stub_bpy.py, opens scene.blend of a repository
+made by synthetic_repo.py and measures:
+
+- How long each panel's draw() takes, and how many processes a redraw
+  spawns, counting the background jobs it starts until they are done
+- The time and processes taken by status(), git_log(), list_branches(),
+  LoadCommit and SaveCommit
+
+Results are printed as JSON, so runs can be compared across releases.
+Only the time spent in Python and git is measured; Blender's own drawing
+is not.
+
+Usage: blendgit_bench.py [--commits N] [--files N] [--branches N]
+    [--binary-files N] [--binary-size KIB] [--redraws N] [--runs N]
+    [--repo DIR] [--output FILE]
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import shlex
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+import stub_bpy
+from synthetic_repo import SCENE_EDIT, generate, has_lfs
+
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "blendgit"
+# How long to keep running timers after a redraw, so changes the watcher
+# reports are handled before the next one
+SETTLE_TIME = 0.2
+JOB_TIMEOUT = 120.0
+
+
+class SpawnCounter:
+    """Counts the processes started through subprocess, on any thread"""
+
+    def __init__(self):
+        self.count = 0
+        self.commands: Counter = Counter()
+        self._lock = threading.Lock()
+        self._init = subprocess.Popen.__init__
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.commands.clear()
+
+    def __enter__(self) -> "SpawnCounter":
+        counter = self
+
+        def init(popen, args, *rest, **kwargs):
+            with counter._lock:
+                counter.count += 1
+                counter.commands[command_name(args)] += 1
+            counter._init(popen, args, *rest, **kwargs)
+
+        subprocess.Popen.__init__ = init
+        return self
+
+    def __exit__(self, *_args):
+        subprocess.Popen.__init__ = self._init
+
+
+def command_name(args) -> str:
+    """Names a command line by its program, and the git command"""
+    words = shlex.split(args) if isinstance(args, str) else \
+        [str(arg) for arg in args]
+    if not words:
+        return ""
+    program = os.path.basename(words[0])
+    if program not in ("git", "git.exe"):
+        return program
+    options_with_values = {"-C", "-c", "--git-dir", "--work-tree"}
+    rest = iter(words[1:])
+    for word in rest:
+        if word in options_with_values:
+            next(rest, None)
+        elif not word.startswith("-"):
+            return f"git {word}"
+    return "git"
+
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    milliseconds = sorted(1000 * value for value in seconds)
+    return {
+        "runs": len(milliseconds),
+        "min_ms": round(milliseconds[0], 3),
+        "median_ms": round(statistics.median(milliseconds), 3),
+        "p95_ms": round(milliseconds[
+            min(len(milliseconds) - 1, int(0.95 * len(milliseconds)))], 3),
+        "max_ms": round(milliseconds[-1], 3),
+    }
+
+
+def load_addon():
+    """Imports and registers the add-on against the bpy stub"""
+    stub_bpy.install()
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE, os.path.join(ADDON_DIR, "__init__.py"),
+        submodule_search_locations=[ADDON_DIR])
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = addon
+    spec.loader.exec_module(addon)
+    addon.register()
+    stub_bpy.new_window_manager()
+    return addon
+
+
+def wait_for_jobs(addon, settle: float = 0.0):
+    """Runs timers until every background job delivered its result"""
+    if not stub_bpy.pump(lambda: not addon.executor.is_pending(),
+                         timeout=JOB_TIMEOUT):
+        raise TimeoutError("Background jobs did not finish")
+    if settle:
+        stub_bpy.pump(lambda: False, timeout=settle)
+        stub_bpy.pump(lambda: not addon.executor.is_pending(),
+                      timeout=JOB_TIMEOUT)
+
+
+def measure_draws(addon, counter: SpawnCounter, redraws: int) -> Dict:
+    """Draws every panel redraws times
+
+    The first redraw finds nothing cached, later ones are what Blender
+    pays while the sidebar is open.
+    """
+    panels = [cls for module in addon.ui.modules
+              for cls in getattr(module, "registry", [])
+              if issubclass(cls, stub_bpy.Panel)]
+    times: Dict[str, List[float]] = {cls.bl_idname: [] for cls in panels}
+    totals, spawns = [], []
+    commands: Counter = Counter()
+    for redraw in range(redraws + 1):
+        counter.reset()
+        total = 0.0
+        for cls in panels:
+            panel = cls()
+            start = time.perf_counter()
+            panel.draw(stub_bpy.context)
+            elapsed = time.perf_counter() - start
+            times[cls.bl_idname].append(elapsed)
+            total += elapsed
+        wait_for_jobs(addon, SETTLE_TIME)
+        totals.append(total)
+        spawns.append(counter.count)
+        if redraw > 0:
+            commands.update(counter.commands)
+
+    return {
+        "cold_ms": round(1000 * totals[0], 3),
+        "cold_spawns": spawns[0],
+        "redraw": summarize(totals[1:]),
+        "spawns_per_redraw": statistics.mean(spawns[1:]),
+        "max_spawns_per_redraw": max(spawns[1:]),
+        "commands_per_redraw": {
+            name: count / redraws for name, count in commands.most_common()},
+        "panels": {name: {"cold_ms": round(1000 * samples[0], 3),
+                          **summarize(samples[1:])}
+                   for name, samples in times.items()},
+    }
+
+
+def measure(counter: SpawnCounter, runs: int, function: Callable,
+            setup: Optional[Callable] = None) -> Dict:
+    """Times a function, calling setup untimed before each run"""
+    samples, spawns = [], []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        counter.reset()
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+        spawns.append(counter.count)
+    return {**summarize(samples), "spawns": statistics.median(spawns)}
+
+
+def git(work_dir: str, *args: str) -> str:
+    return subprocess.run(["git", *args], cwd=work_dir, check=True,
+                          stdout=subprocess.PIPE, text=True).stdout.strip()
+
+
+def measure_operations(addon, counter: SpawnCounter, work_dir: str,
+                       runs: int) -> Dict:
+    common = addon.common
+    tools = addon.tools
+    blendgit = stub_bpy.context.window_manager.blendgit
+    cache = common.get_state_cache(work_dir)
+    results = {
+        "status": measure(counter, runs, lambda: common.status(work_dir)),
+        "git_log": measure(counter, runs, lambda: common.git_log(work_dir)),
+        "list_branches_cold": measure(
+            counter, runs, tools.branches.list_branches,
+            setup=lambda: cache.invalidate("branches")),
+        "list_branches": measure(counter, runs,
+                                 tools.branches.list_branches),
+    }
+
+    # SaveCommit blocks for the save, then commits in the background
+    scene = stub_bpy.data.filepath
+    blocking = []
+
+    def edit_and_stage():
+        with open(scene, "r+b") as f:
+            f.seek(len(blocking) * SCENE_EDIT)
+            f.write(os.urandom(SCENE_EDIT))
+        git(work_dir, "add", "--", os.path.basename(scene))
+        blendgit.revision_properties.pending_commit_message = \
+            f"Benchmark commit {len(blocking)}"
+        wait_for_jobs(addon)
+
+    def save_commit():
+        start = time.perf_counter()
+        tools.revisions.SaveCommit().execute(stub_bpy.context)
+        blocking.append(time.perf_counter() - start)
+        if not stub_bpy.pump(lambda: not addon.executor.is_pending(),
+                             timeout=JOB_TIMEOUT):
+            raise TimeoutError("SaveCommit did not finish")
+        error = tools.commit.commit_progress["error"]
+        if error:
+            raise RuntimeError(f"SaveCommit failed: {error}")
+
+    results["save_commit"] = measure(counter, runs, save_commit,
+                                     setup=edit_and_stage)
+    results["save_commit"]["blocking"] = summarize(blocking)
+
+    # LoadCommit needs a clean working tree
+    git(work_dir, "reset", "--hard", "--quiet")
+    revisions = iter(git(work_dir, "rev-list", f"--max-count={runs + 1}",
+                         "HEAD").split()[1:])
+    revision_props = blendgit.revision_properties
+
+    def select_revision():
+        git(work_dir, "checkout", "--quiet", "main")
+        wait_for_jobs(addon)
+        revision_props.revision_list.clear()
+        item = revision_props.revision_list.add()
+        item["hash"] = next(revisions)
+        item["date"] = ""
+        item["message"] = ""
+        revision_props.revision_list_index = 0
+
+    def load_commit():
+        result = tools.revisions.LoadCommit().execute(stub_bpy.context)
+        if result != {"FINISHED"}:
+            raise RuntimeError("LoadCommit was cancelled")
+
+    results["load_commit"] = measure(counter, runs, load_commit,
+                                     setup=select_revision)
+    git(work_dir, "checkout", "--quiet", "main")
+    return results
+
+
+def run(args: argparse.Namespace, work_dir: str) -> Dict:
+    scene = generate(work_dir, args.commits, args.files, args.branches,
+                     args.binary_files, args.binary_size * 1024,
+                     args.scene_size * 1024)
+    addon = load_addon()
+    stub_bpy.data.filepath = scene
+    blendgit = stub_bpy.context.window_manager.blendgit
+    # Snapshots on a timer would add processes to random redraws
+    blendgit.autosave = False
+    try:
+        with SpawnCounter() as counter:
+            draw = measure_draws(addon, counter, args.redraws)
+            operations = measure_operations(addon, counter, work_dir,
+                                            args.runs)
+    finally:
+        addon.unregister()
+
+    return {
+        "blendgit": ".".join(str(part) for part in addon.bl_info["version"]),
+        "git": git(work_dir, "--version"),
+        "git_lfs": has_lfs(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repository": {
+            "commits": args.commits,
+            "files": args.files,
+            "branches": args.branches,
+            "binary_files": args.binary_files,
+            "binary_size": args.binary_size * 1024,
+            "scene_size": args.scene_size * 1024,
+        },
+        "draw": draw,
+        "operations": operations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commits", type=int, default=200)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--branches", type=int, default=5)
+    parser.add_argument("--binary-files", type=int, default=5)
+    parser.add_argument("--binary-size", type=int, default=256,
+                        help="Size of each LFS tracked file in KiB")
+    parser.add_argument("--scene-size", type=int, default=1024,
+                        help="Size of scene.blend in KiB")
+    parser.add_argument("--redraws", type=int, default=20,
+                        help="Redraws measured after the first one")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="Runs of each operation")
+    parser.add_argument("--repo",
+                        help="Generate the repository here and keep it")
+    parser.add_argument("--output", help="Write the JSON to this file")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="blendgit-bench-")
+    work_dir = args.repo or os.path.join(directory, "repo")
+    try:
+        # Keep what Blendgit prints out of the JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run(args, work_dir)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
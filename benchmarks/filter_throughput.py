@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Measures the streaming throughput of blend_filter.py
+
+Runs clean and smudge over a synthetic .blend of the given size, stored
+uncompressed, gzip and (with zstandard installed) zstd compressed, in
+both the plain and the chunked mode. Data goes through temporary files,
+as it would between git and the filter.
+
+Usage: filter_throughput.py [--size MIB] [--json]
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import blend_filter  # noqa: E402
+from blend_filter import (ChunkStore, clean, open_compressed,  # noqa
+                          open_decompressed, smudge)
+
+
+def synthetic_blend(size: int) -> bytes:
+    """Builds file data resembling a .blend: a header, then blocks of
+    repetitive structs mixed with less compressible arrays"""
+    rng = random.Random(0)
+    parts = [b"BLENDER-v400"]
+    total = len(parts[0])
+    while total < size:
+        length = rng.randrange(256, 64 * 1024)
+        code = rng.choice([b"DATA", b"ME\0\0", b"OB\0\0", b"IM\0\0"])
+        header = code + length.to_bytes(4, "little") + rng.randbytes(16)
+        if rng.random() < 0.5:
+            body = (rng.randbytes(32) * (length // 32 + 1))[:length]
+        else:
+            body = rng.randbytes(length)
+        parts += [header, body]
+        total += len(header) + length
+    return b"".join(parts)[:size]
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if not compression:
+        return data
+    with tempfile.TemporaryFile() as f:
+        with open_compressed(f, compression) as stream:
+            stream.write(data)
+        f.seek(0)
+        return f.read()
+
+
+def read_back(file_data: bytes, compression: str) -> bytes:
+    return open_decompressed(io.BytesIO(file_data), compression).read()
+
+
+def measure(function, source_data: bytes, store) -> tuple:
+    """Runs a filter function between temporary files
+
+    Returns:
+        tuple: The seconds taken and the output
+    """
+    with tempfile.TemporaryFile() as source, \
+            tempfile.TemporaryFile() as target:
+        source.write(source_data)
+        source.seek(0)
+        start = time.perf_counter()
+        function(source, target, store)
+        target.flush()
+        elapsed = time.perf_counter() - start
+        target.seek(0)
+        return elapsed, target.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=256,
+                        help="Size of the uncompressed file in MiB")
+    parser.add_argument("--json", action="store_true",
+                        help="Print results as JSON")
+    args = parser.parse_args()
+
+    data = synthetic_blend(args.size * 1024 * 1024)
+    compressions = ["", "gzip"]
+    if blend_filter.zstandard is not None:
+        compressions.append("zstd")
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for chunks in (False, True):
+            for compression in compressions:
+                # A fresh store each time, so no chunk is already known
+                store = ChunkStore(os.path.join(
+                    directory, f"{chunks}-{compression}"))
+                file_data = compress(data, compression)
+                clean_time, stored = measure(
+                    clean, file_data, store if chunks else None)
+                smudge_time, restored = measure(smudge, stored, store)
+                if read_back(restored, compression) != data:
+                    sys.exit(f"Round trip failed ({compression or 'none'})")
+                results.append({
+                    "mode": "chunks" if chunks else "plain",
+                    "compression": compression or "none",
+                    "size": len(data),
+                    "file_size": len(file_data),
+                    "stored_size": len(stored),
+                    "clean_mib_s": len(data) / clean_time / 2 ** 20,
+                    "smudge_mib_s": len(data) / smudge_time / 2 ** 20,
+                })
+
+    if args.json:
+        json.dump({"numpy": blend_filter.numpy is not None,
+                   "results": results}, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{args.size} MiB, numpy {'on' if blend_filter.numpy else 'off'}")
+    print(f"{'mode':<8}{'compression':<13}{'clean MiB/s':>13}"
+          f"{'smudge MiB/s':>14}")
+    for result in results:
+        print(f"{result['mode']:<8}{result['compression']:<13}"
+              f"{result['clean_mib_s']:>13.1f}"
+              f"{result['smudge_mib_s']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Measures refreshing long lists by differences instead of rebuilding
+
+Fills a collection like the Files panel's with synthetic status rows,
+then brings it to a changed set of rows both the way draw_files() used
+to (clear() and add() every item again) and through list_sync.sync(),
+which only writes what changed. Each change is checked to give the same
+items, with the selected files still selected.
+
+Collections are the ones of stub_bpy.py, so this measures the Python
+side of the work; in Blender every item written also costs RNA calls.
+
+Usage: list_sync_bench.py [--items N] [--runs N] [--output FILE]
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import stub_bpy
+from blendgit_bench import ADDON_DIR, summarize
+
+sys.path.insert(0, ADDON_DIR)
+import list_sync  # noqa: E402
+
+
+FIELDS = ("name", "status", "staged")
+
+
+class Item(stub_bpy.Struct):
+    name: stub_bpy.Property("string")
+    status: stub_bpy.Property("enum")
+    staged: stub_bpy.Property("bool")
+    selected: stub_bpy.Property("bool")
+
+
+class Owner(stub_bpy.Struct):
+    items: stub_bpy.Property("collection", type=Item)
+    index: stub_bpy.Property("int")
+
+
+def base_rows(count: int) -> List[Tuple]:
+    return [(f"assets/{index // 100:03}/file_{index:05}.blend",
+             "M" if index % 3 else "A", index % 2 == 0)
+            for index in range(count)]
+
+
+def changes(rows: List[Tuple]) -> Dict[str, List[Tuple]]:
+    """The refreshes measured, as the rows after each"""
+    middle = len(rows) // 2
+    statuses = list(rows)
+    for index in range(0, len(rows), 100):
+        name, _, staged = statuses[index]
+        statuses[index] = (name, "D", not staged)
+    return {
+        "unchanged": list(rows),
+        "one_status": rows[:middle] + [(rows[middle][0], "D", True)]
+        + rows[middle + 1:],
+        "one_added": rows[:middle] + [("assets/new.blend", "?", False)]
+        + rows[middle:],
+        "one_removed": rows[:middle] + rows[middle + 1:],
+        "front_added": [("assets/aaa.blend", "?", False)] + rows,
+        "statuses_1pct": statuses,
+        "reversed": rows[::-1],
+    }
+
+
+def rebuild(owner: Owner, rows: List[Tuple]):
+    """What draw_files() did before list_sync.py"""
+    selected = {item.name for item in owner.items if item.selected}
+    owner.items.clear()
+    for row in rows:
+        item = owner.items.add()
+        for field, value in zip(FIELDS, row):
+            item[field] = value
+        item["selected"] = row[0] in selected
+
+
+def sync(owner: Owner, rows: List[Tuple]):
+    list_sync.sync("bench", owner.items, FIELDS, rows, keep=("selected",),
+                   owner=owner, index_prop="index")
+
+
+def prepare(rows: List[Tuple]) -> Owner:
+    """A collection holding rows, synced, with every 7th file selected"""
+    owner = Owner()
+    list_sync._synced.pop("bench", None)
+    sync(owner, rows)
+    for item in owner.items[::7]:
+        item.selected = True
+    owner["index"] = len(rows) // 3
+    return owner
+
+
+def check(owner: Owner, rows: List[Tuple], selected: set):
+    if [tuple(item[field] for field in FIELDS)
+            for item in owner.items] != rows:
+        raise RuntimeError("The items differ from the rows")
+    if {item.name for item in owner.items if item.selected} \
+            != {row[0] for row in rows} & selected:
+        raise RuntimeError("The selection was lost")
+
+
+def time_update(rows: List[Tuple], new_rows: List[Tuple],
+                update: Callable, runs: int) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        owner = prepare(rows)
+        selected = {item.name for item in owner.items if item.selected}
+        active = owner.items[owner.index].name
+        start = time.perf_counter()
+        update(owner, new_rows)
+        samples.append(time.perf_counter() - start)
+        check(owner, new_rows, selected)
+        if update is sync and active in {row[0] for row in new_rows} \
+                and owner.items[owner.index].name != active:
+            raise RuntimeError("The active item moved")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", help="Write the JSON to this file")
+    args = parser.parse_args()
+
+    rows = base_rows(args.items)
+    results = {"items": args.items, "changes": {}}
+    for name, new_rows in changes(rows).items():
+        rebuilt = summarize(time_update(rows, new_rows, rebuild, args.runs))
+        synced = summarize(time_update(rows, new_rows, sync, args.runs))
+        results["changes"][name] = {
+            "rebuild": rebuilt,
+            "sync": synced,
+            "speedup": round(rebuilt["median_ms"]
+                             / max(synced["median_ms"], 0.001), 1),
+        }
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Measures what running git through a shell cost per call
+
+Runs the git commands the add-on runs most, in a repository made by
+synthetic_repo.py, both the way do_git() used to (a copy of os.environ,
+a quoted command line and shell=True) and through process.git(). The
+difference is the latency saved on every call.
+
+Given the JSON written by blendgit_bench.py, the saving is also
+multiplied by the git commands a redraw runs, for the whole add-on.
+
+Usage: process_bench.py [--runs N] [--commits N] [--calls FILE]
+    [--output FILE]
+"""
+import argparse
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from blendgit_bench import ADDON_DIR, summarize
+from synthetic_repo import generate
+
+sys.path.insert(0, ADDON_DIR)
+import process  # noqa: E402
+
+
+# The commands behind status(), git_log(), local_branches() and the
+# revision checks
+COMMANDS = [
+    ["--no-optional-locks", "status", "--porcelain=v2", "--branch", "-z"],
+    ["log", "--pretty=format:%H%x09%cs%x09%s", "--skip=0", "-n", "100",
+     "HEAD"],
+    ["for-each-ref", "--format=%(refname:short)", "refs/heads"],
+    ["rev-parse", "HEAD"],
+]
+
+
+def shell_git(work_dir: str, *args: str) -> bytes:
+    """Runs git the way do_git() did before process.py"""
+    env = dict(os.environ)
+    env["GIT_DIR"] = ".git"
+    if os.name == "nt":
+        cmd = "git " + subprocess.list2cmdline(args)
+    else:
+        cmd = "git " + " ".join(shlex.quote(arg) for arg in args)
+    return subprocess.run(cmd, stdin=subprocess.DEVNULL,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          shell=True, cwd=work_dir, env=env,
+                          check=True).stdout
+
+
+def time_calls(function: Callable, runs: int) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def measure(work_dir: str, runs: int) -> Dict[str, Dict]:
+    results = {}
+    for args in COMMANDS:
+        name = "git " + next(arg for arg in args if not arg.startswith("-"))
+        if shell_git(work_dir, *args) != process.git(work_dir, *args):
+            raise RuntimeError(f"{name} printed something else")
+        # Alternated, so both see the same caches
+        shell, argv = [], []
+        for _ in range(runs):
+            shell += time_calls(lambda: shell_git(work_dir, *args), 1)
+            argv += time_calls(lambda: process.git(work_dir, *args), 1)
+        shell_stats, argv_stats = summarize(shell), summarize(argv)
+        results[name] = {
+            "shell": shell_stats,
+            "argv": argv_stats,
+            "saved_ms": round(shell_stats["median_ms"]
+                              - argv_stats["median_ms"], 3),
+        }
+    return results
+
+
+def per_redraw(results: Dict[str, Dict], calls_path: str) -> Dict:
+    """Estimates the time saved per redraw from blendgit_bench.py output"""
+    with open(calls_path) as f:
+        calls = json.load(f)["draw"]["commands_per_redraw"]
+    # Commands not measured here save what they do on average
+    mean_saving = sum(result["saved_ms"] for result in results.values()) \
+        / len(results)
+    saved = sum(count * results.get(name, {}).get("saved_ms", mean_saving)
+                for name, count in calls.items() if name.startswith("git"))
+    return {"git_calls": sum(count for name, count in calls.items()
+                             if name.startswith("git")),
+            "saved_ms": round(saved, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--commits", type=int, default=200)
+    parser.add_argument("--calls",
+                        help="JSON written by blendgit_bench.py, to "
+                             "estimate the saving per redraw")
+    parser.add_argument("--output", help="Write the JSON to this file")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="blendgit-process-")
+    try:
+        work_dir = os.path.join(directory, "repo")
+        generate(work_dir, args.commits, files=50, branches=5,
+                 binary_files=0, scene_size=64 * 1024)
+        results = {"commands": measure(work_dir, args.runs)}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    if args.calls:
+        results["per_redraw"] = per_redraw(results["commands"], args.calls)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""A stand-in for bpy, enough to import and draw Blendgit without Blender
+
+Properties behave like plain attributes with their defaults, timers run
+when pump() is called, and layouts only count the elements drawn, but
+template_list() draws the visible rows of the list like Blender does.
+Operators that would load or save a file leave it as it is, except
+save_as_mainfile() with another path, which copies it.
+
+install() has to be called before the add-on is imported.
+"""
+import functools
+import os
+import shutil
+import sys
+import time
+import types
+from typing import Callable, Dict
+
+
+# Rows template_list() draws by default
+LIST_ROWS = 5
+
+
+class Property:
+    def __init__(self, kind: str, **options):
+        self.kind = kind
+        self.options = options
+
+    def default(self):
+        if self.kind == "collection":
+            return Collection(self.options["type"])
+        if self.kind == "pointer":
+            return self.options["type"]()
+        if "default" in self.options:
+            return self.options["default"]
+        return {"bool": False, "int": 0, "float": 0.0, "string": "",
+                "enum": ""}[self.kind]
+
+    def __get__(self, instance, owner):
+        # Properties assigned to a class after it was defined, like
+        # WindowManager.blendgit
+        if instance is None:
+            return self
+        name = next(name for name, prop in _properties(owner).items()
+                    if prop is self)
+        value = self.default()
+        instance.__dict__[name] = value
+        return value
+
+
+def _property(kind: str):
+    return lambda **options: Property(kind, **options)
+
+
+@functools.lru_cache(maxsize=None)
+def _properties(cls) -> Dict[str, Property]:
+    """Returns the properties declared by a class and its bases"""
+    properties = {}
+    for base in reversed(cls.__mro__):
+        for name, value in vars(base).get("__annotations__", {}).items():
+            if isinstance(value, Property):
+                properties[name] = value
+        for name, value in vars(base).items():
+            if isinstance(value, Property):
+                properties[name] = value
+    return properties
+
+
+class Struct:
+    """Base of the types holding properties
+
+    Items that are not properties behave like ID properties.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, "_id_properties", {})
+
+    def __getattr__(self, name: str):
+        prop = _properties(type(self)).get(name)
+        if prop is None:
+            raise AttributeError(name)
+        value = prop.default()
+        object.__setattr__(self, name, value)
+        return value
+
+    def __setattr__(self, name: str, value):
+        object.__setattr__(self, name, value)
+        prop = _properties(type(self)).get(name)
+        if prop is not None and "update" in prop.options:
+            prop.options["update"](self, context)
+
+    def __getitem__(self, key: str):
+        if key in _properties(type(self)):
+            return getattr(self, key)
+        return self._id_properties[key]
+
+    def __setitem__(self, key: str, value):
+        if key in _properties(type(self)):
+            object.__setattr__(self, key, value)
+        else:
+            self._id_properties[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._id_properties
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class Collection(list):
+    def __init__(self, item_type):
+        super().__init__()
+        self.item_type = item_type
+
+    def add(self):
+        item = self.item_type()
+        self.append(item)
+        return item
+
+    def remove(self, index: int):
+        del self[index]
+
+    def move(self, source: int, target: int):
+        self.insert(target, self.pop(source))
+
+
+class UILayout:
+    """Layout that counts what is drawn into it"""
+    elements = 0
+
+    def __init__(self):
+        self.enabled = True
+        self.active = True
+        self.alignment = "EXPAND"
+        self.use_property_split = False
+
+    def _element(self, *_args, **_kwargs):
+        UILayout.elements += 1
+
+    def _sublayout(self, *_args, **_kwargs) -> "UILayout":
+        UILayout.elements += 1
+        return UILayout()
+
+    row = column = split = box = grid_flow = _sublayout
+    label = prop = prop_search = menu = separator = separator_spacer = \
+        template_icon = _element
+
+    def operator(self, *_args, **_kwargs):
+        UILayout.elements += 1
+        return types.SimpleNamespace()
+
+    def template_list(self, listtype_name: str, list_id: str, dataptr,
+                      propname: str, active_dataptr, active_propname: str,
+                      rows: int = LIST_ROWS, **_kwargs):
+        UILayout.elements += 1
+        ui_list = registered_classes[listtype_name]()
+        items = getattr(dataptr, propname)
+        flags, order = [], []
+        if hasattr(ui_list, "filter_items"):
+            flags, order = ui_list.filter_items(context, dataptr, propname)
+        indices = [index for index in range(len(items))
+                   if not flags or flags[index] & UIList.bitflag_filter_item]
+        if order:
+            indices.sort(key=lambda index: order[index])
+        active = getattr(active_dataptr, active_propname)
+        # Rows are drawn around the active one, as if scrolled to it
+        start = max(0, min(active, len(indices) - rows))
+        for index in indices[start:start + rows]:
+            ui_list.draw_item(context, UILayout(), dataptr, items[index], 0,
+                              active_dataptr, active_propname, index)
+
+
+class PropertyGroup(Struct):
+    pass
+
+
+class Panel(Struct):
+    def __init__(self):
+        super().__init__()
+        object.__setattr__(self, "layout", UILayout())
+
+
+class Operator(Struct):
+    def report(self, level, message: str):
+        print(f"{'/'.join(sorted(level))}: {message}", file=sys.stderr)
+
+
+class UIList(Struct):
+    bitflag_filter_item = 1 << 30
+    filter_name = ""
+    use_filter_invert = False
+    use_filter_sort_alpha = False
+    use_filter_sort_reverse = False
+
+
+class WindowManager(Struct):
+    def __init__(self):
+        super().__init__()
+        object.__setattr__(self, "windows", [])
+
+    def invoke_confirm(self, operator, _event):
+        return operator.execute(context)
+
+
+class Menu(Struct):
+    pass
+
+
+class AddonPreferences(Struct):
+    pass
+
+
+class ID(Struct):
+    pass
+
+
+class Object(ID):
+    pass
+
+
+class Scene(ID):
+    pass
+
+
+class UI_UL_list:
+    @staticmethod
+    def filter_items_by_name(pattern, bitflag, items, propname="name",
+                             flags=None, reverse=False):
+        flags = flags or [0] * len(items)
+        for index, item in enumerate(items):
+            if pattern.strip("*").lower() in \
+                    str(getattr(item, propname)).lower():
+                flags[index] |= bitflag
+        return flags
+
+    @staticmethod
+    def sort_items_by_name(items, propname="name"):
+        ordered = sorted(enumerate(items),
+                         key=lambda item: str(getattr(item[1], propname)))
+        order = [0] * len(items)
+        for position, (index, _) in enumerate(ordered):
+            order[index] = position
+        return order
+
+
+class Timers:
+    """Timers that run when pump() is called"""
+
+    def __init__(self):
+        self._due: Dict[Callable, float] = {}
+
+    def register(self, function: Callable, first_interval: float = 0.0,
+                 persistent: bool = False):
+        self._due[function] = time.monotonic() + first_interval
+
+    def unregister(self, function: Callable):
+        if function not in self._due:
+            raise ValueError("Timer not registered")
+        del self._due[function]
+
+    def is_registered(self, function: Callable) -> bool:
+        return function in self._due
+
+    def run_due(self):
+        """Runs the timers that are due once"""
+        for function, due in list(self._due.items()):
+            if function in self._due and time.monotonic() >= due:
+                interval = function()
+                if interval is None:
+                    self._due.pop(function, None)
+                else:
+                    self._due[function] = time.monotonic() + interval
+
+
+def pump(until: Callable[[], bool], timeout: float = 60.0,
+         interval: float = 0.005) -> bool:
+    """Runs timers like Blender's event loop until a condition holds
+
+    Returns:
+        bool: False when it timed out
+    """
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        app.timers.run_due()
+        if until():
+            return True
+        time.sleep(interval)
+    return False
+
+
+class _LibraryLoad:
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def __enter__(self):
+        return types.SimpleNamespace(), types.SimpleNamespace()
+
+    def __exit__(self, *_args):
+        return False
+
+
+class Libraries(list):
+    def load(self, filepath: str, link: bool = False, relative=False):
+        return _LibraryLoad(filepath)
+
+
+def persistent(function: Callable) -> Callable:
+    return function
+
+
+def register_class(cls):
+    _properties.cache_clear()
+    registered_classes[getattr(cls, "bl_idname", cls.__name__)] = cls
+
+
+def unregister_class(cls):
+    registered_classes.pop(getattr(cls, "bl_idname", cls.__name__), None)
+
+
+def open_mainfile(*_args, filepath: str = "", **_kwargs):
+    data.filepath = filepath
+    data.is_dirty = False
+    for handler in app.handlers.load_post:
+        handler(None, None)
+    return {"FINISHED"}
+
+
+def save_as_mainfile(*_args, filepath: str = "", copy: bool = False,
+                     **_kwargs):
+    if filepath and data.filepath and os.path.abspath(filepath) \
+            != os.path.abspath(data.filepath):
+        shutil.copyfile(data.filepath, filepath)
+    if not copy:
+        data.filepath = filepath or data.filepath
+        data.is_dirty = False
+        for handler in app.handlers.save_post:
+            handler(None, None)
+    return {"FINISHED"}
+
+
+def save_mainfile(*args, **kwargs):
+    return save_as_mainfile(*args, filepath=data.filepath, **kwargs)
+
+
+registered_classes: Dict[str, type] = {}
+context = types.SimpleNamespace(window_manager=None, scene=None)
+data = types.SimpleNamespace(filepath="", is_dirty=False,
+                             window_managers=[], libraries=Libraries(),
+                             objects=None)
+app = types.SimpleNamespace(
+    timers=Timers(), version=(4, 1, 0), background=True,
+    handlers=types.SimpleNamespace(save_post=[], load_post=[],
+                                   persistent=persistent))
+
+
+def install(module_name: str = "bpy") -> types.ModuleType:
+    """Makes this stub importable as bpy and its submodules"""
+    bpy = types.ModuleType(module_name)
+    submodules = {
+        "props": {
+            "BoolProperty": _property("bool"),
+            "IntProperty": _property("int"),
+            "FloatProperty": _property("float"),
+            "StringProperty": _property("string"),
+            "EnumProperty": _property("enum"),
+            "CollectionProperty": _property("collection"),
+            "PointerProperty": _property("pointer"),
+        },
+        "types": {cls.__name__: cls for cls in (
+            PropertyGroup, Panel, Operator, UIList, UILayout, UI_UL_list,
+            WindowManager, Menu, AddonPreferences, ID, Object, Scene)},
+        "utils": {"register_class": register_class,
+                  "unregister_class": unregister_class},
+        "ops": {"wm": types.SimpleNamespace(
+            open_mainfile=open_mainfile, save_as_mainfile=save_as_mainfile,
+            save_mainfile=save_mainfile)},
+        "path": {"abspath": lambda path, **_kwargs: path},
+    }
+    for name, attributes in submodules.items():
+        module = types.ModuleType(f"{module_name}.{name}")
+        vars(module).update(attributes)
+        setattr(bpy, name, module)
+        sys.modules[module.__name__] = module
+    bpy.types.Context = types.SimpleNamespace
+    previews = types.ModuleType(f"{module_name}.utils.previews")
+    previews.new = lambda: _Previews()
+    previews.remove = lambda _collection: None
+    bpy.utils.previews = previews
+    sys.modules[previews.__name__] = previews
+
+    app_module = types.ModuleType(f"{module_name}.app")
+    vars(app_module).update(vars(app))
+    bpy.app = app_module
+    sys.modules[app_module.__name__] = app_module
+    sys.modules[f"{module_name}.app.handlers"] = app.handlers
+    bpy.data = data
+    bpy.context = context
+    sys.modules[module_name] = bpy
+    return bpy
+
+
+class _Previews(dict):
+    def load(self, name: str, filepath: str, filetype: str):
+        preview = types.SimpleNamespace(icon_id=len(self) + 1)
+        self[name] = preview
+        return preview
+
+    def close(self):
+        self.clear()
+
+
+def new_window_manager() -> WindowManager:
+    """Creates the window manager, once the add-on registered its
+    properties on WindowManager"""
+    _properties.cache_clear()
+    window_manager = WindowManager()
+    data.window_managers[:] = [window_manager]
+    context.window_manager = window_manager
+    return window_manager
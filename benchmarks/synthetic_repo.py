@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Generates a synthetic Blendgit repository
+
+History is written with git fast-import, so large histories take
+seconds. Every commit changes scene.blend and a few text files, and
+every tenth one a binary file tracked by LFS. Pointers are committed
+and the objects written to .git/lfs/objects directly, so git-lfs is
+only needed to check them out. Branches fork from random commits and
+add one commit each. The same arguments always produce the same
+history.
+
+Usage: synthetic_repo.py <path> [--commits N] [--files N] [--branches N]
+    [--binary-files N] [--binary-size KIB] [--scene-size KIB] [--dirty N]
+"""
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import subprocess
+import sys
+from typing import Dict, List, Union
+
+from filter_throughput import synthetic_blend
+
+
+SCENE = "scene.blend"
+# Bytes of scene.blend rewritten by each commit
+SCENE_EDIT = 4 * 1024
+START_TIME = 1700000000
+AUTHOR_NAME = "Blendgit Bench"
+AUTHOR_EMAIL = "bench@example.com"
+LFS_PATTERN = "*.png"
+
+
+def git(path: str, *args: str, **kwargs) -> str:
+    return subprocess.run(["git", *args], cwd=path, check=True,
+                          stdout=subprocess.PIPE, text=True,
+                          **kwargs).stdout.strip()
+
+
+def has_lfs() -> bool:
+    return shutil.which("git-lfs") is not None
+
+
+def lfs_pointer(path: str, data: bytes) -> bytes:
+    """Stores data as an LFS object of the repository at path and returns
+    its pointer"""
+    oid = hashlib.sha256(data).hexdigest()
+    directory = os.path.join(path, ".git", "lfs", "objects", oid[:2],
+                             oid[2:4])
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, oid), "wb") as f:
+        f.write(data)
+    return (f"version https://git-lfs.github.com/spec/v1\n"
+            f"oid sha256:{oid}\nsize {len(data)}\n").encode()
+
+
+class Stream:
+    """Writes a fast-import stream"""
+
+    def __init__(self, process: subprocess.Popen):
+        self.process = process
+        self.marks = 0
+        self.commits = 0
+
+    def write(self, text: str):
+        self.process.stdin.write(text.encode())
+
+    def data(self, data: bytes):
+        self.write(f"data {len(data)}\n")
+        self.process.stdin.write(data + b"\n")
+
+    def blob(self, data: bytes) -> str:
+        """Writes a blob and returns its mark"""
+        self.marks += 1
+        self.write(f"blob\nmark :{self.marks}\n")
+        self.data(data)
+        return f":{self.marks}"
+
+    def commit(self, ref: str, parent: str, message: str,
+               files: Dict[str, Union[bytes, str]]) -> str:
+        """Writes a commit and returns its mark
+
+        Args:
+            files: The data of each file, or the mark of its blob
+        """
+        self.marks += 1
+        self.commits += 1
+        mark = f":{self.marks}"
+        timestamp = START_TIME + 3600 * self.commits
+        self.write(f"commit {ref}\nmark {mark}\n"
+                   f"author {AUTHOR_NAME} <{AUTHOR_EMAIL}> "
+                   f"{timestamp} +0000\n"
+                   f"committer {AUTHOR_NAME} <{AUTHOR_EMAIL}> "
+                   f"{timestamp} +0000\n")
+        self.data(message.encode())
+        if parent:
+            self.write(f"from {parent}\n")
+        for path, data in files.items():
+            if isinstance(data, str):
+                self.write(f"M 100644 {data} {path}\n")
+            else:
+                self.write(f"M 100644 inline {path}\n")
+                self.data(data)
+        return mark
+
+
+def generate(path: str, commits: int = 200, files: int = 50,
+             branches: int = 5, binary_files: int = 5,
+             binary_size: int = 256 * 1024, scene_size: int = 1024 * 1024,
+             dirty: int = 5, seed: int = 0) -> str:
+    """Creates the repository, with main checked out
+
+    Args:
+        binary_size: Size of each LFS tracked file in bytes
+        scene_size: Size of scene.blend in bytes
+        dirty: Files left modified in the working tree, half of them
+            staged
+
+    Returns:
+        str: The path of scene.blend
+    """
+    rng = random.Random(seed)
+    os.makedirs(path)
+    git(path, "init", "--quiet")
+    git(path, "symbolic-ref", "HEAD", "refs/heads/main")
+    git(path, "config", "core.autocrlf", "false")
+    git(path, "config", "user.name", AUTHOR_NAME)
+    git(path, "config", "user.email", AUTHOR_EMAIL)
+    if has_lfs():
+        git(path, "lfs", "install", "--local")
+
+    text_paths = [f"notes/note-{n:04}.txt" for n in range(files)]
+    binary_paths = [f"textures/texture-{n:03}.png"
+                    for n in range(binary_files)]
+    scene = bytearray(synthetic_blend(scene_size))
+
+    def text(name: str, version: int) -> bytes:
+        return f"{name} version {version}\n".encode() * 20
+
+    def binary() -> bytes:
+        return rng.randbytes(binary_size)
+
+    process = subprocess.Popen(["git", "fast-import", "--quiet"], cwd=path,
+                               stdin=subprocess.PIPE)
+    stream = Stream(process)
+    # fast-import only deltas a blob against the one written before it,
+    # so the versions of scene.blend go first, one after the other
+    scenes = [stream.blob(bytes(scene))]
+    for _ in range(1, commits):
+        offset = rng.randrange(len(scene) - SCENE_EDIT)
+        scene[offset:offset + SCENE_EDIT] = rng.randbytes(SCENE_EDIT)
+        scenes.append(stream.blob(bytes(scene)))
+    initial = {".gitattributes":
+               f"{LFS_PATTERN} filter=lfs diff=lfs merge=lfs -text\n"
+               .encode(),
+               SCENE: scenes[0]}
+    initial.update((name, text(name, 0)) for name in text_paths)
+    initial.update((name, lfs_pointer(path, binary()))
+                   for name in binary_paths)
+    marks: List[str] = [stream.commit("refs/heads/main", "",
+                                      "Initial commit", initial)]
+    for n in range(1, commits):
+        changed: Dict[str, Union[bytes, str]] = {SCENE: scenes[n]}
+        for name in rng.sample(text_paths, min(3, len(text_paths))):
+            changed[name] = text(name, n)
+        if binary_paths and n % 10 == 0:
+            changed[rng.choice(binary_paths)] = lfs_pointer(path, binary())
+        marks.append(stream.commit("refs/heads/main", marks[-1],
+                                   f"Change {n}", changed))
+    for n in range(branches):
+        fork = rng.choice(marks)
+        stream.commit(f"refs/heads/branch-{n}", fork, f"Work on branch {n}",
+                      {f"branch-{n}.txt": text(f"branch-{n}", 0)})
+    process.stdin.close()
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode,
+                                            "git fast-import")
+
+    env = dict(os.environ)
+    if not has_lfs():
+        # Leave the pointers in place of the files
+        env["GIT_LFS_SKIP_SMUDGE"] = "1"
+    git(path, "reset", "--hard", "--quiet", env=env)
+
+    for n, name in enumerate(rng.sample(text_paths,
+                                        min(dirty, len(text_paths)))):
+        with open(os.path.join(path, name), "ab") as f:
+            f.write(b"Not committed\n")
+        if n % 2 == 0:
+            git(path, "add", "--", name)
+    return os.path.join(path, SCENE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="Directory to create")
+    parser.add_argument("--commits", type=int, default=200)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--branches", type=int, default=5)
+    parser.add_argument("--binary-files", type=int, default=5)
+    parser.add_argument("--binary-size", type=int, default=256,
+                        help="Size of each LFS tracked file in KiB")
+    parser.add_argument("--scene-size", type=int, default=1024,
+                        help="Size of scene.blend in KiB")
+    parser.add_argument("--dirty", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        sys.exit(f"{args.path} already exists")
+    print(generate(args.path, args.commits, args.files, args.branches,
+                   args.binary_files, args.binary_size * 1024,
+                   args.scene_size * 1024, args.dirty, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Compares historic .blend files datablock by datablock
+
+Each revision is read as git stores it, copied decompressed to a
+temporary file and memory-mapped, and its block headers are walked
+without parsing the blocks. An ID block (like "OB" or "ME") starts a
+datablock, which owns the DATA blocks following it, and each datablock
+is summarised by its size and a hash of its blocks. Only the summaries
+are kept in memory, so files of any size are compared without Blender.
+
+Summaries are cached per blob and diffs per pair of blobs.
+tools/diff.py runs this in its own process.
+
+Usage: blend_diff.py <cache dir> <path> <old rev> <new rev>
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .blend_filter import BUFFER_SIZE, blob_ids, open_blob
+    from .blendfile import MAX_HEADER_SIZE, FileHeader
+    from .refs import find_repository
+except ImportError:
+    # Run as a script
+    from blend_filter import BUFFER_SIZE, blob_ids, open_blob
+    from blendfile import MAX_HEADER_SIZE, FileHeader
+    from refs import find_repository
+
+
+# Summaries and diffs kept on disk
+MAX_CACHED = 200
+END_CODE = b"ENDB"
+# Blocks describing the file rather than a datablock
+FILE_CODES = {b"REND", b"TEST", b"GLOB", b"USER", b"DNA1"}
+# The ID name follows a few pointers at the start of the ID struct
+NAME_SCAN = 64
+MAX_NAME = 258
+# Hashed instead of the block header, whose old address changes on
+# every save
+BLOCK_INFO = struct.Struct("<4sqqq")
+
+# Name of a datablock, like "OB:Cube", to its size and hash
+Summary = Dict[str, Tuple[int, str]]
+
+
+def id_name(header: FileHeader, code: bytes, body: bytes) -> Optional[str]:
+    """Reads the name of an ID from the start of its block
+
+    ID names start with the two letter code of the ID block.
+    """
+    for offset in range(0, NAME_SCAN, header.pointer_size):
+        if body[offset:offset + 2] != code:
+            continue
+        end = body.find(b"\0", offset + 2, offset + MAX_NAME)
+        if end > offset + 2:
+            return body[offset + 2:end].decode("utf-8", "replace")
+    return None
+
+
+def summarize(path: str) -> Summary:
+    """Hashes the blocks of each datablock of an uncompressed .blend file
+
+    Pointers stored inside blocks are hashed as they are, so a datablock
+    can show as changed when only its place in memory did.
+    """
+    summary: Summary = {}
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MAX_HEADER_SIZE:
+            raise ValueError("Not a .blend file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, \
+                memoryview(data) as view:
+            header = FileHeader(data[:MAX_HEADER_SIZE])
+            bhead_size = header.bhead.size
+            key = None
+            digest = None
+            size = 0
+
+            def finish():
+                if key is None:
+                    return
+                name = key
+                number = 1
+                # Names are unique per library, not per file
+                while name in summary:
+                    number += 1
+                    name = f"{key}#{number}"
+                summary[name] = (size, digest.hexdigest())
+
+            offset = header.size
+            while offset + bhead_size <= len(data):
+                block = header.block_header(data, offset)
+                start = offset + bhead_size
+                end = start + block.length
+                if block.code == END_CODE or block.length < 0 \
+                        or end > len(data):
+                    break
+                if block.code[2:] == b"\0\0":
+                    finish()
+                    code = block.code[:2]
+                    name = id_name(header, code,
+                                   data[start:min(end, start + NAME_SCAN
+                                                  + MAX_NAME)])
+                    if name is None:
+                        name = f"#{len(summary)}"
+                    key = f"{code.decode('ascii', 'replace')}:{name}"
+                    digest = hashlib.blake2b(digest_size=16)
+                    size = 0
+                if key is not None and block.code not in FILE_CODES:
+                    digest.update(BLOCK_INFO.pack(
+                        block.code, block.length, block.sdna_index,
+                        block.count))
+                    digest.update(view[start:end])
+                    size += bhead_size + block.length
+                offset = end
+            finish()
+    return summary
+
+
+def diff_summaries(old: Summary, new: Summary) -> Dict[str, Any]:
+    """Lists the datablocks added, removed and changed between two files
+
+    Sizes include block headers, so they add up to the file size less
+    the blocks that belong to no datablock.
+    """
+    return {
+        "added": sorted([name, new[name][0]]
+                        for name in new if name not in old),
+        "removed": sorted([name, old[name][0]]
+                          for name in old if name not in new),
+        "changed": sorted([name, old[name][0], new[name][0]]
+                          for name in new
+                          if name in old and old[name][1] != new[name][1]),
+        "unchanged": sum(1 for name in new
+                         if name in old and old[name][1] == new[name][1]),
+        "old_size": sum(size for size, _ in old.values()),
+        "new_size": sum(size for size, _ in new.values()),
+    }
+
+
+def read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            value = json.load(f)
+    except (OSError, ValueError):
+        return None
+    os.utime(path)
+    return value
+
+
+def write_json(path: str, value: Any):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                     suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def evict(cache_dir: str):
+    """Removes the least recently used summaries and diffs"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(".json"):
+            path = os.path.join(cache_dir, name)
+            entries.append((os.path.getmtime(path), path))
+    entries.sort(reverse=True)
+    for _, path in entries[MAX_CACHED:]:
+        os.unlink(path)
+
+
+def summarize_blob(work_dir: str, common_dir: str, cache_dir: str,
+                   blob: Optional[str]) -> Summary:
+    """Summarises the .blend a blob stands for, or an empty file for None
+
+    Raises:
+        LookupError: The content of the blob is not available locally
+        ValueError: The blob is not a .blend file
+    """
+    if blob is None:
+        return {}
+    cache_path = os.path.join(cache_dir, f"{blob}.json")
+    summary = read_json(cache_path)
+    if summary is not None:
+        return {name: tuple(value) for name, value in summary.items()}
+    with open_blob(work_dir, common_dir, blob) as stream:
+        if stream is None:
+            raise LookupError(f"{blob[:7]} is not fetched yet")
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(stream, f, BUFFER_SIZE)
+            summary = summarize(temp_path)
+        finally:
+            os.unlink(temp_path)
+    write_json(cache_path, summary)
+    return summary
+
+
+def diff_revisions(work_dir: str, common_dir: str, cache_dir: str,
+                   path: str, old_rev: str, new_rev: str) -> Dict[str, Any]:
+    """Compares path between two revisions
+
+    A revision without the file compares as an empty file.
+
+    Returns:
+        dict: The diff of diff_summaries(), with the blobs compared
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    blobs = blob_ids(work_dir, path, [old_rev, new_rev])
+    old_blob, new_blob = blobs[old_rev], blobs[new_rev]
+    cache_path = os.path.join(cache_dir,
+                              f"{old_blob or 'none'}-{new_blob or 'none'}"
+                              ".json")
+    diff = read_json(cache_path)
+    if diff is None:
+        diff = diff_summaries(
+            summarize_blob(work_dir, common_dir, cache_dir, old_blob),
+            summarize_blob(work_dir, common_dir, cache_dir, new_blob))
+        diff["old"] = old_blob
+        diff["new"] = new_blob
+        write_json(cache_path, diff)
+    evict(cache_dir)
+    return diff
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 5:
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        return 2
+    repository = find_repository(os.getcwd())
+    if repository is None:
+        print("Not in a repository", file=sys.stderr)
+        return 1
+    try:
+        diff = diff_revisions(repository.work_dir, repository.common_dir,
+                              *argv[1:])
+    except (LookupError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    json.dump(diff, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
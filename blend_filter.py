@@ -0,0 +1,717 @@
+#!/usr/bin/env python3
+"""Git clean/smudge filter for .blend files
+
+Compressed .blend files are stored decompressed, so git's delta
+compression (or chunk deduplication) sees what actually changed, and are
+compressed again on checkout. With --lfs, what is stored is handed on to
+`git lfs clean`, so .blend files stay in LFS, and LFS pointers are
+resolved through `git lfs smudge` on checkout. With --chunks, files are
+also split into deduplicated content-defined chunks kept in
+.git/blendgit/chunks.
+
+Chunks never leave the repository they were made in: nothing pushes or
+fetches them, so a clone cannot check out a chunked file. Repositories
+with a remote are therefore never chunked, --chunks is ignored there.
+
+Git runs this script directly (see tools/lfs.py), so it only depends on
+the standard library and on refs.py and blendfile.py next to it. numpy
+and zstandard are used when importable, as they are inside Blender.
+Without numpy, files over MAX_PYTHON_CHUNKED are not chunked.
+
+Usage: blend_filter.py clean [--chunks] [--lfs] [-- PATH]|smudge [-- PATH]
+    |report
+"""
+import contextlib
+import gzip
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import zlib
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .blendfile import MAX_HEADER_SIZE
+    from .refs import find_repository, read_text, resolve_git_dir
+except ImportError:
+    # Run as a script by git
+    from blendfile import MAX_HEADER_SIZE
+    from refs import find_repository, read_text, resolve_git_dir
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MANIFEST_HEADER = b"blendgit-chunks 1\n"
+# Followed by the compression to restore and a newline
+DECOMPRESSED_HEADER = b"blendgit-decompressed 1 "
+LFS_POINTER_HEADER = b"version https://git-lfs.github.com/spec/v1\n"
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Blender writes gzip at level 1 and zstd at level 3 in independent
+# frames of 1 MiB, indexed by a seek table so it can read them lazily
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 3
+ZSTD_FRAME_SIZE = 1024 * 1024
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A5E
+ZSTD_SEEKABLE_MAGIC = 0x8F92EAB1
+BUFFER_SIZE = 1024 * 1024
+# Blobs read whole by the storage report. Manifests and LFS pointers are
+# far smaller, anything bigger is a file stored as is
+MAX_REPORT_BLOB = 16 * 1024 * 1024
+# Chunks are cut where the rolling hash of the last WINDOW bytes has its
+# low bits clear, which happens every CHUNK_MASK + 1 bytes on average
+WINDOW = 64
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 1024 * 1024
+CHUNK_MASK = (1 << 18) - 1
+# How much of a file is held in memory at once
+SEGMENT_SIZE = 16 * 1024 * 1024
+SCAN_STEP = 256 * 1024
+# Without numpy, finding cut points takes about a second per 5 MiB, so
+# larger files are stored whole
+MAX_PYTHON_CHUNKED = 32 * 1024 * 1024
+COMPRESS_LEVEL = 1
+ZERO_OID = "0" * 40
+
+# Fixed pseudo-random value per byte, so every machine cuts the same way
+GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], "big")
+        for i in range(256)]
+GEAR_ARRAY = numpy.array(GEAR, dtype=numpy.uint32) if numpy else None
+
+
+def find_cut(data: bytes, start: int, end: int) -> Optional[int]:
+    """Finds the length of the chunk starting at data[start]
+
+    The hash of a window is the sum of GEAR over its bytes, so it can be
+    rolled by adding the byte entering and subtracting the one leaving.
+
+    Returns:
+        int: Length of the chunk, or None if no cut point lies in
+            data[start:end] and more data is needed to decide
+    """
+    limit = min(end - start, MAX_CHUNK)
+    if limit < MIN_CHUNK:
+        return None
+    if GEAR_ARRAY is not None:
+        length = _find_cut_numpy(data, start, limit)
+    else:
+        length = _find_cut_python(data, start, limit)
+    if length is None and limit == MAX_CHUNK:
+        return MAX_CHUNK
+    return length
+
+
+def _find_cut_numpy(data: bytes, start: int, limit: int) -> Optional[int]:
+    first = start + MIN_CHUNK - WINDOW
+    values = numpy.frombuffer(data, dtype=numpy.uint8, offset=first,
+                              count=limit - MIN_CHUNK + WINDOW)
+    # Scan in steps, since the cut is usually found well before limit
+    for step in range(0, len(values) - WINDOW + 1, SCAN_STEP):
+        gear = GEAR_ARRAY[values[step:step + SCAN_STEP + WINDOW]]
+        sums = numpy.zeros(len(gear) + 1, dtype=numpy.uint32)
+        numpy.cumsum(gear, dtype=numpy.uint32, out=sums[1:])
+        hashes = sums[WINDOW:] - sums[:-WINDOW]
+        hits = numpy.flatnonzero((hashes & CHUNK_MASK) == 0)
+        if hits.size:
+            return MIN_CHUNK + step + int(hits[0])
+    return None
+
+
+def _find_cut_python(data: bytes, start: int, limit: int) -> Optional[int]:
+    length = MIN_CHUNK
+    value = sum(GEAR[b] for b in data[start + length - WINDOW:
+                                      start + length]) & 0xffffffff
+    while True:
+        if not value & CHUNK_MASK:
+            return length
+        if length == limit:
+            return None
+        value = (value + GEAR[data[start + length]]
+                 - GEAR[data[start + length - WINDOW]]) & 0xffffffff
+        length += 1
+
+
+def iter_chunks(stream: BinaryIO) -> Iterator[bytes]:
+    """Splits a stream into content-defined chunks"""
+    data = b""
+    start = 0
+    eof = False
+    while True:
+        length = find_cut(data, start, len(data))
+        if length is None:
+            if eof:
+                if start < len(data):
+                    yield data[start:]
+                return
+            block = stream.read(SEGMENT_SIZE)
+            eof = not block
+            data = data[start:] + block
+            start = 0
+            continue
+        yield data[start:start + length]
+        start += length
+
+
+class ChunkStore:
+    """Directory of zlib compressed chunks named by their SHA-256"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, oid: str) -> str:
+        return os.path.join(self.directory, oid[:2], oid[2:])
+
+    def __contains__(self, oid: str) -> bool:
+        return os.path.exists(self.path(oid))
+
+    def put(self, chunk: bytes) -> str:
+        oid = hashlib.sha256(chunk).hexdigest()
+        path = self.path(oid)
+        if os.path.exists(path):
+            return oid
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(chunk, COMPRESS_LEVEL))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return oid
+
+    def get(self, oid: str) -> bytes:
+        try:
+            with open(self.path(oid), "rb") as f:
+                chunk = zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            raise LookupError(f"Chunk {oid} is missing or damaged") from e
+        if hashlib.sha256(chunk).hexdigest() != oid:
+            raise LookupError(f"Chunk {oid} is damaged")
+        return chunk
+
+
+def read_manifest(data: bytes) -> Tuple[str, List[Tuple[str, int]]]:
+    """Parses a manifest
+
+    Returns:
+        tuple: The compression to restore ("" for none) and the (oid, size)
+            of each chunk
+    """
+    compression = ""
+    chunks = []
+    for line in data[len(MANIFEST_HEADER):].decode("ascii").splitlines():
+        key, value = line.split()
+        if key == "compression":
+            compression = value
+        else:
+            chunks.append((key, int(value)))
+    return compression, chunks
+
+
+def lfs_pointer_size(data: bytes) -> Optional[int]:
+    """Returns the size of the object an LFS pointer refers to"""
+    if not data.startswith(LFS_POINTER_HEADER):
+        return None
+    for line in data.decode("ascii", "replace").splitlines():
+        if line.startswith("size "):
+            return int(line[5:])
+    return None
+
+
+class _Prepend:
+    """Stream yielding some already consumed bytes before the rest"""
+
+    def __init__(self, head: bytes, stream: BinaryIO):
+        self.head = head
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.head:
+            return self.stream.read(size)
+        if 0 <= size < len(self.head):
+            head, self.head = self.head[:size], self.head[size:]
+            return head
+        head, self.head = self.head, b""
+        if size < 0:
+            return head + self.stream.read()
+        return head + self.stream.read(size - len(head))
+
+
+class ChunkReader:
+    """Stream over the chunks listed in a manifest, read as needed"""
+
+    def __init__(self, store: ChunkStore, chunks: List[Tuple[str, int]]):
+        self.store = store
+        self.chunks = iter(chunks)
+        self.buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self.buffer) < size:
+            oid = next(self.chunks, (None,))[0]
+            if oid is None:
+                break
+            self.buffer += self.store.get(oid)
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class _Writer:
+    """Stream writing to target unchanged"""
+
+    def __init__(self, target: BinaryIO):
+        self.target = target
+
+    def write(self, data: bytes):
+        self.target.write(data)
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "_Writer":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class SeekableZstdWriter(_Writer):
+    """Writes zstd like Blender: independent frames and a seek table
+
+    Blender only opens zstd files that end in a seek table, as described
+    by the zstd seekable format.
+    """
+
+    def __init__(self, target: BinaryIO):
+        super().__init__(target)
+        self.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        self.buffer = bytearray()
+        self.frames: List[Tuple[int, int]] = []
+
+    def write(self, data: bytes):
+        self.buffer += data
+        while len(self.buffer) >= ZSTD_FRAME_SIZE:
+            self.write_frame(bytes(self.buffer[:ZSTD_FRAME_SIZE]))
+            del self.buffer[:ZSTD_FRAME_SIZE]
+
+    def write_frame(self, data: bytes):
+        frame = self.compressor.compress(data)
+        self.target.write(frame)
+        self.frames.append((len(frame), len(data)))
+
+    def close(self):
+        if self.buffer:
+            self.write_frame(bytes(self.buffer))
+            self.buffer.clear()
+        table = b"".join(struct.pack("<II", *frame) for frame in self.frames)
+        # No checksums (descriptor 0)
+        table += struct.pack("<IBI", len(self.frames), 0,
+                             ZSTD_SEEKABLE_MAGIC)
+        self.target.write(struct.pack("<II", ZSTD_SKIPPABLE_MAGIC,
+                                      len(table)))
+        self.target.write(table)
+
+
+def detect_compression(head: bytes) -> str:
+    """Names the compression of a .blend file from its first bytes"""
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    # Without zstandard, zstd files are stored compressed
+    if head.startswith(ZSTD_MAGIC) and zstandard is not None:
+        return "zstd"
+    return ""
+
+
+def open_decompressed(source: BinaryIO, compression: str) -> BinaryIO:
+    if compression == "gzip":
+        return gzip.GzipFile(filename="", mode="rb", fileobj=source)
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(
+            source, read_across_frames=True)
+    return source
+
+
+def open_compressed(target: BinaryIO, compression: str):
+    """Returns a writer compressing to target the way Blender would"""
+    if compression == "gzip":
+        return gzip.GzipFile(filename="", mode="wb", fileobj=target,
+                             compresslevel=GZIP_LEVEL, mtime=0)
+    if compression == "zstd" and zstandard is not None:
+        return SeekableZstdWriter(target)
+    if compression:
+        print(f"blendgit: cannot compress with {compression}, "
+              "checking out uncompressed", file=sys.stderr)
+    return _Writer(target)
+
+
+def clean(source: BinaryIO, target: BinaryIO,
+          store: Optional[ChunkStore] = None):
+    """Turns a file into what git stores
+
+    Compressed files are decompressed. With a chunk store, the result is
+    replaced by the manifest of its chunks.
+    """
+    head = source.read(len(DECOMPRESSED_HEADER))
+    if head.startswith((MANIFEST_HEADER, DECOMPRESSED_HEADER)):
+        # Already cleaned, e.g. when checked out without the filter
+        target.write(head)
+        shutil.copyfileobj(source, target, BUFFER_SIZE)
+        return
+    compression = detect_compression(head)
+    stream = open_decompressed(_Prepend(head, source), compression)
+    if store is None:
+        if compression:
+            target.write(DECOMPRESSED_HEADER
+                         + compression.encode("ascii") + b"\n")
+        shutil.copyfileobj(stream, target, BUFFER_SIZE)
+        return
+    target.write(MANIFEST_HEADER)
+    if compression:
+        target.write(f"compression {compression}\n".encode("ascii"))
+    for chunk in iter_chunks(stream):
+        target.write(f"{store.put(chunk)} {len(chunk)}\n".encode("ascii"))
+
+
+def chunking_too_slow(path: Optional[str]) -> bool:
+    """Checks if a file is too large to be chunked without numpy"""
+    if GEAR_ARRAY is not None or not path:
+        return False
+    try:
+        return os.path.getsize(path) > MAX_PYTHON_CHUNKED
+    except OSError:
+        return False
+
+
+def lfs_command(command: str, path: Optional[str]) -> List[str]:
+    """Command line of one side of the LFS filter, for the file at path"""
+    return ["git", "lfs", command] + (["--", path] if path else [])
+
+
+def clean_to_lfs(source: BinaryIO, target: BinaryIO, path: Optional[str],
+                 store: Optional[ChunkStore] = None):
+    """Cleans a file, storing the result in LFS unless it was chunked"""
+    if store is not None:
+        clean(source, target, store)
+        return
+    target.flush()
+    process = subprocess.Popen(lfs_command("clean", path),
+                               stdin=subprocess.PIPE, stdout=target)
+    try:
+        clean(source, process.stdin)
+    except BrokenPipeError:
+        # LFS stopped reading, its exit code tells why
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode,
+                                            process.args)
+
+
+def smudge(source: BinaryIO, target: BinaryIO,
+           store: Optional[ChunkStore] = None,
+           path: Optional[str] = None, lfs: bool = True):
+    """Restores a file from what git stores
+
+    Args:
+        path: Path of the file in the repository, for git lfs smudge
+        lfs: Resolve LFS pointers, False for what LFS itself returned
+    """
+    head = source.read(len(LFS_POINTER_HEADER))
+    if head.startswith(LFS_POINTER_HEADER) and lfs:
+        # Stored in LFS, either by this filter or before it was enabled.
+        # The pointer is small enough to never fill the pipe
+        process = subprocess.Popen(lfs_command("smudge", path),
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE)
+        try:
+            process.stdin.write(head + source.read())
+            process.stdin.close()
+            # A pointer coming back (LFS skipping smudge) is kept as is
+            smudge(process.stdout, target, store, path, lfs=False)
+        finally:
+            process.stdout.close()
+            process.wait()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode,
+                                                process.args)
+    elif head.startswith(MANIFEST_HEADER):
+        if store is None:
+            raise LookupError("No chunk store to restore chunks from")
+        compression, chunks = read_manifest(head + source.read())
+        with open_compressed(target, compression) as stream:
+            for oid, _ in chunks:
+                stream.write(store.get(oid))
+    elif head.startswith(DECOMPRESSED_HEADER):
+        if b"\n" not in head:
+            head += source.readline()
+        line, _, body = head.partition(b"\n")
+        compression = line[len(DECOMPRESSED_HEADER):].decode("ascii")
+        with open_compressed(target, compression) as stream:
+            stream.write(body)
+            shutil.copyfileobj(source, stream, BUFFER_SIZE)
+    else:
+        # Committed as is before the filter was enabled
+        target.write(head)
+        shutil.copyfileobj(source, target, BUFFER_SIZE)
+
+
+def read_exact(stream: BinaryIO, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        block = stream.read(size - len(data))
+        if not block:
+            break
+        data += block
+    return data
+
+
+@contextlib.contextmanager
+def open_blob(work_dir: str, common_dir: str,
+              oid: str) -> Iterator[Optional[BinaryIO]]:
+    """Opens the .blend a blob stands for, however git stores it
+
+    Yields None when the content is not available locally, like an LFS
+    object that was never fetched.
+    """
+    process = subprocess.Popen(["git", "cat-file", "blob", oid],
+                               cwd=work_dir, stdout=subprocess.PIPE)
+    try:
+        head = read_exact(process.stdout, len(LFS_POINTER_HEADER))
+        if head.startswith(LFS_POINTER_HEADER):
+            pointer = (head + process.stdout.read()).decode("ascii")
+            lfs_oid = pointer.split("oid sha256:")[1].split()[0]
+            path = os.path.join(common_dir, "lfs", "objects",
+                                lfs_oid[:2], lfs_oid[2:4], lfs_oid)
+            if not os.path.exists(path):
+                yield None
+                return
+            with open(path, "rb") as f:
+                yield _restored(f)
+        elif head.startswith(MANIFEST_HEADER):
+            _, chunks = read_manifest(head + process.stdout.read())
+            store = ChunkStore(os.path.join(common_dir, "blendgit",
+                                            "chunks"))
+            yield ChunkReader(store, chunks)
+        else:
+            yield _restored(_Prepend(head, process.stdout))
+    finally:
+        process.kill()
+        process.wait()
+        process.stdout.close()
+
+
+def _restored(stream: BinaryIO) -> BinaryIO:
+    """Reads the .blend in a stream holding the decompressed form or the
+    file itself"""
+    head = read_exact(stream, len(DECOMPRESSED_HEADER))
+    if not head.startswith(DECOMPRESSED_HEADER):
+        return _decompressed(_Prepend(head, stream))
+    # Skip the rest of the header line, a few bytes
+    while b"\n" not in head:
+        block = stream.read(1)
+        if not block:
+            break
+        head += block
+    return _Prepend(head.partition(b"\n")[2], stream)
+
+
+def _decompressed(stream: BinaryIO) -> BinaryIO:
+    head = read_exact(stream, MAX_HEADER_SIZE)
+    return open_decompressed(_Prepend(head, stream),
+                             detect_compression(head))
+
+
+def chunk_store_for(path: str) -> ChunkStore:
+    """Returns the chunk store of the repository containing path"""
+    git_dir = os.environ.get("GIT_DIR")
+    if git_dir:
+        git_dir = resolve_git_dir(os.path.abspath(git_dir))
+    if git_dir:
+        common_dir = git_dir
+        commondir = read_text(os.path.join(git_dir, "commondir"))
+        if commondir:
+            common_dir = os.path.normpath(os.path.join(git_dir, commondir))
+    else:
+        repository = find_repository(path)
+        if repository is None:
+            raise FileNotFoundError(f"No repository found at {path}")
+        common_dir = repository.common_dir
+    return ChunkStore(os.path.join(common_dir, "blendgit", "chunks"))
+
+
+def _git(work_dir: str, *args: str, data: Optional[bytes] = None) -> bytes:
+    return subprocess.run(["git", *args], cwd=work_dir, input=data,
+                          stdout=subprocess.PIPE, check=True).stdout
+
+
+def has_remote(work_dir: str) -> bool:
+    """Checks if the repository has a remote, which chunks would not
+    reach"""
+    return bool(_git(work_dir, "remote").strip())
+
+
+def read_blobs(work_dir: str, oids: List[str],
+               max_size: int = MAX_REPORT_BLOB
+               ) -> Tuple[Dict[str, int], Dict[str, bytes]]:
+    """Reads the sizes of many blobs, and the content of the small ones
+
+    Returns:
+        tuple: Size by oid, and content by oid for blobs up to max_size
+    """
+    request = "".join(oid + "\n" for oid in oids).encode("ascii")
+    sizes = {}
+    for line in _git(work_dir, "cat-file", "--batch-check",
+                     data=request).decode("ascii").splitlines():
+        fields = line.split()
+        # Missing objects are reported as "<oid> missing"
+        if len(fields) == 3:
+            sizes[fields[0]] = int(fields[2])
+    small = [oid for oid, size in sizes.items() if size <= max_size]
+    contents = {}
+    if not small:
+        return sizes, contents
+    output = _git(work_dir, "cat-file", "--batch",
+                  data="".join(oid + "\n" for oid in small).encode("ascii"))
+    offset = 0
+    while offset < len(output):
+        end = output.index(b"\n", offset)
+        oid, _, size = output[offset:end].decode("ascii").split()
+        offset = end + 1
+        contents[oid] = output[offset:offset + int(size)]
+        # The content is followed by a newline
+        offset += int(size) + 1
+    return sizes, contents
+
+
+def blob_ids(work_dir: str, path: str,
+             revs: List[str]) -> Dict[str, Optional[str]]:
+    """Resolves rev:path for many revisions with one git call"""
+    request = "".join(f"{rev}:{path}\n" for rev in revs).encode("utf-8")
+    output = subprocess.run(["git", "cat-file", "--batch-check"],
+                            cwd=work_dir, input=request,
+                            stdout=subprocess.PIPE, check=True).stdout
+    blobs = {}
+    for rev, line in zip(revs, output.decode("utf-8").splitlines()):
+        fields = line.split()
+        blobs[rev] = fields[0] if fields[1:2] == ["blob"] else None
+    return blobs
+
+
+def storage_report(work_dir: str, rev: str = "HEAD") -> List[Dict]:
+    """Measures how much chunking saved in each commit touching .blend files
+
+    For each commit, "size" is what storing every changed .blend file in
+    full would take, and "stored" is the size of the chunks no earlier
+    commit had, both uncompressed.
+    """
+    output = _git(work_dir, "log", "--reverse", "--raw", "--no-abbrev",
+                  "--no-renames", "-z",
+                  "--format=%x1e%H%x1f%cs%x1f%s", rev)
+    commits = []
+    for record in output.decode("utf-8", "replace").split("\x1e"):
+        if not record:
+            continue
+        header, _, raw = record.partition("\0")
+        oid, date, message = header.split("\x1f", 2)
+        fields = raw.lstrip("\n").split("\0")
+        blobs = [meta.split()[3] for meta, path
+                 in zip(fields[::2], fields[1::2])
+                 if path.endswith(".blend") and meta.split()[3] != ZERO_OID]
+        if blobs:
+            commits.append((oid, date, message, blobs))
+
+    sizes, contents = read_blobs(
+        work_dir, sorted({blob for *_, blobs in commits for blob in blobs}))
+    seen = set()
+    rows = []
+    for oid, date, message, blobs in commits:
+        size = stored = 0
+        for blob in blobs:
+            content = contents.get(blob, b"")
+            if not content.startswith(MANIFEST_HEADER):
+                # Stored whole, outside the chunk store
+                whole = lfs_pointer_size(content)
+                if whole is None:
+                    whole = sizes.get(blob, 0)
+                size += whole
+                stored += whole
+                continue
+            for chunk, chunk_size in read_manifest(content)[1]:
+                size += chunk_size
+                if chunk not in seen:
+                    seen.add(chunk)
+                    stored += chunk_size
+        rows.append({
+            "hash": oid, "date": date, "message": message,
+            "size": size, "stored": stored,
+            "ratio": size / stored if stored else float("inf"),
+        })
+    return rows
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 2 or argv[1] not in ("clean", "smudge", "report"):
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        return 2
+    command = argv[1]
+    if command == "report":
+        for row in storage_report(os.getcwd()):
+            print(f"{row['hash'][:10]} {row['date']} "
+                  f"{row['size']:>14,} {row['stored']:>14,} "
+                  f"{row['ratio']:>8.1f}x  {row['message']}")
+        return 0
+    options = argv[2:]
+    path = None
+    if "--" in options:
+        path = options[options.index("--") + 1]
+        options = options[:options.index("--")]
+    store = chunk_store_for(os.getcwd())
+    chunks = "--chunks" in options
+    if command == "clean" and chunks and has_remote(os.getcwd()):
+        print("blendgit: the repository has a remote, storing the file "
+              "whole instead of as chunks", file=sys.stderr)
+        chunks = False
+    if command == "clean" and chunks and chunking_too_slow(path):
+        print("blendgit: numpy is not available, storing the file whole "
+              "instead of as chunks", file=sys.stderr)
+        chunks = False
+    try:
+        if command == "clean" and "--lfs" in options:
+            clean_to_lfs(sys.stdin.buffer, sys.stdout.buffer, path,
+                         store if chunks else None)
+        elif command == "clean":
+            clean(sys.stdin.buffer, sys.stdout.buffer,
+                  store if chunks else None)
+        else:
+            smudge(sys.stdin.buffer, sys.stdout.buffer, store, path)
+    except subprocess.CalledProcessError as e:
+        print(f"blendgit: {' '.join(e.cmd)} failed", file=sys.stderr)
+        return 1
+    except LookupError as e:
+        print(f"blendgit: {e}", file=sys.stderr)
+        return 1
+    sys.stdout.buffer.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
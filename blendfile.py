@@ -0,0 +1,71 @@
+import struct
+from typing import NamedTuple, Tuple
+
+
+# Legacy files start with "BLENDER", the pointer size ("_" for 4 bytes,
+# "-" for 8), the endianness ("v" little, "V" big) and a 3 digit version.
+# Since Blender 5.0 the header is "BLENDER", its size, "-", a 2 digit
+# file format version, the endianness and a 4 digit version.
+MAGIC = b"BLENDER"
+LEGACY_HEADER_SIZE = 12
+MAX_HEADER_SIZE = 17
+
+
+class BlockHeader(NamedTuple):
+    """Header (BHead) of a block in a .blend file"""
+    code: bytes
+    length: int
+    old_address: int
+    sdna_index: int
+    count: int
+
+
+class FileHeader:
+    """Layout of a .blend file, read from its first bytes
+
+    Attributes:
+        size: Length of the file header
+        version: Blender version that wrote the file, like 402
+        bhead: Struct of the block headers
+    """
+    __slots__ = ("size", "version", "little_endian", "pointer_size",
+                 "bhead", "_large")
+
+    def __init__(self, data: bytes):
+        if not data.startswith(MAGIC):
+            raise ValueError("Not a .blend file")
+        if data[7:9].isdigit():
+            self.size = int(data[7:9])
+            if data[9:10] != b"-" or data[10:12] != b"01":
+                raise ValueError("Unsupported .blend file format")
+            self.pointer_size = 8
+            self.little_endian = data[12:13] == b"v"
+            self.version = int(data[13:17])
+            self._large = True
+        else:
+            self.size = LEGACY_HEADER_SIZE
+            self.pointer_size = 8 if data[7:8] == b"-" else 4
+            self.little_endian = data[8:9] == b"v"
+            self.version = int(data[9:12])
+            self._large = False
+        endian = "<" if self.little_endian else ">"
+        if self._large:
+            # code, SDNA index, old address, length, count
+            self.bhead = struct.Struct(endian + "4siQqq")
+        elif self.pointer_size == 8:
+            # code, length, old address, SDNA index, count
+            self.bhead = struct.Struct(endian + "4siQii")
+        else:
+            self.bhead = struct.Struct(endian + "4siIii")
+
+    def block_header(self, data, offset: int = 0) -> BlockHeader:
+        fields = self.bhead.unpack_from(data, offset)
+        if self._large:
+            code, sdna_index, old_address, length, count = fields
+            return BlockHeader(code, length, old_address, sdna_index, count)
+        return BlockHeader(*fields)
+
+    def ints(self, data, offset: int = 0, count: int = 1) -> Tuple[int, ...]:
+        """Unpacks 32 bit integers in the byte order of the file"""
+        endian = "<" if self.little_endian else ">"
+        return struct.unpack_from(f"{endian}{count}i", data, offset)
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+Signature = Tuple
+
+# Seconds a "files" result stays fresh without a watcher. Only the top
+# level and the tracked .blend files are stat'ed, so other changes to the
+# working tree are noticed after this long.
+WORKTREE_TTL = 5.0
+
+# Which pieces of repository state each kind of query depends on
+DEPENDENCIES = {
+    "files": ("HEAD", "index", "worktree"),
+    "revisions": ("HEAD", "refs", "packed-refs"),
+    "branches": ("HEAD", "refs", "packed-refs"),
+}
+
+
+def stat_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Returns the mtime, size and inode of a path, or None if missing"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def tree_signature(path: str) -> Tuple:
+    """Returns the stat signatures of a directory tree such as .git/refs
+
+    Directories are included so that refs being added or removed, which
+    git does by renaming lock files, are noticed as well.
+    """
+    signatures = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        signatures.append((dirpath, stat_signature(dirpath)))
+        for filename in sorted(filenames):
+            filepath = os.path.join(dirpath, filename)
+            signatures.append((filepath, stat_signature(filepath)))
+    return tuple(signatures)
+
+
+class RepoStateCache:
+    """Caches git query results keyed on cheap stat signatures
+
+    Each kind of query ("files", "revisions", "branches") is only repeated
+    when the .git files or working tree files it depends on have changed,
+    which also catches commits, checkouts and pulls made outside Blender.
+    Other changes to the working tree expire the "files" result after
+    WORKTREE_TTL seconds.
+
+    When a watcher reports changes through mark_dirty(), signatures are
+    event counters instead, so checking freshness costs no stat calls.
+
+    Attributes:
+        hits: Number of lookups answered without running git
+        misses: Number of lookups that required a git query
+        watched: Whether a watcher is reporting changes
+    """
+
+    def __init__(self, work_dir: str,
+                 git_dir: Optional[str] = None,
+                 common_dir: Optional[str] = None):
+        self.work_dir = work_dir
+        self.git_dir = git_dir or os.path.join(work_dir, ".git")
+        # Refs live in the main repository when this is a linked worktree
+        self.common_dir = common_dir or self.git_dir
+        self.hits = 0
+        self.misses = 0
+        self.watched = False
+        self._events = {kind: 0 for kind in DEPENDENCIES}
+        self._values: Dict[str, Any] = {}
+        self._signatures: Dict[str, Signature] = {}
+        self._tracked_files: Tuple[str, ...] = ()
+        self._tracked_index: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+
+    def _part(self, name: str) -> Tuple:
+        if name == "HEAD":
+            return (stat_signature(os.path.join(self.git_dir, "HEAD")),)
+        elif name == "index":
+            return (stat_signature(os.path.join(self.git_dir, "index")),)
+        elif name == "refs":
+            return tree_signature(os.path.join(self.common_dir, "refs"))
+        elif name == "packed-refs":
+            return (stat_signature(
+                os.path.join(self.common_dir, "packed-refs")),)
+        elif name == "worktree":
+            paths = (self.work_dir,) + tuple(
+                os.path.join(self.work_dir, path)
+                for path in self._tracked_files)
+            return (int(time.monotonic() // WORKTREE_TTL),) + tuple(
+                stat_signature(path) for path in paths)
+        raise KeyError(name)
+
+    def file_signature(self, kind: str) -> Signature:
+        """Computes the stat signature of a kind of query"""
+        return tuple(self._part(name) for name in DEPENDENCIES[kind])
+
+    def signature(self, kind: str) -> Signature:
+        """Computes the current signature of a kind of query"""
+        if self.watched:
+            return ("watched", self._events[kind])
+        return self.file_signature(kind)
+
+    def mark_dirty(self, kinds: Iterable[str]):
+        """Records changes reported by a watcher"""
+        with self._lock:
+            for kind in kinds:
+                self._events[kind] += 1
+
+    def set_watched(self, watched: bool):
+        """Switches between watcher events and stat signatures"""
+        with self._lock:
+            self.watched = watched
+            # Signatures of the other mode can never match, so start over
+            self._signatures.clear()
+
+    def is_fresh(self, kind: str) -> bool:
+        """Checks if the stored result of a query is still valid"""
+        with self._lock:
+            if kind not in self._signatures:
+                return False
+            fresh = self._signatures[kind] == self.signature(kind)
+            if fresh:
+                self.hits += 1
+            return fresh
+
+    def stored_signature(self, kind: str) -> Optional[Signature]:
+        """Returns the signature the stored result of a query was taken
+        at, which changes whenever the query runs on changed files"""
+        return self._signatures.get(kind)
+
+    def get(self, kind: str, default: Any = None) -> Any:
+        """Returns the stored result of a query, fresh or not"""
+        return self._values.get(kind, default)
+
+    def store(self, kind: str, signature: Signature, value: Any = None):
+        """Stores a query result
+
+        The signature must be taken before the query runs, so changes
+        made while git was running still invalidate the result.
+        """
+        with self._lock:
+            self.misses += 1
+            self._signatures[kind] = signature
+            self._values[kind] = value
+
+    def cached(self, kind: str, query: Callable[[], Any]) -> Any:
+        """Returns a fresh result, running query only on a miss"""
+        if self.is_fresh(kind):
+            return self._values[kind]
+        signature = self.signature(kind)
+        value = query()
+        self.store(kind, signature, value)
+        return value
+
+    def invalidate(self, kind: Optional[str] = None):
+        """Forgets a stored signature (or all of them)"""
+        with self._lock:
+            if kind is None:
+                self._signatures.clear()
+            else:
+                self._signatures.pop(kind, None)
+
+    def needs_tracked_files(self) -> bool:
+        """Checks if the list of tracked .blend files is outdated"""
+        return self._tracked_index != stat_signature(
+            os.path.join(self.git_dir, "index"))
+
+    def set_tracked_files(self, paths: Iterable[str]):
+        """Sets the tracked .blend files whose stat is part of "files"
+
+        The list only changes along with the index, so it is refreshed
+        before the signature of a files query is taken.
+        """
+        self._tracked_index = stat_signature(
+            os.path.join(self.git_dir, "index"))
+        self._tracked_files = tuple(sorted(paths))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
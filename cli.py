@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Runs Blendgit's repository operations without the sidebar
+
+status prints the branch and changed files, commit commits what is
+staged (with --all, every changed tracked file), autosave snapshots the
+tracked .blend files to their branch's autosave ref and lfs-prefetch
+fetches their LFS objects for recent revisions and the branch tips.
+
+Each repository given is handled in its own process, --jobs at a time
+(one at a time within Blender). With --recursive, the repositories under
+the given directories are found and handled too. Run from Blender as
+`blender -b file.blend --python cli.py -- autosave`, unsaved changes of
+the open file are written to a copy and snapshotted as well.
+
+Usage: cli.py [--jobs N] [--recursive] [--json] [--timeout SECONDS]
+    status|commit|autosave|lfs-prefetch [-m MESSAGE] [--all] [--keep N]
+    [--revisions N] [REPO...]
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+try:
+    from . import core, process
+    from .refs import (Repository, find_repository, list_local_branches,
+                       locate_repository, read_head, resolve_ref)
+except ImportError:
+    # Run as a script. Blender does not put the script's directory on
+    # the path
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import core
+    import process
+    from refs import (Repository, find_repository, list_local_branches,
+                      locate_repository, read_head, resolve_ref)
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+COMMANDS = ("status", "commit", "autosave", "lfs-prefetch")
+# Revisions from the top of the history whose files are fetched ahead
+PREFETCH_REVISIONS = 10
+
+
+def find_repositories(paths: List[str], recursive: bool) -> Iterator[str]:
+    """Yields the work dir of each repository, once"""
+    seen = set()
+    for path in paths:
+        found = []
+        repository = find_repository(path)
+        if repository is not None:
+            found.append(repository.work_dir)
+        if recursive:
+            for directory, subdirs, _ in os.walk(path):
+                if ".git" in subdirs or os.path.isfile(
+                        os.path.join(directory, ".git")):
+                    found.append(os.path.abspath(directory))
+                subdirs[:] = [subdir for subdir in subdirs
+                              if subdir != ".git"]
+        if not found:
+            yield os.path.abspath(path)
+        for work_dir in found:
+            if work_dir not in seen:
+                seen.add(work_dir)
+                yield work_dir
+
+
+def blend_files(work_dir: str) -> List[str]:
+    """Lists the tracked .blend files, with forward slashes"""
+    return [path for path in core.git(work_dir, "ls-files", "-z", "--",
+                                      "*.blend").split("\0") if path]
+
+
+def status(repository: Repository, options: Dict) -> Dict:
+    snapshot = core.read_snapshot(repository.work_dir)
+    return {"branch": snapshot.branch, "clean": snapshot.clean,
+            "ahead": snapshot.ahead, "behind": snapshot.behind,
+            "changes": snapshot.entries}
+
+
+def commit(repository: Repository, options: Dict) -> Dict:
+    work_dir = repository.work_dir
+    if options["all"]:
+        core.git(work_dir, "add", "--update")
+    paths = [entry["file_path"] for entry in core.status(work_dir)
+             if entry["staged"]]
+    if not paths:
+        return {"error": "Nothing to commit"}
+    error = core.commit_files(work_dir, paths, options["message"])
+    if error:
+        return {"error": error}
+    return {"commit": core.git(work_dir, "rev-parse", "HEAD"),
+            "files": paths}
+
+
+def autosave(repository: Repository, options: Dict) -> Dict:
+    branch = read_head(repository)[0] or "detached"
+    sources = options["sources"].get(repository.work_dir, {})
+    snapshots = {}
+    for path in blend_files(repository.work_dir):
+        source = sources.get(path,
+                             os.path.join(repository.work_dir, path))
+        if not os.path.exists(source):
+            continue
+        commit = core.snapshot(repository.work_dir, repository.common_dir,
+                               source, path, branch, options["keep"])
+        if commit is not None:
+            snapshots[path] = commit
+    return {"branch": branch, "snapshots": snapshots}
+
+
+def lfs_prefetch(repository: Repository, options: Dict) -> Dict:
+    work_dir = repository.work_dir
+    revs = [entry["hash"] for entry in
+            core.git_log(work_dir, count=options["revisions"])]
+    for branch in list_local_branches(repository):
+        tip = resolve_ref(repository, f"refs/heads/{branch}")
+        if tip is not None:
+            revs.append(tip)
+    revs = list(dict.fromkeys(revs))
+    fetched = {}
+    # Nothing cancels from here, but prefetch() waits on it between
+    # fetches
+    cancel = threading.Event()
+    for path in blend_files(work_dir):
+        status: Dict[str, str] = {}
+        core.prefetch(work_dir, repository.common_dir, path, revs, status,
+                      cancel)
+        fetched[path] = status
+    failed = sum(list(status.values()).count("failed")
+                 for status in fetched.values())
+    result = {"files": fetched}
+    if failed:
+        result["error"] = f"{failed} revisions could not be fetched"
+    return result
+
+
+def run(command: str, path: str, options: Dict) -> Dict:
+    """Runs a command in one repository, in a worker process"""
+    # What git prints on errors is reported in the result instead
+    process.set_default_timeout(options["timeout"])
+    with contextlib.redirect_stdout(sys.stderr):
+        repository = find_repository(path)
+        if repository is None:
+            return {"repository": path, "error": "Not in a repository"}
+        function = {"status": status, "commit": commit,
+                    "autosave": autosave,
+                    "lfs-prefetch": lfs_prefetch}[command]
+        try:
+            result = function(repository, options)
+        except subprocess.CalledProcessError as e:
+            output = e.output or e.stderr or b""
+            if isinstance(output, bytes):
+                output = output.decode("utf-8", "replace")
+            result = {"error": output.strip() or str(e)}
+        except (subprocess.TimeoutExpired, OSError, ValueError) as e:
+            result = {"error": str(e)}
+    return {"repository": repository.work_dir, **result}
+
+
+def save_open_file() -> Dict[str, Dict[str, str]]:
+    """Writes the unsaved changes of the file open in Blender to a copy
+
+    Returns:
+        dict: The copy to snapshot instead of the file, by work dir and
+            path in the repository
+    """
+    if bpy is None or not bpy.data.filepath or not bpy.data.is_dirty:
+        return {}
+    repository = locate_repository(bpy.data.filepath)
+    if repository is None:
+        return {}
+    path = os.path.relpath(bpy.data.filepath, repository.work_dir) \
+        .replace(os.sep, "/")
+    directory = core.autosave_dir(repository.common_dir)
+    os.makedirs(directory, exist_ok=True)
+    source = os.path.join(directory, os.path.basename(path))
+    # Relative paths stay relative to the file, not to the copy
+    bpy.ops.wm.save_as_mainfile(filepath=source, copy=True,
+                                check_existing=False, relative_remap=False)
+    return {repository.work_dir: {path: source}}
+
+
+def describe(command: str, result: Dict) -> str:
+    """Formats a result as one line of text"""
+    line = result["repository"]
+    if command == "status" and "branch" in result:
+        changes = len(result["changes"])
+        line += f": {result['branch']}, " + \
+            ("clean" if result["clean"] else f"{changes} changed")
+    elif command == "commit" and "commit" in result:
+        line += f": {result['commit'][:7]}, {len(result['files'])} files"
+    elif command == "autosave" and "branch" in result:
+        line += f": {len(result['snapshots'])} new snapshots " \
+            f"on {result['branch']}"
+    elif command == "lfs-prefetch" and "files" in result:
+        line += f": {len(result['files'])} files"
+    if result.get("error"):
+        line += f": {result['error']}"
+    return line
+
+
+def main(argv: List[str]) -> int:
+    # Blender passes the script's own arguments after "--"
+    if "--" in argv:
+        argv = argv[argv.index("--"):]
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("repositories", nargs="*", default=["."],
+                        metavar="REPO")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(),
+                        help="Repositories handled at once")
+    parser.add_argument("--recursive", "-r", action="store_true",
+                        help="Also handle the repositories in REPO")
+    parser.add_argument("--json", action="store_true",
+                        help="Print one JSON object per repository")
+    parser.add_argument("--message", "-m", help="Commit message")
+    parser.add_argument("--all", "-a", action="store_true",
+                        help="Commit every changed tracked file")
+    parser.add_argument("--keep", type=int, default=core.AUTOSAVE_KEEP,
+                        help="Autosave snapshots kept per branch")
+    parser.add_argument("--revisions", type=int,
+                        default=PREFETCH_REVISIONS,
+                        help="Recent revisions whose files are fetched")
+    parser.add_argument("--timeout", type=float,
+                        help="Seconds after which a git command is given up")
+    args = parser.parse_intermixed_args(argv[1:])
+    if args.command == "commit" and not args.message:
+        parser.error("commit needs a message")
+
+    options = {"message": args.message, "all": args.all, "keep": args.keep,
+               "revisions": args.revisions, "timeout": args.timeout,
+               "sources": {}}
+    if args.command == "autosave":
+        options["sources"] = save_open_file()
+    paths = list(find_repositories(args.repositories, args.recursive))
+
+    failed = False
+    pool: Optional[ProcessPoolExecutor] = None
+    # Blender is not forked, repositories are handled one at a time there
+    if args.jobs > 1 and len(paths) > 1 and bpy is None:
+        pool = ProcessPoolExecutor(max_workers=min(args.jobs, len(paths)))
+        results = pool.map(run, [args.command] * len(paths), paths,
+                           [options] * len(paths))
+    else:
+        results = (run(args.command, path, options) for path in paths)
+    try:
+        for result in results:
+            failed = failed or bool(result.get("error"))
+            if args.json:
+                print(json.dumps(result), flush=True)
+            else:
+                print(describe(args.command, result), flush=True)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,342 @@
+import os
+import sqlite3
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+
+SCHEMA_VERSION = "3"
+# Upper bound on the known tips passed to git log as exclusions
+MAX_EXCLUDED_TIPS = 256
+# Heads whose history order is kept, the least recently ordered go first
+MAX_ORDERED_HEADS = 8
+# Commits followed down from a head to find an ordered head to build on
+MAX_LINEAR_COMMITS = 100
+LOG_FORMAT = "--format=%x1e%H%x1f%P%x1f%ct%x1f%cs%x1f%an%x1f%s"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS commits (
+    oid TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    author TEXT NOT NULL,
+    subject TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parents (
+    oid TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (oid, position)
+);
+CREATE INDEX IF NOT EXISTS parents_by_parent ON parents (parent);
+CREATE TABLE IF NOT EXISTS paths (
+    oid TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (oid, path)
+);
+CREATE INDEX IF NOT EXISTS paths_by_path ON paths (path);
+CREATE TABLE IF NOT EXISTS tips (
+    oid TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS ordered_heads (
+    head TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ordered (
+    head TEXT NOT NULL,
+    ordinal INTEGER NOT NULL,
+    oid TEXT NOT NULL,
+    PRIMARY KEY (head, ordinal)
+) WITHOUT ROWID;
+"""
+
+# Numbers the history of a head from 1, newest first
+ORDER_QUERY = """
+WITH RECURSIVE reachable(oid) AS (
+    SELECT ?
+    UNION
+    SELECT parents.parent FROM parents
+    JOIN reachable ON parents.oid = reachable.oid
+)
+INSERT INTO ordered
+SELECT ?, ROW_NUMBER() OVER (ORDER BY commits.seq DESC), commits.oid
+FROM commits JOIN reachable ON commits.oid = reachable.oid
+"""
+
+# Pages through the numbered history without counting the skipped rows
+HISTORY_QUERY = """
+SELECT commits.oid, commits.date, commits.subject FROM ordered
+JOIN commits ON commits.oid = ordered.oid
+WHERE ordered.head = ? AND ordered.ordinal > ?
+ORDER BY ordered.ordinal
+LIMIT ?
+"""
+
+# Matches a GLOB pattern against the date, message and hash of the
+# history, the text the revision list filters on, lowercased
+SEARCH_QUERY = """
+SELECT commits.oid, commits.date, commits.subject FROM ordered
+JOIN commits ON commits.oid = ordered.oid
+WHERE ordered.head = ? AND (lower(commits.date || ' ' || commits.subject
+                                  || ' ' || commits.oid) GLOB ?) != ?
+ORDER BY ordered.ordinal
+LIMIT ?
+"""
+
+TABLES = ("commits", "parents", "paths", "tips", "ordered_heads", "ordered")
+
+GitRunner = Callable[..., str]
+Commit = Tuple[str, List[str], int, str, str, str, List[str]]
+
+
+def parse_log(output: str) -> Iterator[Commit]:
+    """Parses `git log -z --name-only` output in LOG_FORMAT
+
+    Yields:
+        (oid, parents, time, date, author, subject, paths) per commit
+    """
+    for record in output.split("\x1e"):
+        if not record:
+            continue
+        header, _, names = record.partition("\0")
+        oid, parents, time, date, author, subject = header.split("\x1f", 5)
+        paths = [path for path in names.lstrip("\n").split("\0") if path]
+        yield (oid, parents.split(), int(time), date, author, subject,
+               paths)
+
+
+class CommitIndex:
+    """Persistent index of commit metadata in .git/blendgit
+
+    Every indexed commit has its whole ancestry indexed too, so updating
+    only has to walk from a new HEAD down to the commits already known.
+    Each instance owns one SQLite connection and must stay on the thread
+    that created it.
+    """
+
+    def __init__(self, git_dir: str):
+        directory = os.path.join(git_dir, "blendgit")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "commits.sqlite")
+        self.shallow = os.path.exists(os.path.join(git_dir, "shallow"))
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+        version = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if version is None or version[0] != SCHEMA_VERSION:
+            # Tables of older versions may lack keys, so they are made
+            # again rather than emptied
+            for table in TABLES:
+                self.db.execute(f"DROP TABLE IF EXISTS {table}")
+            self.db.executescript(SCHEMA)
+            self.clear()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self) -> "CommitIndex":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def clear(self):
+        with self.db:
+            for table in TABLES:
+                self.db.execute(f"DELETE FROM {table}")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES "
+                            "('version', ?)", (SCHEMA_VERSION,))
+
+    def __contains__(self, oid: str) -> bool:
+        return self.db.execute("SELECT 1 FROM commits WHERE oid = ?",
+                               (oid,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM commits").fetchone()[0]
+
+    def tips(self) -> List[str]:
+        return [row[0] for row in self.db.execute(
+            "SELECT tips.oid FROM tips JOIN commits USING (oid) "
+            "ORDER BY commits.time DESC LIMIT ?", (MAX_EXCLUDED_TIPS,))]
+
+    def update(self, git: GitRunner, head: str) -> int:
+        """Indexes the commits reachable from head that are not known yet
+
+        Args:
+            git: Runs git with the given arguments and returns its output
+            head: Full hash of the commit to index from
+
+        Returns:
+            int: Number of commits added
+        """
+        if head in self:
+            return 0
+        commits = list(parse_log(git(
+            "log", "-z", "--name-only", "--no-renames", LOG_FORMAT,
+            "--ignore-missing", head, "--not", *self.tips())))
+        if not self.ancestry_complete(commits):
+            # History was rewritten underneath the index (or objects were
+            # pruned), so known tips no longer cover what they used to
+            self.clear()
+            commits = list(parse_log(git(
+                "log", "-z", "--name-only", "--no-renames", LOG_FORMAT,
+                head)))
+        self.insert(head, commits)
+        return len(commits)
+
+    def ancestry_complete(self, commits: List[Commit]) -> bool:
+        """Checks that every parent of a batch is in the batch or index"""
+        if self.shallow:
+            return True
+        batch: Set[str] = {commit[0] for commit in commits}
+        for commit in commits:
+            for parent in commit[1]:
+                if parent not in batch and parent not in self:
+                    return False
+        return True
+
+    def insert(self, head: str, commits: List[Commit]):
+        seq = self.db.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM commits").fetchone()[0]
+        with self.db:
+            for oid, parents, time, date, author, subject, paths \
+                    in reversed(commits):
+                seq += 1
+                self.db.execute(
+                    "INSERT OR IGNORE INTO commits VALUES (?, ?, ?, ?, ?, ?)",
+                    (oid, seq, time, date, author, subject))
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO parents VALUES (?, ?, ?)",
+                    [(oid, parent, i) for i, parent in enumerate(parents)])
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO paths VALUES (?, ?)",
+                    [(oid, path) for path in paths])
+                self.db.executemany(
+                    "DELETE FROM tips WHERE oid = ?",
+                    [(parent,) for parent in parents])
+            if commits:
+                self.db.execute("INSERT OR IGNORE INTO tips VALUES (?)",
+                                (head,))
+
+    def is_ordered(self, head: str) -> bool:
+        return self.db.execute("SELECT 1 FROM ordered_heads WHERE head = ?",
+                               (head,)).fetchone() is not None
+
+    def linear_base(self, head: str) -> Tuple[Optional[str], List[str]]:
+        """Follows single parents from head down to an ordered head
+
+        Returns:
+            The ordered head, None if there is none close enough, and the
+            commits above it, newest first
+        """
+        chain = [head]
+        while len(chain) <= MAX_LINEAR_COMMITS:
+            parents = self.db.execute(
+                "SELECT parent FROM parents WHERE oid = ?",
+                (chain[-1],)).fetchall()
+            if len(parents) != 1:
+                break
+            if self.is_ordered(parents[0][0]):
+                return parents[0][0], chain
+            chain.append(parents[0][0])
+        return None, chain
+
+    def order(self, head: str):
+        """Numbers the history of head, unless it already is
+
+        Walking the ancestry costs as much as the history is long, so it
+        is done once per head rather than for every page. A head that
+        only adds commits on top of an ordered one copies its numbers.
+        """
+        if head not in self or self.is_ordered(head):
+            return
+        seq = self.db.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM ordered_heads").fetchone()[0]
+        base, chain = self.linear_base(head)
+        with self.db:
+            if base is None:
+                self.db.execute(ORDER_QUERY, (head, head))
+            else:
+                # The commits above have higher seq than all of the base
+                self.db.executemany(
+                    "INSERT INTO ordered VALUES (?, ?, ?)",
+                    [(head, i + 1, oid) for i, oid in enumerate(chain)])
+                self.db.execute(
+                    "INSERT INTO ordered SELECT ?, ordinal + ?, oid "
+                    "FROM ordered WHERE head = ?", (head, len(chain), base))
+            self.db.execute("INSERT INTO ordered_heads VALUES (?, ?)",
+                            (head, seq + 1))
+            for old_head, in self.db.execute(
+                    "SELECT head FROM ordered_heads ORDER BY seq DESC "
+                    "LIMIT -1 OFFSET ?", (MAX_ORDERED_HEADS,)).fetchall():
+                self.db.execute("DELETE FROM ordered WHERE head = ?",
+                                (old_head,))
+                self.db.execute("DELETE FROM ordered_heads WHERE head = ?",
+                                (old_head,))
+
+    def history(self, head: str, skip: int = 0,
+                count: int = -1) -> Iterator[Dict[str, str]]:
+        """Yields the history of head in the order git log walked it
+
+        Args:
+            skip: Number of commits to skip from the start of the history
+            count: Maximum number of commits, -1 for all of them
+        """
+        self.order(head)
+        for oid, date, subject in self.db.execute(HISTORY_QUERY,
+                                                  (head, skip, count)):
+            yield {"hash": oid, "date": date, "message": subject}
+
+    def search(self, head: str, pattern: str, invert: bool = False,
+               count: int = -1) -> Iterator[Dict[str, str]]:
+        """Yields the commits in the history of head that match a GLOB
+        pattern, newest first
+
+        Args:
+            pattern: Matched against "date message hash", lowercased
+            invert: Yield the commits that do not match instead
+            count: Maximum number of commits, -1 for all of them
+        """
+        self.order(head)
+        for oid, date, subject in self.db.execute(
+                SEARCH_QUERY, (head, pattern, invert, count)):
+            yield {"hash": oid, "date": date, "message": subject}
+
+    def changed_paths(self, oid: str) -> List[str]:
+        return [row[0] for row in self.db.execute(
+            "SELECT path FROM paths WHERE oid = ?", (oid,))]
+
+    def commits_touching(self, path: str) -> List[str]:
+        return [row[0] for row in self.db.execute(
+            "SELECT paths.oid FROM paths JOIN commits USING (oid) "
+            "WHERE path = ? ORDER BY commits.time DESC", (path,))]
+
+
+def read_history(git: GitRunner, git_dir: str,
+                 head: Optional[str] = None, skip: int = 0,
+                 count: int = -1) -> Tuple[str, List[Dict]]:
+    """Brings the index up to date and returns one page of the history
+    of head, HEAD by default
+
+    Args:
+        skip: Number of commits to skip from the start of the history
+        count: Maximum number of commits, -1 for all of them
+    """
+    if head is None:
+        head = git("rev-parse", "HEAD").strip()
+    with CommitIndex(git_dir) as index:
+        index.update(git, head)
+        return head, list(index.history(head, skip, count))
+
+
+def search_history(git: GitRunner, git_dir: str, head: str, pattern: str,
+                   invert: bool = False,
+                   count: int = -1) -> List[Dict]:
+    """Brings the index up to date and returns the commits in the
+    history of head that match a GLOB pattern, see CommitIndex.search()"""
+    with CommitIndex(git_dir) as index:
+        index.update(git, head)
+        return list(index.search(head, pattern, invert, count))
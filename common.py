@@ -1,15 +1,21 @@
-from nt import listdir
 import time
 import os
-import subprocess
 import logging
-from typing import Dict, List, Tuple
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
 from shutil import which
 
 import bpy
 
+from . import core, executor, tracing
+from .cache import RepoStateCache
+from .index_reader import worktree_status
+from .refs import (Repository, has_reftable, list_local_branches,
+                   locate_repository, read_head)
+from .snapshot import RepoSnapshot
 
-num_git_operations = 0
+
+current_snapshot: Optional[RepoSnapshot] = None
 
 
 def log(*args):
@@ -34,16 +40,25 @@ def get_blendgit():
 
 
 def working_dir_clean(force_check: bool = False):
-    """Checks if working dir is clean"""
-    blendgit = get_blendgit()
-    if blendgit.working_dir_is_clean is not None \
-            and not force_check:
-        return blendgit.working_dir_is_clean
-    else:
-        print("working_dir_is_clean is None")
-        blendgit.working_dir_is_clean = not do_git("status",
-                                                   "--porcelain")
-        return blendgit.working_dir_is_clean
+    """Checks if working dir is clean
+
+    Tracked files are first compared with the stat data in .git/index,
+    so a modified file is noticed without running git. Git is still asked
+    when that is inconclusive, or to catch staged and untracked changes.
+    """
+    repository = get_repository()
+    status = None
+    if repository is not None:
+        try:
+            status = worktree_status(repository.work_dir, repository.git_dir,
+                                     repository.common_dir)
+        except (OSError, ValueError) as e:
+            # No index yet, or one this reader does not understand
+            logging.debug(f"Falling back to git status: {e}")
+    if status is not None and status.clean is False:
+        return False
+    return get_snapshot(force_check or status is None
+                        or status.clean is None).clean
 
 
 def has_git() -> bool:
@@ -58,34 +73,91 @@ def has_git() -> bool:
     return False
 
 
+def get_repository() -> Optional[Repository]:
+    """Finds the repository of the open .blend file, if there is one"""
+    if not doc_saved():
+        return None
+    return locate_repository(bpy.data.filepath)
+
+
 def check_repo_exists() -> bool:
-    if os.path.exists(os.path.join(get_work_dir(), ".git")):
-        return True
-    return False
+    return get_repository() is not None
 
 
 def get_work_dir():
-    """Gets work directory"""
-    path = os.path.split(bpy.data.filepath)[0]
-    for _ in range(3):
-        for file in listdir(path):
-            if file.startswith(".git"):
-                return path
-        path = os.path.join(path, "..")
-
-    raise Exception()
+    """Gets work directory
+
+    This is the top level of the repository containing the .blend file,
+    or the file's own directory if it is not in a repository yet.
+    """
+    repository = get_repository()
+    if repository is not None:
+        return repository.work_dir
+    if not doc_saved():
+        raise Exception("The file needs to be saved first")
+    return os.path.dirname(os.path.abspath(bpy.data.filepath))
+
+
+def current_branch(cached: bool = False) -> str:
+    """Returns the checked out branch, or the commit when HEAD is detached
+
+    Reads .git/HEAD directly, so it is cheap enough to call from draw().
+
+    Args:
+        cached: Only git reads reftable, so with it the branch of the
+            last snapshot is returned instead of running git
+    """
+    repository = get_repository()
+    if repository is None:
+        return ""
+    if has_reftable(repository):
+        if cached:
+            return current_snapshot.branch \
+                if current_snapshot is not None else ""
+        return get_snapshot().branch
+    branch, oid = read_head(repository)
+    if branch is not None:
+        return branch
+    return (oid or "")[:7]
+
+
+def local_branches() -> List[str]:
+    """Lists local branch names without spawning git when possible"""
+    repository = get_repository()
+    if repository is None:
+        return []
+    if has_reftable(repository):
+        return do_git("for-each-ref", "--format=%(refname:short)",
+                      "refs/heads").splitlines()
+    return list_local_branches(repository)
+
+
+def get_state_cache(work_dir: Optional[str] = None) -> RepoStateCache:
+    """Returns the state cache of a repository"""
+    if work_dir is None:
+        work_dir = get_work_dir()
+    return core.get_state_cache(work_dir)
 
 
 def needs_refresh(refresh_type: str) -> bool:
-    blendgit = get_blendgit()
-    if refresh_type == "revisions" \
-            and blendgit.num_revision_list_refreshes != get_num_operations():
-        return True
-    elif refresh_type == "files" \
-            and blendgit.num_file_list_refreshes != get_num_operations():
-        return True
+    """Checks if the files a query depends on changed since it last ran
+
+    Args:
+        refresh_type: One of "files", "revisions" or "branches"
+    """
+    return not get_state_cache().is_fresh(refresh_type)
 
-    return False
+
+def query_state(refresh_type: str,
+                query: Callable[[str], Any],
+                work_dir: Optional[str] = None) -> Any:
+    """Runs a query and stores its result in the state cache
+
+    Safe to call from a worker thread as long as work_dir is given.
+    """
+    if work_dir is None:
+        work_dir = get_work_dir()
+    return core.query_state(refresh_type, query, work_dir)
 
 
 @bpy.app.handlers.persistent
@@ -94,6 +166,16 @@ def ui_refresh_for_handler(dummy1: bpy.types.Scene, dummy2):
     ui_refresh()
 
 
+def redraw_ui():
+    """Tags every area for redraw without querying git"""
+    if not hasattr(bpy.data, 'window_managers'):
+        return
+    for windowManager in bpy.data.window_managers:
+        for window in windowManager.windows:
+            for area in window.screen.areas:
+                area.tag_redraw()
+
+
 def ui_refresh():
     """Refreshes all UI elements"""
     # Logic taken from CATS plugin
@@ -103,9 +185,10 @@ def ui_refresh():
         if hasattr(bpy.data, 'window_managers'):
             for windowManager in bpy.data.window_managers:
                 # Check if working directory is clean on ui refresh
-                if hasattr(windowManager, "blendgit"):
-                    blendgit = windowManager.blendgit
-                    blendgit.working_dir_is_clean = working_dir_clean()
+                if hasattr(windowManager, "blendgit") \
+                        and doc_saved() and check_repo_exists() \
+                        and needs_refresh("files"):
+                    request_snapshot()
                 # Redraw areas
                 for window in windowManager.windows:
                     for area in window.screen.areas:
@@ -116,110 +199,88 @@ def ui_refresh():
             time.sleep(0.1)
 
 
-def git_log() -> List[Dict[str, str]]:
-    def parse_line(line: str) -> Dict:
-        parts = line.split("\t")
-        return {
-            "hash": parts[0],
-            "date": parts[1],
-            "message": parts[2],
-        }
+def git_log(work_dir: Optional[str] = None,
+            skip: int = 0,
+            count: int = 100,
+            rev: str = "HEAD") -> List[Dict[str, str]]:
+    """Reads one page of history, see core.git_log()"""
+    if work_dir is None:
+        work_dir = get_work_dir()
+    return core.git_log(work_dir, skip, count, rev)
 
-    entries = []
-    lines = do_git(
-        "log", "--pretty=format:%h%x09%cs%x09%s", "-n", "5").splitlines()
-    for line in lines:
-        entry = parse_line(line)
 
-        entries.append(entry)
+def read_snapshot(work_dir: Optional[str] = None) -> RepoSnapshot:
+    """Reads branch and file state with a single git invocation"""
+    if work_dir is None:
+        work_dir = get_work_dir()
+    return core.read_snapshot(work_dir)
 
-    return entries
 
+def get_snapshot(force_check: bool = False) -> RepoSnapshot:
+    """Returns the last snapshot, reading a new one if it is outdated"""
+    if current_snapshot is None or force_check or needs_refresh("files"):
+        set_snapshot(read_snapshot())
+    return current_snapshot
 
-def status() -> List[Dict[str, str]]:
-    STATUS_TYPE = {
-        "M": "modified",
-        "A": "added",
-        "D": "deleted",
-        "R": "renamed",
-        "?": "new",
-        " ": ""
-    }
 
-    def get_statuses_from_code(code: str) -> Tuple[str, str]:
-        staged_status = code[0]
-        working_status = code[1]
-        try:
-            if "?" in staged_status:
-                staged_status = ""
-                working_status = "new"
-            else:
-                staged_status = STATUS_TYPE[staged_status]
-                working_status = STATUS_TYPE[working_status]
-        except KeyError:
-            pass
-
-        return (staged_status, working_status)
-
-    def parse_line(line: str) -> Dict:
-        parts = [line[:2], " ".join(line[2:].split())]
-        staged_status, working_status = get_statuses_from_code(parts[0])
-        entry = {
-            "status": (staged_status
-                       if staged_status.rstrip()
-                       else working_status),
-            "file_path": parts[1].replace('"', ''),
-            "staged": (True
-                       if (staged_status.rstrip())
-                       else False)
-        }
-        return entry
-
-    entries = []
-    lines = do_git("status", "--porcelain=1").splitlines()
-    for line in lines:
-        entry = parse_line(line)
-
-        entries.append(entry)
-
-    return entries
-
-
-def do_git(*args) -> str:
-    """Common routine for invoking various Git functions."""
-    global num_git_operations
-    env = dict(os.environ)
-    work_dir = get_work_dir()
-    env["GIT_DIR"] = ".git"
-
-    # Make sure all args are strings
-    args = [str(arg) for arg in args]
-    # We need to make this into a string since shell==True
-    cmd = "git " + " ".join(args)
-    print(cmd)
-
-    try:
-        result = subprocess.run(
-            cmd,
-            stdin=subprocess.DEVNULL,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True,
-            cwd=work_dir,
-            env=env,
-            check=True,
-        )
-        output = result.stdout.decode('utf-8').rstrip()
-
-        if args[0] not in ("status", "log"):
-            num_git_operations += 1
-        return output
-    except subprocess.CalledProcessError as e:
-        print("git encountered an error:")
-        print(f"  stdout: {e.stdout}")
-        print(f"  stdout: {e.stderr}")
-        raise e
-
-
-def get_num_operations() -> int:
-    return num_git_operations
+def set_snapshot(snapshot: RepoSnapshot):
+    """Publishes a snapshot and mirrors it into the window manager"""
+    global current_snapshot
+    current_snapshot = snapshot
+    blendgit = get_blendgit()
+    blendgit.working_dir_is_clean = snapshot.clean
+    blendgit.current_branch = snapshot.branch
+
+
+def request_snapshot(
+        callback: Optional[Callable[[RepoSnapshot], None]] = None) -> Future:
+    """Reads a new snapshot on the background executor
+
+    Requests made while one is pending share the same git process.
+    """
+    def on_done(snapshot: RepoSnapshot):
+        set_snapshot(snapshot)
+        if callback is not None:
+            callback(snapshot)
+        redraw_ui()
+
+    return executor.submit("snapshot", read_snapshot, get_work_dir(),
+                           callback=on_done)
+
+
+def status(work_dir: Optional[str] = None) -> List[Dict[str, str]]:
+    return read_snapshot(work_dir).entries
+
+
+@tracing.forwarder
+def do_git(*args, work_dir: Optional[str] = None,
+           input: Optional[bytes] = None) -> str:
+    """Common routine for invoking various Git functions.
+
+    Pass work_dir when calling from a worker thread, since looking it up
+    reads bpy.data.
+    """
+    if work_dir is None:
+        work_dir = get_work_dir()
+    return core.git(work_dir, *args, input=input)
+
+
+def do_git_async(*args,
+                 key: Optional[str] = None,
+                 callback: Optional[Callable[[str], None]] = None) -> Future:
+    """Runs a Git command on the background executor
+
+    Args:
+        key: Job name used to coalesce identical requests (defaults to the
+            command line)
+        callback: Called with the output on the main thread
+
+    Returns:
+        Future: The future of the command's output
+    """
+    if key is None:
+        key = " ".join(str(arg) for arg in args)
+    return executor.submit(key, do_git, *args,
+                           work_dir=get_work_dir(),
+                           callback=callback)
+
@@ -0,0 +1,461 @@
+"""Repository operations that do not need Blender
+
+Everything here takes the work dir of the repository explicitly, so it
+runs from the add-on, from cli.py and from worker processes alike.
+common.py and the tools find the repository of the open .blend file and
+call into this module.
+"""
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from . import process, tracing
+    from .blend_filter import LFS_POINTER_HEADER, blob_ids, read_blobs
+    from .cache import RepoStateCache
+    from .refs import find_repository
+    from .snapshot import RepoSnapshot, parse_status
+except ImportError:
+    # Imported by cli.py run as a script
+    import process
+    import tracing
+    from blend_filter import LFS_POINTER_HEADER, blob_ids, read_blobs
+    from cache import RepoStateCache
+    from refs import find_repository
+    from snapshot import RepoSnapshot, parse_status
+
+
+AUTOSAVE_PREFIX = "refs/blendgit/autosave/"
+# Autosave snapshots kept for each branch, unless told otherwise
+AUTOSAVE_KEEP = 50
+# Snapshots listed by list_snapshots()
+LISTED_SNAPSHOTS = 20
+# Pause between two LFS fetches, so prefetching leaves bandwidth to the
+# user
+PREFETCH_DELAY = 1.0
+# LFS pointer files are never larger than this
+MAX_POINTER_SIZE = 1024
+
+state_caches: Dict[str, RepoStateCache] = {}
+# Blob last hashed for each file, with the size and mtime it had, so an
+# unchanged file is not hashed again
+_hashed: Dict[str, Tuple[int, int, str]] = {}
+
+
+class CommitCancelled(Exception):
+    pass
+
+
+# Running git
+
+
+@tracing.forwarder
+def git(work_dir: str, *args,
+        env: Optional[Dict[str, str]] = None,
+        input: Optional[bytes] = None) -> str:
+    """Runs a git command in the top level of a repository
+
+    Args:
+        env: Variables to set on top of the environment
+        input: Fed to git's stdin, like paths for --pathspec-from-file=-
+
+    Returns:
+        str: What git printed, without trailing whitespace
+    """
+    logging.debug("git " + " ".join(str(arg) for arg in args))
+    try:
+        output = process.git(work_dir, *args, input=input, env=env)
+    except subprocess.CalledProcessError as e:
+        print("git encountered an error:")
+        print(f"  stdout: {e.stdout}")
+        print(f"  stdout: {e.stderr}")
+        raise e
+    return output.decode('utf-8').rstrip()
+
+
+def run_git(work_dir: str, args: List[str],
+            on_line: Optional[Callable[[str], None]] = None):
+    """Runs git, handing each line it prints to on_line
+
+    Raises:
+        subprocess.CalledProcessError: git failed
+    """
+    process.stream(["git", "--literal-pathspecs", *args], work_dir, on_line)
+
+
+def resolve(work_dir: str, rev: str) -> Optional[str]:
+    """Returns the object rev names, None if there is none"""
+    result = process.run(["git", "rev-parse", "--verify", "--quiet", rev],
+                         work_dir, check=False)
+    return result.stdout.decode().strip() if result.returncode == 0 \
+        else None
+
+
+# Repository state
+
+
+def get_state_cache(work_dir: str) -> RepoStateCache:
+    """Returns the state cache of a repository"""
+    work_dir = os.path.abspath(work_dir)
+    if work_dir not in state_caches:
+        repository = find_repository(work_dir)
+        if repository is None:
+            state_caches[work_dir] = RepoStateCache(work_dir)
+        else:
+            state_caches[work_dir] = RepoStateCache(
+                work_dir, repository.git_dir, repository.common_dir)
+    return state_caches[work_dir]
+
+
+def query_state(refresh_type: str, query: Callable[[str], Any],
+                work_dir: str) -> Any:
+    """Runs a query and stores its result in the state cache
+
+    Safe to call from a worker thread.
+    """
+    cache = get_state_cache(work_dir)
+    signature = cache.signature(refresh_type)
+    value = query(cache.work_dir)
+    cache.store(refresh_type, signature, value)
+    return value
+
+
+def git_log(work_dir: str,
+            skip: int = 0,
+            count: int = 100,
+            rev: str = "HEAD") -> List[Dict[str, str]]:
+    """Reads one page of history
+
+    Args:
+        skip: Number of commits to skip from the start of the history
+        count: Maximum number of commits to read
+        rev: Commit to start from, so later pages stay consistent with
+            the first one when HEAD moves in between
+    """
+    def parse_line(line: str) -> Dict:
+        parts = line.split("\t")
+        return {
+            "hash": parts[0],
+            "date": parts[1],
+            "message": parts[2],
+        }
+
+    entries = []
+    lines = git(
+        work_dir, "log", "--pretty=format:%H%x09%cs%x09%s",
+        f"--skip={skip}", "-n", count, rev).splitlines()
+    for line in lines:
+        entry = parse_line(line)
+
+        entries.append(entry)
+
+    return entries
+
+
+def search_log(work_dir: str, pattern: str, invert: bool = False,
+               count: int = -1, rev: str = "HEAD") -> List[Dict[str, str]]:
+    """Reads the commits whose message matches, newest first
+
+    Args:
+        pattern: Extended regular expression, matched ignoring case
+        invert: Read the commits whose message does not match instead
+        count: Maximum number of commits to read, -1 for all of them
+    """
+    invert_args = ["--invert-grep"] if invert else []
+    entries = []
+    for line in git(work_dir, "log", "--pretty=format:%H%x09%cs%x09%s",
+                    "--extended-regexp", "--regexp-ignore-case",
+                    f"--grep={pattern}", *invert_args, f"--max-count={count}",
+                    rev).splitlines():
+        commit, date, message = line.split("\t", 2)
+        entries.append({"hash": commit, "date": date, "message": message})
+    return entries
+
+
+def read_snapshot(work_dir: str) -> RepoSnapshot:
+    """Reads branch and file state with a single git invocation"""
+    def query(work_dir: str) -> RepoSnapshot:
+        # Without optional locks, status leaves the index alone, so it
+        # neither invalidates its own cache entry nor races other git
+        # commands for index.lock
+        output = git(work_dir, "--no-optional-locks", "status",
+                     "--porcelain=v2", "--branch", "-z")
+        return parse_status(output)
+
+    cache = get_state_cache(work_dir)
+    if cache.needs_tracked_files():
+        tracked = git(cache.work_dir, "ls-files", "-z")
+        cache.set_tracked_files(path for path in tracked.split("\0")
+                                if path.endswith(".blend"))
+    return query_state("files", query, cache.work_dir)
+
+
+def status(work_dir: str) -> List[Dict[str, str]]:
+    return read_snapshot(work_dir).entries
+
+
+# Committing
+
+
+def commit_files(work_dir: str, paths: List[str], message: str,
+                 progress: Optional[Dict] = None,
+                 run: Callable = run_git) -> str:
+    """Stages paths again and commits the index
+
+    Staging is where the clean filters (LFS, blend_filter.py) hash the
+    files, so progress follows the bytes of the files git reports as
+    added.
+
+    Args:
+        progress: Gets the step running as "stage", and how far along
+            the commit is from 0 to 1 as "done"
+        run: Runs git like run_git(), and raises CommitCancelled to stop
+
+    Returns:
+        str: An error message, empty on success
+    """
+    if progress is None:
+        progress = {}
+    sizes = {}
+    for path in paths:
+        try:
+            sizes[path] = os.path.getsize(os.path.join(work_dir, path))
+        except OSError:
+            # Deleted files are already staged as such
+            pass
+    total = sum(sizes.values()) or 1
+    added = 0
+
+    def on_line(line: str):
+        nonlocal added
+        # --verbose prints "add '<path>'" once a file is in the index
+        if line.startswith("add '") and line.endswith("'"):
+            added += sizes.get(line[5:-1], 0)
+            progress["done"] = 0.9 * added / total
+
+    try:
+        if sizes:
+            progress["stage"] = "Staging"
+            run(work_dir, ["add", "--verbose", "--", *sizes], on_line)
+        progress["stage"] = "Committing"
+        progress["done"] = 0.9
+        run(work_dir, ["commit", "-m", message])
+    except CommitCancelled:
+        return "Commit cancelled"
+    except subprocess.CalledProcessError as e:
+        return e.output.strip() or "git commit failed"
+    except OSError as e:
+        return str(e)
+    progress["done"] = 1.0
+    return ""
+
+
+# Autosave snapshots
+
+
+def autosave_ref(branch: str) -> str:
+    return AUTOSAVE_PREFIX + branch
+
+
+def autosave_dir(common_dir: str) -> str:
+    return os.path.join(common_dir, "blendgit", "autosave")
+
+
+def hash_file(work_dir: str, source: str, path: str) -> str:
+    """Writes a file as a blob, through the filters of path
+
+    The LFS and blend_filter.py filters apply as on git add, so chunked
+    storage only adds the chunks that changed since the last snapshot.
+    """
+    stat = os.stat(source)
+    hashed = _hashed.get(source)
+    if hashed is not None and hashed[:2] == (stat.st_size,
+                                             stat.st_mtime_ns):
+        return hashed[2]
+    blob = git(work_dir, "hash-object", "-w", f"--path={path}", source)
+    _hashed[source] = (stat.st_size, stat.st_mtime_ns, blob)
+    return blob
+
+
+def snapshot(work_dir: str, common_dir: str, source: str, path: str,
+             branch: str, keep: int) -> Optional[str]:
+    """Commits source as path to the autosave ref of branch
+
+    The commit is built with plumbing and a temporary index, so the
+    index, HEAD and the working tree are left alone. Its tree is the
+    tree of HEAD with the file replaced.
+
+    Args:
+        path: Path of the file in the repository, with forward slashes
+        keep: Snapshots to keep, older ones are dropped once there are
+            twice as many
+
+    Returns:
+        str: The new snapshot, None when the file did not change
+    """
+    ref = autosave_ref(branch)
+    parent = resolve(work_dir, f"{ref}^{{commit}}")
+    blob = hash_file(work_dir, source, path)
+    if parent is not None and resolve(work_dir, f"{parent}:{path}") == blob:
+        return None
+
+    directory = autosave_dir(common_dir)
+    os.makedirs(directory, exist_ok=True)
+    fd, index_path = tempfile.mkstemp(dir=directory, suffix=".index")
+    os.close(fd)
+    # git refuses an empty file as index, but creates a missing one
+    os.unlink(index_path)
+    env = {"GIT_INDEX_FILE": index_path}
+    try:
+        if resolve(work_dir, "HEAD^{tree}") is not None:
+            git(work_dir, "read-tree", "HEAD", env=env)
+        git(work_dir, "update-index", "--add", "--cacheinfo",
+            f"100644,{blob},{path}", env=env)
+        tree = git(work_dir, "write-tree", env=env)
+    finally:
+        if os.path.exists(index_path):
+            os.unlink(index_path)
+    message = f"Autosave {os.path.basename(path)}"
+    parents = ["-p", parent] if parent is not None else []
+    commit = git(work_dir, "commit-tree", tree, *parents, "-m", message)
+    git(work_dir, "update-ref", "-m", message, ref, commit,
+        parent or "")
+    prune_snapshots(work_dir, ref, keep)
+    return commit
+
+
+def prune_snapshots(work_dir: str, ref: str, keep: int):
+    """Drops the oldest snapshots once there are twice as many as kept
+
+    The newest ones are committed again on top of no parent, with their
+    dates, so the old ones become unreachable. That takes a process per
+    snapshot kept, which is why it happens in batches rather than on
+    every autosave. The blobs dropped take space until git gc removes
+    them.
+    """
+    log = git(work_dir, "log", f"-n{2 * keep}",
+              "--format=%T%x1f%aD%x1f%cD%x1f%s", ref).splitlines()
+    if len(log) < 2 * keep:
+        return
+    old_tip = resolve(work_dir, ref)
+    parent = None
+    for line in reversed(log[:keep]):
+        tree, author_date, committer_date, message = line.split("\x1f")
+        env = {"GIT_AUTHOR_DATE": author_date,
+               "GIT_COMMITTER_DATE": committer_date}
+        parents = ["-p", parent] if parent is not None else []
+        parent = git(work_dir, "commit-tree", tree, *parents, "-m", message,
+                     env=env)
+    git(work_dir, "update-ref", "-m", "Prune autosaves", ref, parent,
+        old_tip)
+
+
+def list_snapshots(work_dir: str, ref: str) -> List[Dict[str, str]]:
+    if resolve(work_dir, ref) is None:
+        return []
+    snapshots = []
+    for line in git(work_dir, "log", f"-n{LISTED_SNAPSHOTS}",
+                    "--format=%H%x1f%ct", ref).splitlines():
+        commit, timestamp = line.split("\x1f")
+        date = datetime.fromtimestamp(int(timestamp))
+        snapshots.append({"hash": commit,
+                          "date": date.strftime("%Y-%m-%d %H:%M")})
+    return snapshots
+
+
+# LFS prefetching
+
+
+def lfs_object_path(common_dir: str, oid: str) -> str:
+    return os.path.join(common_dir, "lfs", "objects", oid[:2], oid[2:4], oid)
+
+
+def pointer_oid(data: bytes) -> Optional[str]:
+    """Returns the object id of an LFS pointer file, None for other files"""
+    if not data.startswith(LFS_POINTER_HEADER):
+        return None
+    for line in data.decode("utf-8", "replace").splitlines():
+        if line.startswith("oid sha256:"):
+            return line[len("oid sha256:"):].strip()
+    return None
+
+
+def lfs_remote(work_dir: str) -> Optional[str]:
+    """Returns the remote LFS objects are fetched from, if there is one"""
+    def git_output(*args: str) -> str:
+        return process.run(["git", *args], work_dir,
+                           check=False).stdout.decode("utf-8").strip()
+
+    remotes = git_output("remote").split()
+    for remote in (git_output("config", "--get", "remote.lfsdefault"),
+                   "origin"):
+        if remote in remotes:
+            return remote
+    return remotes[0] if remotes else None
+
+
+def fetch_revision(work_dir: str, remote: str, rev: str, path: str,
+                   cancel: threading.Event) -> bool:
+    """Runs git lfs fetch for one file of one revision
+
+    Returns:
+        bool: Whether the fetch finished, False when it was cancelled
+            or failed
+    """
+    try:
+        process.run(["git", "lfs", "fetch", "--include", path, remote, rev],
+                    work_dir, cancel=cancel, stdout=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, process.Cancelled):
+        return False
+    return True
+
+
+def prefetch(work_dir: str, common_dir: str, path: str, revs: List[str],
+             status: Dict[str, str], cancel: threading.Event):
+    """Fetches the LFS object of path in each revision, one at a time
+
+    Revisions whose file is not in LFS or already fetched are marked
+    ready without a transfer.
+
+    Args:
+        status: Gets "queued", "fetching", "ready" or "failed" for each
+            revision as it goes
+        cancel: Stops fetching once set
+    """
+    blobs = blob_ids(work_dir, path, revs)
+    _, contents = read_blobs(work_dir,
+                             [blob for blob in blobs.values() if blob],
+                             max_size=MAX_POINTER_SIZE)
+    queued = []
+    for rev in revs:
+        oid = pointer_oid(contents.get(blobs[rev], b""))
+        if oid is None or os.path.exists(lfs_object_path(common_dir, oid)):
+            status[rev] = "ready"
+        else:
+            status[rev] = "queued"
+            queued.append((rev, oid))
+    if not queued:
+        return
+
+    remote = lfs_remote(work_dir)
+    for rev, oid in queued:
+        if cancel.is_set():
+            # Looked at again on the next request
+            del status[rev]
+            continue
+        if remote is None:
+            status[rev] = "failed"
+            continue
+        status[rev] = "fetching"
+        if fetch_revision(work_dir, remote, rev, path, cancel) \
+                and os.path.exists(lfs_object_path(common_dir, oid)):
+            status[rev] = "ready"
+        elif cancel.is_set():
+            del status[rev]
+        else:
+            status[rev] = "failed"
+        cancel.wait(PREFETCH_DELAY)
@@ -0,0 +1,113 @@
+import logging
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import bpy
+
+from . import tracing
+
+
+MAX_WORKERS = 2
+POLL_INTERVAL = 0.05
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pending: Dict[str, Future] = {}
+_callbacks: Dict[str, List[Callable[[Any], None]]] = {}
+_completed: "queue.SimpleQueue" = queue.SimpleQueue()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=MAX_WORKERS,
+                                   thread_name_prefix="blendgit")
+    return _pool
+
+
+def submit(key: str,
+           fn: Callable,
+           *args,
+           callback: Optional[Callable[[Any], None]] = None,
+           **kwargs) -> Future:
+    """Runs a job on the worker pool
+
+    Jobs are coalesced by key, so submitting a key that is still pending
+    returns the existing future instead of queueing another git process.
+    Callbacks of every coalesced submit are invoked with the result on
+    Blender's main thread.
+
+    Args:
+        key: Name identifying the job
+        fn: Function to run on a worker thread. It must not touch bpy data
+        callback: Called with the result once the job is done
+
+    Returns:
+        Future: The future of the job
+    """
+    if key in _pending:
+        if callback is not None:
+            _callbacks[key].append(callback)
+        return _pending[key]
+
+    if tracing.enabled:
+        fn = tracing.carry_origin(key, fn)
+    future = _get_pool().submit(fn, *args, **kwargs)
+    _pending[key] = future
+    _callbacks[key] = [] if callback is None else [callback]
+    future.add_done_callback(lambda done: _completed.put((key, done)))
+    if not bpy.app.timers.is_registered(_deliver):
+        bpy.app.timers.register(_deliver,
+                                first_interval=POLL_INTERVAL,
+                                persistent=True)
+
+    return future
+
+
+def is_pending(key: Optional[str] = None) -> bool:
+    """Checks if a job (or any job when no key is given) is still running"""
+    if key is None:
+        return len(_pending) != 0
+    return key in _pending
+
+
+def _deliver() -> Optional[float]:
+    """Timer that hands finished jobs to their callbacks"""
+    while True:
+        try:
+            key, future = _completed.get_nowait()
+        except queue.Empty:
+            break
+        if _pending.get(key) is not future:
+            continue
+        del _pending[key]
+        callbacks = _callbacks.pop(key)
+        if future.cancelled():
+            continue
+        error = future.exception()
+        if error is not None:
+            logging.error(f"Blendgit job '{key}' failed: {error}")
+            continue
+        for callback in callbacks:
+            # An exception escaping the timer would unregister it
+            try:
+                callback(future.result())
+            except Exception:
+                logging.exception(f"Blendgit callback of job '{key}' "
+                                  f"failed")
+
+    if _pending:
+        return POLL_INTERVAL
+    # Returning None unregisters the timer until the next submit
+    return None
+
+
+def unregister():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    _pending.clear()
+    _callbacks.clear()
+    if bpy.app.timers.is_registered(_deliver):
+        bpy.app.timers.unregister(_deliver)
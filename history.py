@@ -0,0 +1,62 @@
+from array import array
+from typing import Dict, Iterable, List
+
+
+class CommitStore:
+    """Compact, append-only storage of parsed commits
+
+    Commits are packed into parallel arrays rather than kept as one dict
+    (or one bpy item) each, so long histories stay cheap to hold. Only
+    the rows the UI shows are turned back into dicts.
+
+    Attributes:
+        head: Commit the history was read from
+        complete: Whether the whole history has been loaded
+        indexed: Whether pages are read from the commit index, which
+            orders merged histories differently from git log
+    """
+    __slots__ = ("head", "complete", "indexed", "_oids", "_oid_size", "_dates",
+                 "_messages")
+
+    def __init__(self, head: str = ""):
+        self.head = head
+        self.complete = False
+        self.indexed = False
+        self._oids = bytearray()
+        self._oid_size = 0
+        # Dates are stored as YYYYMMDD integers
+        self._dates = array("l")
+        self._messages: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def append(self, entry: Dict[str, str]):
+        """Adds an entry as returned by common.git_log()"""
+        oid = bytes.fromhex(entry["hash"])
+        if not self._oid_size:
+            self._oid_size = len(oid)
+        self._oids += oid
+        self._dates.append(int(entry["date"].replace("-", "")))
+        self._messages.append(entry["message"])
+
+    def extend(self, entries: Iterable[Dict[str, str]]):
+        for entry in entries:
+            self.append(entry)
+
+    def __getitem__(self, index: int) -> Dict[str, str]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = index * self._oid_size
+        date = str(self._dates[index])
+        return {
+            "hash": self._oids[start:start + self._oid_size].hex(),
+            "date": f"{date[:4]}-{date[4:6]}-{date[6:]}",
+            "message": self._messages[index],
+        }
+
+    def window(self, start: int, stop: int) -> List[Dict[str, str]]:
+        """Returns the entries in [start, stop)"""
+        return [self[i] for i in range(max(start, 0), min(stop, len(self)))]
@@ -0,0 +1,227 @@
+import os
+import stat
+import struct
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+ENTRY_STAT = struct.Struct(">10I")
+HEADER = struct.Struct(">4sII")
+
+FLAG_EXTENDED = 0x4000
+FLAG_STAGE = 0x3000
+EXTENDED_SKIP_WORKTREE = 0x4000
+EXTENDED_INTENT_TO_ADD = 0x2000
+
+MODE_GITLINK = 0o160000
+MODE_SYMLINK = 0o120000
+
+
+class IndexEntry:
+    """The cached stat data of one tracked path"""
+    __slots__ = ("path", "mtime_s", "mtime_ns", "ino", "mode", "size",
+                 "stage", "skip_worktree", "intent_to_add")
+
+    def __init__(self, path: str, mtime_s: int, mtime_ns: int, ino: int,
+                 mode: int, size: int, stage: int, skip_worktree: bool,
+                 intent_to_add: bool):
+        self.path = path
+        self.mtime_s = mtime_s
+        self.mtime_ns = mtime_ns
+        self.ino = ino
+        self.mode = mode
+        self.size = size
+        self.stage = stage
+        self.skip_worktree = skip_worktree
+        self.intent_to_add = intent_to_add
+
+
+class WorktreeStatus:
+    """Result of comparing the index against the working tree
+
+    Attributes:
+        dirty: Tracked paths whose stat data no longer matches
+        ambiguous: Tracked paths that only git can judge, such as racily
+            clean entries written in the same instant as the index
+    """
+    __slots__ = ("dirty", "ambiguous")
+
+    def __init__(self):
+        self.dirty: List[str] = []
+        self.ambiguous: List[str] = []
+
+    @property
+    def clean(self) -> Optional[bool]:
+        """False if stat-dirty, None if git has to decide, else True"""
+        if self.dirty:
+            return False
+        if self.ambiguous:
+            return None
+        return True
+
+
+def read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Decodes the offset encoded integers used by index v4"""
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7f
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7f)
+    return value, offset
+
+
+def parse_index(data: bytes, hash_size: int = 20) -> List[IndexEntry]:
+    """Parses the entries of an index file (versions 2 to 4)
+
+    Extensions and the trailing checksum are ignored.
+    """
+    signature, version, count = HEADER.unpack_from(data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError(f"Unsupported index (version {version})")
+    entries = []
+    offset = HEADER.size
+    previous_path = b""
+    for _ in range(count):
+        start = offset
+        (_, _, mtime_s, mtime_ns, _, ino, mode, _, _,
+         size) = ENTRY_STAT.unpack_from(data, offset)
+        offset += ENTRY_STAT.size + hash_size
+        flags = int.from_bytes(data[offset:offset + 2], "big")
+        offset += 2
+        extended = 0
+        if version >= 3 and flags & FLAG_EXTENDED:
+            extended = int.from_bytes(data[offset:offset + 2], "big")
+            offset += 2
+        if version == 4:
+            strip, offset = read_varint(data, offset)
+            end = data.index(b"\0", offset)
+            path = previous_path[:len(previous_path) - strip] \
+                + data[offset:end]
+            offset = end + 1
+        else:
+            end = data.index(b"\0", offset)
+            path = data[offset:end]
+            # Entries are NUL padded to a multiple of eight bytes
+            offset = start + ((end - start) // 8 + 1) * 8
+        previous_path = path
+        entries.append(IndexEntry(
+            path.decode("utf-8", "surrogateescape"), mtime_s, mtime_ns,
+            ino, mode, size, (flags & FLAG_STAGE) >> 12,
+            bool(extended & EXTENDED_SKIP_WORKTREE),
+            bool(extended & EXTENDED_INTENT_TO_ADD)))
+    return entries
+
+
+_parsed: Dict[str, Tuple[Tuple[int, int, int], List[IndexEntry]]] = {}
+_lock = threading.Lock()
+
+
+def object_hash_size(common_dir: str) -> int:
+    """Returns the size of object hashes, which is 32 for SHA-256 repos"""
+    try:
+        with open(os.path.join(common_dir, "config"),
+                  encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip().lower() == "objectformat" \
+                        and value.strip().lower() == "sha256":
+                    return 32
+    except OSError:
+        pass
+    return 20
+
+
+def read_index(git_dir: str,
+               common_dir: Optional[str] = None
+               ) -> Tuple[List[IndexEntry], int]:
+    """Reads .git/index, reusing the last parse while the file is unchanged
+
+    Returns:
+        tuple: The entries and the mtime of the index in nanoseconds
+    """
+    path = os.path.join(git_dir, "index")
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+    with _lock:
+        cached = _parsed.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1], st.st_mtime_ns
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        entries = parse_index(data, object_hash_size(common_dir or git_dir))
+    except (IndexError, struct.error) as e:
+        # Usually a torn read while git rewrites the index
+        raise ValueError(f"Truncated index: {e}") from e
+    with _lock:
+        _parsed[path] = (signature, entries)
+    return entries, st.st_mtime_ns
+
+
+def compare_entry(entry: IndexEntry, st: os.stat_result,
+                  index_mtime_ns: int) -> Optional[bool]:
+    """Compares one entry with the file on disk like git's ie_match_stat
+
+    Returns:
+        True if clean, False if stat-dirty, None if only a content
+        comparison could tell
+    """
+    if stat.S_ISLNK(st.st_mode) != (entry.mode & 0o170000 == MODE_SYMLINK):
+        return False
+    if not stat.S_ISLNK(st.st_mode) \
+            and bool(st.st_mode & 0o100) != bool(entry.mode & 0o100):
+        return False
+    if st.st_size & 0xffffffff != entry.size:
+        # Git "smudges" racily clean entries by zeroing their size
+        return None if entry.size == 0 else False
+    if (st.st_mtime_ns // 1_000_000_000) & 0xffffffff != entry.mtime_s:
+        return False
+    # Filesystems without sub-second timestamps record 0 nanoseconds
+    if entry.mtime_ns and st.st_mtime_ns % 1_000_000_000 != entry.mtime_ns:
+        return False
+    # Some platforms (Windows) do not record inode numbers
+    if entry.ino and st.st_ino & 0xffffffff != entry.ino:
+        return False
+    entry_mtime_ns = entry.mtime_s * 1_000_000_000 + entry.mtime_ns
+    if entry_mtime_ns >= index_mtime_ns:
+        # Modified in the same instant the index was written, so a later
+        # change of the same size would be invisible to stat
+        return None
+    return True
+
+
+def worktree_status(work_dir: str, git_dir: str,
+                    common_dir: Optional[str] = None,
+                    paths: Optional[Iterable[str]] = None) -> WorktreeStatus:
+    """Compares tracked files against the stat data cached in the index
+
+    Args:
+        paths: Only compare these paths (all tracked paths by default)
+    """
+    entries, index_mtime_ns = read_index(git_dir, common_dir)
+    wanted = None if paths is None else set(paths)
+    result = WorktreeStatus()
+    for entry in entries:
+        if wanted is not None and entry.path not in wanted:
+            continue
+        if entry.mode & 0o170000 == MODE_GITLINK or entry.skip_worktree:
+            continue
+        if entry.stage or entry.intent_to_add:
+            # Conflicts and intent-to-add entries always need committing.
+            # A conflicted path has an entry per stage, so list it once
+            if not result.dirty or result.dirty[-1] != entry.path:
+                result.dirty.append(entry.path)
+            continue
+        try:
+            st = os.lstat(os.path.join(work_dir, entry.path))
+        except OSError:
+            result.dirty.append(entry.path)
+            continue
+        match = compare_entry(entry, st, index_mtime_ns)
+        if match is False:
+            result.dirty.append(entry.path)
+        elif match is None:
+            result.ambiguous.append(entry.path)
+    return result
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""Moves binaries committed as plain blobs into Git LFS
+
+analyze lists the blobs in history matching LFS_PATTERNS, the patterns
+new repositories track with LFS, and how much of the packfiles they
+take. migrate rewrites history with `git lfs migrate import`, one ref
+at a time. Finished refs are recorded in .git/blendgit/lfs-migrate.json,
+so an interrupted migration resumes where it stopped, and the original
+refs are kept under refs/blendgit/pre-lfs/ until finish drops them.
+
+Runs without Blender, from within the repository.
+
+Usage: lfs_migrate.py analyze|migrate|report|finish [--everything]
+"""
+import fnmatch
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .blend_filter import LFS_POINTER_HEADER, read_blobs
+    from .refs import find_repository
+except ImportError:
+    # Run as a script
+    from blend_filter import LFS_POINTER_HEADER, read_blobs
+    from refs import find_repository
+
+
+LFS_PATTERNS = [
+    # Models
+    "*.fbx", "*.obj", "*.max", "*.blend", "*.blender", "*.dae", "*.mb",
+    "*.ma", "*.3ds", "*.dfx", "*.c4d", "*.lwo", "*.lwo2", "*.abc",
+    "*.3dm", "*.bin", "*.glb",
+    # Images
+    "*.jpg", "*.jpeg", "*.png", "*.apng", "*.atsc", "*.gif", "*.bmp",
+    "*.exr", "*.tga", "*.tiff", "*.tif", "*.iff", "*.pict", "*.dds",
+    "*.xcf", "*.leo", "*.kra", "*.kpp", "*.clip", "*.webm", "*.webp",
+    "*.svg", "*.svgz", "*.psd",
+    # Archives
+    "*.zip", "*.7z", "*.gz", "*.rar", "*.tar",
+    # Unity
+    "*.meta", "*.unity", "*.unitypackage", "*.asset", "*.prefab",
+    "*.mat", "*.anim", "*.controller", "*.overrideController",
+    "*.physicMaterial", "*.physicsMaterial2D", "*.playable",
+    "*.mask", "*.brush", "*.flare", "*.fontsettings", "*.guiskin",
+    "*.giparams", "*.renderTexture", "*.spriteatlas", "*.terrainlayer",
+    "*.mixer", "*.shadervariants", "*.preset", "*.asmdef",
+]
+BACKUP_PREFIX = "refs/blendgit/pre-lfs/"
+# git lfs migrate reports progress like "Rewriting commits: 50% (1/2)"
+PROGRESS = re.compile(r"^migrate: ([^:]+):\s+(\d+)% \((\d+)/(\d+)\)")
+
+# Called with the ref being migrated, how many refs are done, how many
+# there are, and the last line git lfs migrate printed
+Progress = Callable[[str, int, int, str], None]
+
+
+def git(work_dir: str, *args: str, data: Optional[bytes] = None) -> bytes:
+    return subprocess.run(["git", *args], cwd=work_dir, input=data,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          check=True).stdout
+
+
+def state_path(common_dir: str) -> str:
+    return os.path.join(common_dir, "blendgit", "lfs-migrate.json")
+
+
+def read_state(common_dir: str) -> Optional[Dict]:
+    try:
+        with open(state_path(common_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_state(common_dir: str, state: Dict):
+    path = state_path(common_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                     suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=1)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def matching_pattern(path: str, patterns: List[str]) -> Optional[str]:
+    # Like .gitattributes, patterns without a slash match the file name
+    name = path.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(name, pattern):
+            return pattern
+    return None
+
+
+def migration_refs(work_dir: str, everything: bool) -> List[str]:
+    """Returns the refs to rewrite: the current branch, or with
+    everything all local branches and tags"""
+    if everything:
+        return git(work_dir, "for-each-ref", "--format=%(refname)",
+                   "refs/heads", "refs/tags").decode("utf-8").split()
+    try:
+        return [git(work_dir, "symbolic-ref", "HEAD").decode("utf-8")
+                .strip()]
+    except subprocess.CalledProcessError:
+        raise ValueError("HEAD is detached, check out a branch first")
+
+
+def history_blobs(work_dir: str,
+                  revs: List[str]) -> Iterator[Tuple[str, str, int, int]]:
+    """Yields the oid, path, size and size in the packfiles of every
+    object reachable from revs, once each"""
+    listing = git(work_dir, "rev-list", "--objects", *revs, "--")
+    objects = []
+    for line in listing.decode("utf-8", "replace").splitlines():
+        oid, _, path = line.partition(" ")
+        objects.append((oid, path))
+    if not objects:
+        return
+    request = "".join(oid + "\n" for oid, _ in objects).encode("ascii")
+    output = git(work_dir, "cat-file",
+                 "--batch-check=%(objecttype) %(objectsize) "
+                 "%(objectsize:disk)", data=request)
+    for (oid, path), line in zip(objects, output.decode().splitlines()):
+        kind, size, disk = line.split()
+        yield oid, path if kind == "blob" else "", int(size), int(disk)
+
+
+def disk_usage(work_dir: str, revs: List[str]) -> int:
+    """Bytes the objects reachable from revs take in the packfiles"""
+    return sum(disk for _, _, _, disk in history_blobs(work_dir, revs))
+
+
+def analyze(work_dir: str, everything: bool = False) -> Dict:
+    """Measures what migrating the refs to LFS would move out of git
+
+    Returns:
+        dict: The disk usage of the history, and per pattern the number
+            of blobs that would move, their size and their disk usage
+    """
+    patterns = list(LFS_PATTERNS)
+    refs = migration_refs(work_dir, everything)
+    total = 0
+    candidates = []
+    for oid, path, size, disk in history_blobs(work_dir, refs):
+        total += disk
+        pattern = matching_pattern(path, patterns) if path else None
+        if pattern is not None:
+            candidates.append((oid, pattern, size, disk))
+    # Blobs that already are LFS pointers stay as they are
+    _, contents = read_blobs(work_dir, [oid for oid, _, _, _ in candidates],
+                             max_size=1024)
+    by_pattern = defaultdict(lambda: {"count": 0, "size": 0, "disk": 0})
+    for oid, pattern, size, disk in candidates:
+        if contents.get(oid, b"").startswith(LFS_POINTER_HEADER):
+            continue
+        entry = by_pattern[pattern]
+        entry["count"] += 1
+        entry["size"] += size
+        entry["disk"] += disk
+    return {
+        "refs": refs,
+        "history_disk": total,
+        "count": sum(entry["count"] for entry in by_pattern.values()),
+        "disk": sum(entry["disk"] for entry in by_pattern.values()),
+        "patterns": dict(sorted(by_pattern.items(),
+                                key=lambda item: -item[1]["disk"])),
+    }
+
+
+def parse_progress(line: str) -> Optional[Tuple[str, float]]:
+    """Reads the step and the fraction done from a progress line"""
+    match = PROGRESS.match(line)
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2)) / 100
+
+
+def _read_lines(stream) -> Iterator[str]:
+    """Splits output on carriage returns too, as progress lines are
+    redrawn in place"""
+    pending = b""
+    while True:
+        block = stream.read1(4096)
+        if not block:
+            break
+        pending += block
+        parts = re.split(rb"[\r\n]", pending)
+        pending = parts.pop()
+        for part in parts:
+            if part:
+                yield part.decode("utf-8", "replace")
+    if pending:
+        yield pending.decode("utf-8", "replace")
+
+
+def migrate_ref(work_dir: str, ref: str, patterns: List[str],
+                on_line: Callable[[str], None],
+                should_stop: Callable[[], bool]) -> bool:
+    """Runs git lfs migrate import for one ref
+
+    git lfs migrate only moves the ref once the rewrite is complete, so
+    stopping it leaves the ref as it was.
+
+    Returns:
+        bool: True once migrated, False when stopped
+    """
+    process = subprocess.Popen(
+        ["git", "lfs", "migrate", "import", f"--include-ref={ref}",
+         "--include=" + ",".join(patterns)],
+        cwd=work_dir, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT, start_new_session=os.name != "nt")
+    lines = []
+    stopped = False
+    for line in _read_lines(process.stdout):
+        lines.append(line)
+        on_line(line)
+        if should_stop():
+            stopped = True
+            if os.name == "nt":
+                process.terminate()
+            else:
+                os.killpg(process.pid, signal.SIGTERM)
+            break
+    process.stdout.close()
+    returncode = process.wait()
+    if stopped or (returncode != 0 and should_stop()):
+        return False
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, "git lfs migrate",
+                                            output="\n".join(lines[-5:]))
+    return True
+
+
+def migrate(work_dir: str, common_dir: str, everything: bool = False,
+            on_progress: Optional[Progress] = None,
+            should_stop: Callable[[], bool] = lambda: False) -> bool:
+    """Rewrites the refs so files matching the patterns are in LFS
+
+    Picks up an interrupted migration, in which case everything is
+    ignored in favour of the refs it started with.
+
+    Returns:
+        bool: True once every ref is migrated, False when stopped
+    """
+    state = read_state(common_dir)
+    if state is None:
+        refs = migration_refs(work_dir, everything)
+        state = {"patterns": list(LFS_PATTERNS), "refs": {}, "done": []}
+        for ref in refs:
+            oid = git(work_dir, "rev-parse", ref).decode().strip()
+            git(work_dir, "update-ref", BACKUP_PREFIX + ref, oid)
+            state["refs"][ref] = oid
+        write_state(common_dir, state)
+
+    refs = list(state["refs"])
+    for ref in refs:
+        if ref in state["done"]:
+            continue
+
+        def on_line(line: str, ref=ref):
+            if on_progress is not None:
+                on_progress(ref, len(state["done"]), len(refs), line)
+
+        on_line("")
+        if not migrate_ref(work_dir, ref, state["patterns"], on_line,
+                           should_stop):
+            return False
+        state["done"].append(ref)
+        write_state(common_dir, state)
+    if on_progress is not None:
+        on_progress("", len(refs), len(refs), "")
+    return True
+
+
+def size_report(work_dir: str, common_dir: str) -> Optional[Dict]:
+    """Compares the history before and after the migration
+
+    Returns:
+        dict: Disk usage of the original and the migrated refs, and of
+            the LFS objects, or None without a migration to compare
+    """
+    state = read_state(common_dir)
+    if state is None:
+        return None
+    before = disk_usage(work_dir, list(state["refs"].values()))
+    after = disk_usage(work_dir, list(state["refs"]))
+    lfs = 0
+    for directory, _, names in os.walk(os.path.join(common_dir, "lfs",
+                                                    "objects")):
+        lfs += sum(os.path.getsize(os.path.join(directory, name))
+                   for name in names)
+    return {"before": before, "after": after, "lfs": lfs,
+            "complete": len(state["done"]) == len(state["refs"])}
+
+
+def finish(work_dir: str, common_dir: str):
+    """Drops the original refs and the migration state
+
+    The old objects are removed by the next `git gc` once the reflogs
+    expire.
+    """
+    state = read_state(common_dir)
+    if state is None:
+        return
+    for ref in state["refs"]:
+        try:
+            git(work_dir, "update-ref", "-d", BACKUP_PREFIX + ref)
+        except subprocess.CalledProcessError:
+            pass
+    os.unlink(state_path(common_dir))
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 2 or argv[1] not in ("analyze", "migrate", "report",
+                                        "finish"):
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        return 2
+    repository = find_repository(os.getcwd())
+    if repository is None:
+        print("Not in a repository", file=sys.stderr)
+        return 1
+    work_dir, common_dir = repository.work_dir, repository.common_dir
+    everything = "--everything" in argv[2:]
+    try:
+        if argv[1] == "analyze":
+            json.dump(analyze(work_dir, everything), sys.stdout, indent=1)
+        elif argv[1] == "migrate":
+            def on_progress(ref: str, done: int, total: int, line: str):
+                if line:
+                    print(f"[{done + 1}/{total}] {ref}: {line}",
+                          file=sys.stderr)
+
+            migrate(work_dir, common_dir, everything, on_progress)
+            json.dump(size_report(work_dir, common_dir), sys.stdout)
+        elif argv[1] == "report":
+            json.dump(size_report(work_dir, common_dir), sys.stdout)
+        else:
+            finish(work_dir, common_dir)
+    except subprocess.CalledProcessError as e:
+        output = e.output or e.stderr or b""
+        if isinstance(output, bytes):
+            output = output.decode("utf-8", "replace")
+        print(output.strip() or e, file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
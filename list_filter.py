@@ -0,0 +1,106 @@
+import fnmatch
+import re
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+Result = Tuple[List[int], List[int]]
+
+# Bumped whenever the items of a list change, by list
+versions: Dict[str, int] = {}
+# Flags and order last computed for each list, with what they depend on
+_results: Dict[str, Tuple[Hashable, Result]] = {}
+
+
+def changed(name: str):
+    """Marks the items of a list as changed, so it is filtered again"""
+    versions[name] = versions.get(name, 0) + 1
+
+
+def cached(name: str, settings: Hashable,
+           compute: Callable[[], Result]) -> Result:
+    """Returns the flags and order of a list, computing them only when
+    its items or the filter settings changed
+
+    Blender calls UIList.filter_items() on every redraw, so with
+    thousands of items this is what keeps drawing cheap.
+
+    Args:
+        settings: Everything the result depends on besides the items
+    """
+    key = (versions.get(name, 0), settings)
+    result = _results.get(name)
+    if result is None or result[0] != key:
+        result = (key, compute())
+        _results[name] = result
+    return result[1]
+
+
+def name_pattern(text: str) -> Optional["re.Pattern"]:
+    """Compiles a filter text the way Blender's lists match it:
+    anywhere in the name, ignoring case, with * and ? as wildcards"""
+    if not text:
+        return None
+    return re.compile(fnmatch.translate(f"*{text}*"), re.IGNORECASE)
+
+
+def glob_pattern(text: str) -> Optional[str]:
+    """Translates a filter text into an SQLite GLOB pattern, which
+    matches lowercased names the way name_pattern() does"""
+    if not text:
+        return None
+    # GLOB negates sets with ^ and matches nothing for an open [, which
+    # fnmatch takes literally
+    glob = re.sub(r"\[(?![^\]]*\])", "[[]", f"*{text.lower()}*")
+    return glob.replace("[!", "[^")
+
+
+def grep_pattern(text: str) -> Optional[str]:
+    """Translates a filter text into an extended regular expression for
+    git log --grep, to be used with --regexp-ignore-case"""
+    if not text:
+        return None
+    return "".join(".*" if char == "*" else "." if char == "?"
+                   else "\\" + char if char in "[].^$|()+{}\\" else char
+                   for char in text)
+
+
+def filter_flags(names: Sequence[str], text: str, bitflag: int,
+                 keep: Optional[Sequence[bool]] = None,
+                 invert: bool = False) -> List[int]:
+    """Flags the items to show
+
+    Args:
+        text: Filter text names have to match
+        keep: Whether each item passes the other filters
+        invert: The list's use_filter_invert. Blender inverts the flags
+            of the whole list, so they are made for it to invert only
+            the name match, not keep
+
+    Returns:
+        list: bitflag for shown items, an empty list when all are
+    """
+    pattern = name_pattern(text)
+    if pattern is None and keep is None:
+        return []
+    match = pattern.match if pattern is not None else None
+    if invert and keep is not None:
+        return [bitflag if not keep[index]
+                or (match is not None and match(name)) else 0
+                for index, name in enumerate(names)]
+    return [bitflag if (match is None or match(name))
+            and (keep is None or keep[index]) else 0
+            for index, name in enumerate(names)]
+
+
+def sort_order(keys: Optional[Sequence[Any]]) -> List[int]:
+    """Returns the new position of each item, sorted by keys
+
+    Items with equal keys keep their order. None keeps the order of all.
+    """
+    if keys is None:
+        return []
+    order = [0] * len(keys)
+    for position, index in enumerate(sorted(range(len(keys)),
+                                            key=keys.__getitem__)):
+        order[index] = position
+    return order
@@ -0,0 +1,210 @@
+from operator import attrgetter
+from typing import Any, Dict, List, Sequence, Tuple
+
+
+# Shifts reordering may take per item, before items are rewritten in
+# place instead of moved
+MOVE_BUDGET = 4
+
+# Rows each list was last synced with, so they are compared instead of
+# the items, which are slow to read in Blender
+_synced: Dict[str, List[Tuple]] = {}
+
+
+def sync(name: str, collection, fields: Sequence[str],
+         rows: List[Tuple], keep: Sequence[str] = (),
+         owner: Any = None, index_prop: str = "") -> bool:
+    """Makes a CollectionProperty hold rows, in order, writing only what
+    changed
+
+    Items are matched to rows by their first field, the key: items of
+    rows gone are removed, new rows are added and moved into place, and
+    fields are only written where they differ. When most items changed
+    place, the collection is cleared and filled again instead. The
+    active index follows the active item.
+
+    Args:
+        name: Name of the list, to remember what it was synced with
+        fields: Properties the values of each row are written to
+        keep: Properties of the items that stay with their key, like
+            whether a file is selected
+        owner: Holds the active index as index_prop
+
+    Returns:
+        bool: Whether the collection changed
+    """
+    previous = _synced.get(name)
+    if previous is None or len(previous) != len(collection):
+        # Not synced here before, or changed by someone else
+        previous = [tuple(item.get(field) for field in fields)
+                    for item in collection]
+    elif previous == rows:
+        return False
+    keys = [row[0] for row in rows]
+    current = [row[0] for row in previous]
+    index = getattr(owner, index_prop) if owner is not None else -1
+    active = current[index] if 0 <= index < len(current) else None
+
+    if current != keys and mostly_moved(current, keys):
+        # Moving would cost more than adding every item again
+        rebuild(collection, current, rows, fields, keep)
+        set_active(owner, index_prop, index, active, keys)
+        _synced[name] = rows
+        return True
+
+    wanted = set(keys)
+    # What each item holds, by key, so the collection is not read again
+    old: Dict[Any, Tuple] = {}
+    for row in previous:
+        old.setdefault(row[0], row)
+
+    # Duplicates are dropped too, keys are unique from here on
+    seen = set()
+    stale = []
+    for position, item_key in enumerate(current):
+        if item_key not in wanted or item_key in seen:
+            stale.append(position)
+        seen.add(item_key)
+    for position in reversed(stale):
+        collection.remove(position)
+        del current[position]
+    changed = bool(stale)
+    for row, row_key in zip(rows, keys):
+        if row_key not in seen:
+            write(collection.add(), fields, row)
+            current.append(row_key)
+            old[row_key] = row
+            changed = True
+
+    if current != keys:
+        changed = True
+        if not reorder(collection, current, keys):
+            for position in rewrite(collection, current, keys, rows,
+                                    fields, keep):
+                old[keys[position]] = rows[position]
+    for position, row in enumerate(rows):
+        old_row = old[row[0]]
+        if old_row == row:
+            continue
+        item = collection[position]
+        for field, value, old_value in zip(fields, row, old_row):
+            if old_value != value:
+                item[field] = value
+        changed = True
+
+    set_active(owner, index_prop, index, active, keys)
+    _synced[name] = rows
+    return changed
+
+
+def set_active(owner: Any, index_prop: str, index: int, active: Any,
+               keys: List):
+    """Points the active index at the item that was active, or keeps it
+    in range when that item is gone"""
+    if owner is None or len(keys) == 0:
+        return
+    try:
+        new_index = keys.index(active)
+    except ValueError:
+        new_index = min(max(index, 0), len(keys) - 1)
+    if new_index != index:
+        # Not through the property, so its update callback does not run
+        # for what is the same selection
+        owner[index_prop] = new_index
+
+
+def mostly_moved(current: List, keys: List) -> bool:
+    """Checks if more than half of the items have to be moved to get
+    from current to keys
+
+    An item counts as moved when it comes before the one it followed,
+    so items added or removed in between do not count.
+    """
+    positions = {item_key: position
+                 for position, item_key in enumerate(keys)}
+    allowed = len(keys) // 2
+    last = -1
+    for item_key in current:
+        position = positions.get(item_key)
+        if position is None:
+            continue
+        if position < last:
+            allowed -= 1
+            if allowed < 0:
+                return True
+        last = position
+    return False
+
+
+def write(item: Any, fields: Sequence[str], row: Tuple):
+    for field, value in zip(fields, row):
+        item[field] = value
+
+
+def rebuild(collection, current: List, rows: List[Tuple],
+            fields: Sequence[str], keep: Sequence[str]):
+    """Clears the collection and adds every row again, carrying the kept
+    properties along where they differ from those of a new item"""
+    # One value for each item with a single kept property, else a tuple
+    read_kept = attrgetter(*keep) if keep else None
+    kept: Dict[Any, Any] = {}
+    if read_kept is not None:
+        kept = dict(zip(current, map(read_kept, collection)))
+    collection.clear()
+    defaults = None
+    for row in rows:
+        item = collection.add()
+        for field, value in zip(fields, row):
+            item[field] = value
+        if read_kept is None:
+            continue
+        if defaults is None:
+            defaults = read_kept(item)
+        values = kept.get(row[0], defaults)
+        if values != defaults:
+            for prop, value in zip(keep, values if len(keep) > 1
+                                   else (values,)):
+                item[prop] = value
+
+
+def reorder(collection, current: List, keys: List) -> bool:
+    """Moves items into the order of keys, holding the same keys
+
+    Returns:
+        bool: False when more moving than MOVE_BUDGET allows was needed,
+            with the items partly moved
+    """
+    budget = MOVE_BUDGET * len(keys)
+    for target, target_key in enumerate(keys):
+        if current[target] == target_key:
+            continue
+        source = current.index(target_key, target)
+        budget -= source - target
+        if budget < 0:
+            return False
+        collection.move(source, target)
+        current.insert(target, current.pop(source))
+    return True
+
+
+def rewrite(collection, current: List, keys: List, rows: List[Tuple],
+            fields: Sequence[str], keep: Sequence[str]) -> List[int]:
+    """Writes each row over the item at its position, carrying the kept
+    properties along, for orders too different to move into
+
+    Returns:
+        list: Positions written
+    """
+    kept: Dict[Any, List[Any]] = {
+        item_key: [getattr(item, prop) for prop in keep]
+        for item_key, item in zip(current, collection)}
+    written = []
+    for position, (item, row) in enumerate(zip(collection, rows)):
+        if current[position] == keys[position]:
+            continue
+        write(item, fields, row)
+        for prop, value in zip(keep, kept[keys[position]]):
+            item[prop] = value
+        current[position] = keys[position]
+        written.append(position)
+    return written
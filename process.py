@@ -0,0 +1,234 @@
+"""Runs git and the helper scripts without a shell
+
+Commands are argument lists, so nothing needs quoting and no shell
+starts in front of every git process. The environment of a repository
+is built once it exists; it points GIT_DIR at the repository, so git
+does not search for it either. Every git command is traced here.
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    from . import tracing
+    from .refs import find_repository
+except ImportError:
+    # Imported by cli.py run as a script
+    import tracing
+    from refs import find_repository
+
+
+# How often a command that can be cancelled checks for it
+CANCEL_POLL = 0.1
+
+# Seconds after which git() gives up on a command, None to wait forever
+default_timeout: Optional[float] = None
+_environments: Dict[str, Dict[str, str]] = {}
+_lock = threading.Lock()
+
+
+class Cancelled(Exception):
+    pass
+
+
+def set_default_timeout(seconds: Optional[float]):
+    global default_timeout
+    default_timeout = seconds or None
+
+
+def environment(work_dir: str) -> Dict[str, str]:
+    """Returns the environment commands run with in a work dir"""
+    env = _environments.get(work_dir)
+    if env is None:
+        # The interpreter the .blend filter runs with, see tools/lfs.py
+        env = dict(os.environ, BLENDGIT_PYTHON=sys.executable)
+        repository = find_repository(work_dir)
+        if repository is None:
+            # Left to git, and built again once git init created one
+            return env
+        if os.path.normpath(repository.work_dir) \
+                == os.path.normpath(work_dir):
+            env["GIT_DIR"] = repository.git_dir
+        with _lock:
+            _environments[work_dir] = env
+    return env
+
+
+def forget_environments():
+    """Builds the environments again, after a repository was created or
+    os.environ changed"""
+    with _lock:
+        _environments.clear()
+
+
+def stop(process: subprocess.Popen):
+    """Kills a process started by start(), with the processes it started"""
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def start(args: List[str], work_dir: str,
+          env: Optional[Dict[str, str]] = None,
+          **kwargs) -> subprocess.Popen:
+    """Starts a command in its own process group, so stop() also ends
+    the filters and hooks git runs
+
+    Args:
+        env: Variables to set on top of the environment of work_dir
+        kwargs: Passed on to subprocess.Popen
+    """
+    full_env = environment(work_dir)
+    if env:
+        full_env = dict(full_env, **env)
+    return subprocess.Popen(args, cwd=work_dir, env=full_env,
+                            start_new_session=os.name != "nt", **kwargs)
+
+
+def _feed(pipe: int, data: bytes):
+    """Writes data to a pipe and closes it"""
+    try:
+        with open(pipe, "wb") as f:
+            f.write(data)
+    except BrokenPipeError:
+        # The command exited without reading all of it
+        pass
+
+
+@tracing.forwarder
+def run(args: List[str], work_dir: str,
+        input: Optional[bytes] = None,
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        stdout=subprocess.PIPE,
+        check: bool = True) -> subprocess.CompletedProcess:
+    """Runs a command and waits for it
+
+    Args:
+        input: Fed to stdin, which is empty otherwise
+        timeout: Seconds after which the command is stopped
+        cancel: Stops the command once set
+        stdout: Where the output goes, captured by default
+        check: Raise when the command fails
+
+    Raises:
+        subprocess.CalledProcessError: The command failed, with what it
+            printed to stderr
+        subprocess.TimeoutExpired: The timeout passed
+        Cancelled: cancel was set
+    """
+    span = tracing.start_git(args[1:]) \
+        if tracing.enabled and args[0] == "git" else None
+    deadline = None if timeout is None else time.monotonic() + timeout
+    stdin = subprocess.DEVNULL
+    if input is not None:
+        # Fed from a thread, as communicate() stops writing the input
+        # once it timed out, which it does every CANCEL_POLL, and
+        # refuses to be given it again
+        stdin, pipe = os.pipe()
+    try:
+        process = start(args, work_dir, env, stdin=stdin, stdout=stdout,
+                        stderr=subprocess.PIPE)
+    except BaseException:
+        if input is not None:
+            os.close(pipe)
+        raise
+    finally:
+        if input is not None:
+            os.close(stdin)
+    if input is not None:
+        threading.Thread(target=_feed, args=(pipe, input),
+                         daemon=True).start()
+    with process:
+        while True:
+            wait = None if deadline is None \
+                else max(deadline - time.monotonic(), 0)
+            if cancel is not None:
+                wait = CANCEL_POLL if wait is None else min(wait,
+                                                            CANCEL_POLL)
+            try:
+                output, errors = process.communicate(timeout=wait)
+                break
+            except subprocess.TimeoutExpired:
+                cancelled = cancel is not None and cancel.is_set()
+                if not cancelled and (deadline is None
+                                      or time.monotonic() < deadline):
+                    continue
+                stop(process)
+                process.communicate()
+                if span is not None:
+                    tracing.finish(span, -1)
+                if cancelled:
+                    raise Cancelled()
+                raise subprocess.TimeoutExpired(args, timeout)
+
+    if span is not None:
+        tracing.finish(span, process.returncode, len(output or b""))
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args,
+                                            output, errors)
+    return subprocess.CompletedProcess(args, process.returncode, output,
+                                       errors)
+
+
+@tracing.forwarder
+def git(work_dir: str, *args,
+        input: Optional[bytes] = None,
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None) -> bytes:
+    """Runs git and returns what it printed
+
+    Args:
+        timeout: Seconds to wait, default_timeout when None
+    """
+    return run(["git", *(str(arg) for arg in args)], work_dir, input, env,
+               default_timeout if timeout is None else timeout).stdout
+
+
+@tracing.forwarder
+def stream(args: List[str], work_dir: str,
+           on_line: Optional[Callable[[str], None]] = None,
+           on_start: Optional[Callable[[subprocess.Popen], None]] = None):
+    """Runs a command, handing each line it prints to on_line
+
+    stderr is merged into stdout, so progress and errors are seen in
+    order.
+
+    Args:
+        on_start: Gets the process once it started, to stop() it from
+            another thread
+
+    Raises:
+        subprocess.CalledProcessError: The command failed, with all it
+            printed as output
+    """
+    span = tracing.start_git(args[1:]) \
+        if tracing.enabled and args[0] == "git" else None
+    process = start(args, work_dir, stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                    text=True, encoding="utf-8", errors="replace")
+    if on_start is not None:
+        on_start(process)
+    lines = []
+    with process:
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            lines.append(line)
+            if on_line is not None:
+                on_line(line)
+    if span is not None:
+        tracing.finish(span, process.returncode,
+                       sum(len(line) + 1 for line in lines))
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args,
+                                            output="\n".join(lines))
@@ -0,0 +1,161 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+
+class Repository:
+    """Locations of a repository on disk
+
+    Attributes:
+        work_dir: Top level of the working tree
+        git_dir: Git directory of this working tree. For linked worktrees
+            this is .git/worktrees/<name> in the main repository
+        common_dir: Directory holding refs and objects shared by all
+            worktrees (the same as git_dir outside of linked worktrees)
+    """
+    __slots__ = ("work_dir", "git_dir", "common_dir")
+
+    def __init__(self, work_dir: str, git_dir: str, common_dir: str):
+        self.work_dir = work_dir
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+
+    def __repr__(self) -> str:
+        return f"Repository({self.work_dir!r})"
+
+
+_repositories: Dict[str, Repository] = {}
+
+
+def read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def resolve_git_dir(dot_git: str) -> Optional[str]:
+    """Follows a .git entry, which may be a gitdir file for worktrees"""
+    if os.path.isdir(dot_git):
+        return dot_git
+    content = read_text(dot_git)
+    if content is None or not content.startswith("gitdir:"):
+        return None
+    git_dir = content[len("gitdir:"):].strip()
+    if not os.path.isabs(git_dir):
+        git_dir = os.path.join(os.path.dirname(dot_git), git_dir)
+    git_dir = os.path.normpath(git_dir)
+    return git_dir if os.path.isdir(git_dir) else None
+
+
+def find_repository(path: str) -> Optional[Repository]:
+    """Finds the repository containing a path by walking up from it"""
+    directory = os.path.abspath(path)
+    while True:
+        git_dir = resolve_git_dir(os.path.join(directory, ".git"))
+        if git_dir is not None:
+            common_dir = git_dir
+            commondir = read_text(os.path.join(git_dir, "commondir"))
+            if commondir:
+                common_dir = os.path.normpath(
+                    os.path.join(git_dir, commondir))
+            return Repository(directory, git_dir, common_dir)
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+def locate_repository(filepath: str) -> Optional[Repository]:
+    """Returns the repository of a file, memoized on its path
+
+    Only repositories that were found are remembered, so one created
+    later with `git init` is still picked up.
+    """
+    repository = _repositories.get(filepath)
+    if repository is not None \
+            and os.path.isdir(repository.git_dir):
+        return repository
+    repository = find_repository(os.path.dirname(filepath))
+    if repository is not None:
+        _repositories[filepath] = repository
+    return repository
+
+
+def has_reftable(repository: Repository) -> bool:
+    """Checks for the reftable backend, which this reader cannot parse"""
+    return os.path.isdir(os.path.join(repository.common_dir, "reftable"))
+
+
+def read_packed_refs(repository: Repository) -> Dict[str, str]:
+    refs = {}
+    content = read_text(os.path.join(repository.common_dir, "packed-refs"))
+    if not content:
+        return refs
+    for line in content.splitlines():
+        # Skip the header and the peeled values of annotated tags
+        if not line or line[0] in "#^":
+            continue
+        oid, _, name = line.partition(" ")
+        refs[name] = oid
+    return refs
+
+
+def ref_path(repository: Repository, name: str) -> str:
+    """Returns where a loose ref lives
+
+    HEAD and other pseudo refs belong to the worktree, everything under
+    refs/ is shared.
+    """
+    if name.startswith("refs/"):
+        return os.path.join(repository.common_dir, *name.split("/"))
+    return os.path.join(repository.git_dir, name)
+
+
+def resolve_ref(repository: Repository, name: str,
+                depth: int = 5) -> Optional[str]:
+    """Resolves a ref (following symbolic refs) to a commit hash"""
+    content = read_text(ref_path(repository, name))
+    if content is None:
+        return read_packed_refs(repository).get(name)
+    if content.startswith("ref:"):
+        if depth == 0:
+            return None
+        return resolve_ref(repository, content[4:].strip(), depth - 1)
+    return content or None
+
+
+def read_head(repository: Repository) -> Tuple[Optional[str], Optional[str]]:
+    """Reads HEAD
+
+    Returns:
+        tuple: The checked out branch (None when detached) and the commit
+            HEAD points at (None before the first commit)
+    """
+    content = read_text(os.path.join(repository.git_dir, "HEAD")) or ""
+    if content.startswith("ref:"):
+        ref = content[4:].strip()
+        branch = ref[len("refs/heads/"):] \
+            if ref.startswith("refs/heads/") else ref
+        return branch, resolve_ref(repository, ref)
+    return None, content or None
+
+
+def list_local_branches(repository: Repository) -> List[str]:
+    """Lists the names of refs/heads, loose and packed, sorted"""
+    branches = set()
+    heads = os.path.join(repository.common_dir, "refs", "heads")
+    for dirpath, _, filenames in os.walk(heads):
+        for filename in filenames:
+            if filename.endswith(".lock"):
+                continue
+            path = os.path.relpath(os.path.join(dirpath, filename), heads)
+            branches.add(path.replace(os.sep, "/"))
+    for name in read_packed_refs(repository):
+        if name.startswith("refs/heads/"):
+            branches.add(name[len("refs/heads/"):])
+    return sorted(branches)
+
+
+def branch_exists(repository: Repository, branch: str) -> bool:
+    return resolve_ref(repository, "refs/heads/" + branch) is not None
@@ -0,0 +1,118 @@
+from typing import Dict, List, Optional
+
+
+STATUS_TYPE = {
+    "M": "modified",
+    "T": "modified",
+    "A": "added",
+    "D": "deleted",
+    "R": "renamed",
+    "C": "copied",
+    "U": "unmerged",
+    ".": "",
+}
+
+
+class RepoSnapshot:
+    """State of a repository at one point in time
+
+    Built from a single `git status --porcelain=v2 --branch -z` call so
+    every panel and operator can share it instead of querying git on its
+    own.
+
+    Attributes:
+        oid: Commit hash of HEAD (empty before the first commit)
+        head: Name of the checked out branch, or None when detached
+        upstream: Upstream branch, or None when not tracking one
+        ahead: Commits on HEAD missing from upstream
+        behind: Commits on upstream missing from HEAD
+        entries: Per-file entries, as returned by common.status()
+    """
+    __slots__ = ("oid", "head", "upstream", "ahead", "behind", "entries")
+
+    def __init__(self):
+        self.oid = ""
+        self.head: Optional[str] = None
+        self.upstream: Optional[str] = None
+        self.ahead = 0
+        self.behind = 0
+        self.entries: List[Dict] = []
+
+    @property
+    def clean(self) -> bool:
+        """Whether there is nothing to commit, including untracked files"""
+        return len(self.entries) == 0
+
+    @property
+    def detached(self) -> bool:
+        return self.head is None
+
+    @property
+    def branch(self) -> str:
+        """Branch name, or the abbreviated commit when HEAD is detached"""
+        if self.head is not None:
+            return self.head
+        return self.oid[:7]
+
+
+def make_entry(code: str, file_path: str,
+               orig_path: Optional[str] = None) -> Dict:
+    """Builds a file entry from a two letter XY status code"""
+    if code == "??":
+        staged_status = ""
+        working_status = "new"
+    else:
+        staged_status = STATUS_TYPE.get(code[0], code[0])
+        working_status = STATUS_TYPE.get(code[1], code[1])
+
+    return {
+        "status": staged_status if staged_status else working_status,
+        "file_path": file_path,
+        "orig_path": orig_path,
+        "staged": bool(staged_status),
+    }
+
+
+def parse_status(output: str) -> RepoSnapshot:
+    """Parses the output of `git status --porcelain=v2 --branch -z`
+
+    Paths are taken verbatim since -z disables quoting, so names with
+    spaces or quotes need no unescaping.
+    """
+    snapshot = RepoSnapshot()
+    records = output.split("\0")
+    i = 0
+    while i < len(records):
+        record = records[i]
+        i += 1
+        if not record:
+            continue
+        kind = record[0]
+        if kind == "#":
+            _, key, value = record.split(" ", 2)
+            if key == "branch.oid":
+                snapshot.oid = "" if value == "(initial)" else value
+            elif key == "branch.head":
+                snapshot.head = None if value == "(detached)" else value
+            elif key == "branch.upstream":
+                snapshot.upstream = value
+            elif key == "branch.ab":
+                ahead, behind = value.split(" ")
+                snapshot.ahead = int(ahead)
+                snapshot.behind = -int(behind)
+        elif kind == "1":
+            fields = record.split(" ", 8)
+            snapshot.entries.append(make_entry(fields[1], fields[8]))
+        elif kind == "2":
+            # The original path follows as its own NUL separated record
+            fields = record.split(" ", 9)
+            snapshot.entries.append(
+                make_entry(fields[1], fields[9], records[i]))
+            i += 1
+        elif kind == "u":
+            fields = record.split(" ", 10)
+            snapshot.entries.append(make_entry(fields[1], fields[10]))
+        elif kind == "?":
+            snapshot.entries.append(make_entry("??", record[2:]))
+
+    return snapshot
@@ -1,7 +1,14 @@
 import bpy
 
+from .tracing import traced_draw
+
 
 class ToolPanel(bpy.types.Panel):
     bl_category = "Git"
     bl_space_type = "VIEW_3D"
     bl_region_type = "UI"
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "draw" in vars(cls):
+            cls.draw = traced_draw(cls.draw)
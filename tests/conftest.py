@@ -0,0 +1,26 @@
+"""Lets pytest collect the tests without importing the add-on
+
+The add-on's __init__.py imports bpy, which only exists within Blender,
+and pytest imports it to set up the package the tests are in. The
+add-on directory is collected as a plain directory instead.
+"""
+import os
+
+import pytest
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class AddonDirectory:
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collect_directory(self, path, parent):
+        if str(path) == ADDON_DIR:
+            return pytest.Dir.from_parent(parent, path=path)
+        return None
+
+
+def pytest_configure(config):
+    # Conftest hooks only apply to the directories below them, a plugin
+    # to every directory
+    config.pluginmanager.register(AddonDirectory(), "blendgit-addon-dir")
@@ -0,0 +1,60 @@
+"""Temporary repositories for the tests
+
+Importing this puts the add-on directory on the path, so the modules
+that do not need Blender import as top level modules, the way cli.py
+runs them.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import Dict
+from unittest import mock
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ADDON_DIR not in sys.path:
+    sys.path.insert(0, ADDON_DIR)
+
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "Blendgit", "GIT_AUTHOR_EMAIL": "blendgit@example.com",
+    "GIT_COMMITTER_NAME": "Blendgit",
+    "GIT_COMMITTER_EMAIL": "blendgit@example.com",
+}
+
+
+def git(cwd: str, *args: str) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True,
+                          capture_output=True).stdout.decode()
+
+
+class RepositoryTestCase(unittest.TestCase):
+    """Runs each test in a new repository with one branch, main"""
+
+    def setUp(self):
+        self.work_dir = os.path.realpath(
+            tempfile.mkdtemp(prefix="blendgit-test-"))
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        self.git_dir = os.path.join(self.work_dir, ".git")
+        patcher = mock.patch.dict(os.environ, IDENTITY)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        git(self.work_dir, "init", "-q", "-b", "main")
+
+    def git(self, *args: str) -> str:
+        return git(self.work_dir, *args)
+
+    def write(self, files: Dict[str, bytes]):
+        for path, data in files.items():
+            path = os.path.join(self.work_dir, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+
+    def commit(self, files: Dict[str, bytes], message: str) -> str:
+        """Writes and commits files, returning the new commit"""
+        self.write(files)
+        self.git("add", "--all")
+        self.git("commit", "-q", "-m", message)
+        return self.git("rev-parse", "HEAD").strip()
@@ -0,0 +1,61 @@
+"""Snapshots files to the autosave ref and prunes the old snapshots"""
+import os
+import unittest
+from unittest import mock
+
+import support
+import core
+import process
+
+
+class SnapshotTest(support.RepositoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(process.forget_environments)
+        self.commit({"scene.blend": b"BLENDER-v402 0"}, "Add the scene")
+        self.source = os.path.join(self.work_dir, "scene.blend")
+        self.ref = core.autosave_ref("main")
+
+    def autosave(self, revision: int, keep: int):
+        self.write({"scene.blend": b"BLENDER-v402 %d" % revision})
+        return core.snapshot(self.work_dir, self.git_dir, self.source,
+                             "scene.blend", "main", keep)
+
+    def snapshots(self):
+        return self.git("rev-list", self.ref).split()
+
+    def test_snapshot_leaves_the_branch_alone(self):
+        head = self.git("rev-parse", "HEAD")
+
+        commit = self.autosave(1, keep=3)
+
+        self.assertEqual(self.snapshots(), [commit])
+        self.assertEqual(self.git("rev-parse", "HEAD"), head)
+        self.assertEqual(self.git("status", "--porcelain"), " M scene.blend\n")
+        self.assertEqual(self.git("show", f"{commit}:scene.blend"),
+                         "BLENDER-v402 1")
+        # Nothing changed since
+        self.assertIsNone(core.snapshot(self.work_dir, self.git_dir,
+                                        self.source, "scene.blend", "main",
+                                        3))
+
+    def test_prunes_in_batches(self):
+        with mock.patch.object(process, "run", wraps=process.run) as run:
+            for revision in range(1, 13):
+                self.autosave(revision, keep=3)
+                # Never fewer than kept, never twice as many
+                self.assertEqual(len(self.snapshots()),
+                                 min(revision, 3 + (revision - 3) % 3))
+
+        commit_trees = [call for call in run.call_args_list
+                        if call.args[0][1] == "commit-tree"]
+        # One for each snapshot, and three for each of the prunings on
+        # the 6th, 9th and 12th
+        self.assertEqual(len(commit_trees), 12 + 3 * 3)
+        self.assertEqual(self.git("show", f"{self.ref}:scene.blend"),
+                         "BLENDER-v402 12")
+
+
+if __name__ == "__main__":
+    unittest.main()
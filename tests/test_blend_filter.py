@@ -0,0 +1,131 @@
+"""Cleans and smudges .blend files, whole or in chunks"""
+import gzip
+import io
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import support  # noqa: F401
+import blend_filter
+from blend_filter import (DECOMPRESSED_HEADER, MANIFEST_HEADER, MAX_CHUNK,
+                          MIN_CHUNK, ChunkStore)
+
+
+def random_data(size: int, seed: int = 0) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def blend_data(size: int, seed: int = 0) -> bytes:
+    return b"BLENDER-v402" + random_data(size, seed)
+
+
+class ChunkingTest(unittest.TestCase):
+
+    def test_chunks_rebuild_the_file(self):
+        data = random_data(3 * 1024 * 1024)
+        chunks = list(blend_filter.iter_chunks(io.BytesIO(data)))
+
+        self.assertEqual(b"".join(chunks), data)
+        for chunk in chunks[:-1]:
+            self.assertGreaterEqual(len(chunk), MIN_CHUNK)
+            self.assertLessEqual(len(chunk), MAX_CHUNK)
+
+    def test_cuts_follow_content(self):
+        data = random_data(3 * 1024 * 1024)
+        # Bytes inserted near the start only change the first chunks
+        edited = data[:1000] + b"inserted" + data[1000:]
+
+        chunks = set(blend_filter.iter_chunks(io.BytesIO(data)))
+        edited_chunks = list(blend_filter.iter_chunks(io.BytesIO(edited)))
+
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(len([chunk for chunk in edited_chunks
+                              if chunk not in chunks]), 1)
+
+    def test_without_numpy_cuts_the_same(self):
+        if blend_filter.GEAR_ARRAY is None:
+            self.skipTest("numpy is not installed")
+        data = random_data(1024 * 1024, seed=1)
+        expected = blend_filter.find_cut(data, 0, len(data))
+        with mock.patch.object(blend_filter, "GEAR_ARRAY", None):
+            self.assertEqual(blend_filter.find_cut(data, 0, len(data)),
+                             expected)
+
+    def test_large_files_need_numpy(self):
+        directory = tempfile.mkdtemp(prefix="blendgit-chunks-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "scene.blend")
+        with open(path, "wb") as f:
+            f.write(blend_data(1000))
+
+        with mock.patch.object(blend_filter, "MAX_PYTHON_CHUNKED", 500):
+            with mock.patch.object(blend_filter, "GEAR_ARRAY", None):
+                self.assertTrue(blend_filter.chunking_too_slow(path))
+                self.assertFalse(blend_filter.chunking_too_slow(None))
+            self.assertEqual(blend_filter.chunking_too_slow(path),
+                             blend_filter.GEAR_ARRAY is None)
+
+    def test_short_data_waits_for_more(self):
+        self.assertIsNone(blend_filter.find_cut(b"x" * 100, 0, 100))
+
+
+class CleanSmudgeTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix="blendgit-chunks-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.store = ChunkStore(directory)
+
+    def round_trip(self, data: bytes, store=None) -> bytes:
+        cleaned = io.BytesIO()
+        blend_filter.clean(io.BytesIO(data), cleaned, store)
+        restored = io.BytesIO()
+        blend_filter.smudge(io.BytesIO(cleaned.getvalue()), restored, store,
+                            lfs=False)
+        return cleaned.getvalue(), restored.getvalue()
+
+    def test_uncompressed_is_stored_as_is(self):
+        data = blend_data(1000)
+        self.assertEqual(self.round_trip(data), (data, data))
+
+    def test_gzip_is_stored_decompressed(self):
+        data = blend_data(100000)
+        compressed = gzip.compress(data, compresslevel=1)
+
+        cleaned, restored = self.round_trip(compressed)
+
+        self.assertEqual(cleaned, DECOMPRESSED_HEADER + b"gzip\n" + data)
+        self.assertEqual(gzip.decompress(restored), data)
+
+    def test_cleaning_twice_changes_nothing(self):
+        cleaned, _ = self.round_trip(gzip.compress(blend_data(1000)))
+        self.assertEqual(self.round_trip(cleaned)[0], cleaned)
+
+    def test_chunks(self):
+        data = blend_data(2 * 1024 * 1024)
+
+        cleaned, restored = self.round_trip(data, self.store)
+
+        self.assertTrue(cleaned.startswith(MANIFEST_HEADER))
+        compression, chunks = blend_filter.read_manifest(cleaned)
+        self.assertEqual(compression, "")
+        self.assertEqual(sum(size for _, size in chunks), len(data))
+        self.assertTrue(all(oid in self.store for oid, _ in chunks))
+        self.assertEqual(restored, data)
+
+    def test_damaged_chunk(self):
+        cleaned, _ = self.round_trip(blend_data(200000), self.store)
+        oid = blend_filter.read_manifest(cleaned)[1][0][0]
+        with open(self.store.path(oid), "wb") as f:
+            f.write(b"damaged")
+
+        with self.assertRaises(LookupError):
+            blend_filter.smudge(io.BytesIO(cleaned), io.BytesIO(),
+                                self.store, lfs=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Reads the file and block headers of .blend files"""
+import struct
+import unittest
+
+import support  # noqa: F401
+from blendfile import FileHeader
+
+
+class FileHeaderTest(unittest.TestCase):
+
+    def test_legacy_64_bit(self):
+        header = FileHeader(b"BLENDER-v402")
+        self.assertEqual((header.size, header.version, header.pointer_size,
+                          header.little_endian), (12, 402, 8, True))
+        data = struct.pack("<4siQii", b"OB\0\0", 1200, 0xdeadbeef, 42, 3)
+
+        block = header.block_header(data)
+
+        self.assertEqual(block.code, b"OB\0\0")
+        self.assertEqual((block.length, block.old_address, block.sdna_index,
+                          block.count), (1200, 0xdeadbeef, 42, 3))
+        self.assertEqual(header.bhead.size, 24)
+
+    def test_legacy_32_bit_big_endian(self):
+        header = FileHeader(b"BLENDER_V279")
+        self.assertEqual((header.version, header.pointer_size,
+                          header.little_endian), (279, 4, False))
+        data = b"pad" + struct.pack(">4siIii", b"ME\0\0", 64, 0x1000, 7, 1)
+
+        block = header.block_header(data, 3)
+
+        self.assertEqual(block, (b"ME\0\0", 64, 0x1000, 7, 1))
+        self.assertEqual(header.ints(struct.pack(">2i", 5, -6), count=2),
+                         (5, -6))
+
+    def test_large_bhead(self):
+        header = FileHeader(b"BLENDER17-01v0500")
+        self.assertEqual((header.size, header.version, header.pointer_size),
+                         (17, 500, 8))
+        # The fields are in another order, with 64 bit length and count
+        data = struct.pack("<4siQqq", b"DATA", 9, 0x2000, 1 << 33, 2)
+
+        block = header.block_header(data)
+
+        self.assertEqual(block, (b"DATA", 1 << 33, 0x2000, 9, 2))
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            FileHeader(b"\x1f\x8b\x08\x00")
+        with self.assertRaises(ValueError):
+            FileHeader(b"BLENDER17-02v0500")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Tells when the status of the working tree has to be read again"""
+import os
+import unittest
+from unittest import mock
+
+import support
+import cache
+from cache import WORKTREE_TTL, RepoStateCache
+
+
+class RepoStateCacheTest(support.RepositoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.commit({"scene.blend": b"scene",
+                     "textures/notes/readme.txt": b"notes"}, "Add files")
+        self.cache = RepoStateCache(self.work_dir)
+        self.cache.set_tracked_files(["scene.blend"])
+        patcher = mock.patch.object(cache.time, "monotonic",
+                                    return_value=100.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache.store("files", self.cache.signature("files"))
+
+    def test_unchanged(self):
+        self.assertTrue(self.cache.is_fresh("files"))
+
+    def test_blend_file_changed(self):
+        self.write({"scene.blend": b"scene changed"})
+        self.assertFalse(self.cache.is_fresh("files"))
+
+    def test_nested_file_changed(self):
+        self.write({"textures/notes/readme.txt": b"notes changed"})
+        os.unlink(os.path.join(self.work_dir, "textures", "notes",
+                               "readme.txt"))
+        self.write({"textures/new/wood.png": b"wood"})
+
+        # Nothing stats these, so the result only expires
+        self.clock.return_value = 100.0 + WORKTREE_TTL / 2
+        self.assertTrue(self.cache.is_fresh("files"))
+        self.clock.return_value = 100.0 + WORKTREE_TTL
+        self.assertFalse(self.cache.is_fresh("files"))
+
+    def test_watched(self):
+        self.cache.set_watched(True)
+        self.cache.store("files", self.cache.signature("files"))
+        self.clock.return_value = 100.0 + 10 * WORKTREE_TTL
+        self.assertTrue(self.cache.is_fresh("files"))
+
+        self.cache.mark_dirty(["files"])
+        self.assertFalse(self.cache.is_fresh("files"))
+
+
+if __name__ == "__main__":
+    unittest.main()
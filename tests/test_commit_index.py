@@ -0,0 +1,171 @@
+"""Indexes the history of a repository and pages through it"""
+import os
+import unittest
+from unittest import mock
+
+import support
+import commit_index
+import core
+import list_filter
+import process
+from commit_index import CommitIndex, read_history
+
+
+class CommitIndexTest(support.RepositoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.commit({"scene.blend": b"0"}, "Commit 0")
+        self.git("checkout", "-q", "-b", "side")
+        self.commit({"side.txt": b"side"}, "Side")
+        self.git("checkout", "-q", "main")
+        for i in range(1, 4):
+            self.commit({"scene.blend": str(i).encode()}, f"Commit {i}")
+        self.git("merge", "-q", "--no-ff", "-m", "Merge side", "side")
+
+    def run_git(self, *args: str) -> str:
+        return self.git(*args)
+
+    def log(self, *args: str):
+        return self.git("log", "--format=%H", *args).split()
+
+    def test_history_follows_git_log(self):
+        head, entries = read_history(self.run_git, self.git_dir)
+
+        self.assertEqual(head, self.log("-1")[0])
+        self.assertEqual([entry["hash"] for entry in entries], self.log())
+        self.assertEqual(entries[0]["message"], "Merge side")
+        self.assertRegex(entries[0]["date"], r"^\d{4}-\d\d-\d\d$")
+
+    def test_pages(self):
+        head, entries = read_history(self.run_git, self.git_dir)
+        pages = []
+        for skip in range(0, len(entries), 2):
+            pages += read_history(self.run_git, self.git_dir, head, skip,
+                                  2)[1]
+        self.assertEqual(pages, entries)
+
+    def test_history_is_ordered_once_per_head(self):
+        head, entries = read_history(self.run_git, self.git_dir)
+        side = self.log("-1", "side")[0]
+        with CommitIndex(self.git_dir) as index, \
+                mock.patch.object(commit_index, "MAX_ORDERED_HEADS", 1):
+            statements = []
+            index.db.set_trace_callback(statements.append)
+            self.assertEqual(list(index.history(head, 2, 2)),
+                             entries[2:4])
+            self.assertFalse([statement for statement in statements
+                              if "RECURSIVE" in statement])
+
+            self.assertEqual([entry["hash"] for entry
+                              in index.history(side)], self.log("side"))
+            # Only the last head ordered keeps its order
+            self.assertEqual(index.db.execute(
+                "SELECT DISTINCT head FROM ordered").fetchall(), [(side,)])
+            self.assertEqual(list(index.history(head)), entries)
+
+    def test_new_commits_build_on_the_order(self):
+        read_history(self.run_git, self.git_dir)
+        for i in range(4, 6):
+            self.commit({"scene.blend": str(i).encode()}, f"Commit {i}")
+        statements = []
+
+        with CommitIndex(self.git_dir) as index:
+            index.db.set_trace_callback(statements.append)
+            head = self.log("-1")[0]
+            index.update(self.run_git, head)
+            history = [entry["hash"] for entry in index.history(head)]
+
+        self.assertEqual(history, self.log())
+        self.assertTrue([statement for statement in statements
+                         if "ordinal + " in statement])
+        self.assertFalse([statement for statement in statements
+                          if "RECURSIVE" in statement])
+
+    def test_updates_with_new_commits(self):
+        read_history(self.run_git, self.git_dir)
+        self.commit({"scene.blend": b"4"}, "Commit 4")
+        head = self.log("-1")[0]
+
+        with CommitIndex(self.git_dir) as index:
+            self.assertEqual(index.update(self.run_git, head), 1)
+            self.assertEqual(index.update(self.run_git, head), 0)
+            self.assertEqual(len(index), len(self.log()))
+
+        entries = read_history(self.run_git, self.git_dir)[1]
+        self.assertEqual([entry["hash"] for entry in entries], self.log())
+
+    def test_rewritten_history(self):
+        read_history(self.run_git, self.git_dir)
+        self.git("reset", "-q", "--hard", "HEAD~2")
+        self.commit({"scene.blend": b"other"}, "Other")
+
+        entries = read_history(self.run_git, self.git_dir)[1]
+
+        # Commits known before keep the order they were indexed in
+        self.assertEqual(entries[0]["message"], "Other")
+        self.assertEqual(sorted(entry["hash"] for entry in entries),
+                         sorted(self.log()))
+
+    def test_search(self):
+        head, entries = read_history(self.run_git, self.git_dir)
+        with CommitIndex(self.git_dir) as index:
+            self.assertEqual(list(index.search(head, "*commit ?*")),
+                             [entry for entry in entries
+                              if entry["message"].startswith("Commit")])
+            self.assertEqual(len(list(index.search(head, "*commit*",
+                                                   count=2))), 2)
+            self.assertEqual(sorted(entry["message"] for entry in
+                                    index.search(head, "*commit*",
+                                                 invert=True)),
+                             ["Merge side", "Side"])
+            self.assertEqual(list(index.search(head, f"*{head[:10]}*")),
+                             entries[:1])
+            self.assertEqual(len(list(index.search(
+                head, f"*{entries[0]['date']}*"))), len(entries))
+
+    def test_search_log(self):
+        # What the revisions panel searches without the index
+        self.addCleanup(process.forget_environments)
+        self.assertEqual(
+            [entry["message"] for entry in core.search_log(
+                self.work_dir, list_filter.grep_pattern("MERGE*de"))],
+            ["Merge side"])
+        self.assertEqual(len(core.search_log(
+            self.work_dir, list_filter.grep_pattern("commit"), True)), 2)
+        self.assertEqual(len(core.search_log(
+            self.work_dir, list_filter.grep_pattern("commit ?"), count=3)),
+            3)
+
+    def test_paths(self):
+        read_history(self.run_git, self.git_dir)
+        side = self.log("-1", "side")[0]
+        with CommitIndex(self.git_dir) as index:
+            self.assertEqual(index.changed_paths(side), ["side.txt"])
+            self.assertEqual(len(index.commits_touching("scene.blend")), 4)
+
+    def test_older_schema_is_replaced(self):
+        read_history(self.run_git, self.git_dir)
+        with CommitIndex(self.git_dir) as index:
+            with index.db:
+                index.db.execute("UPDATE meta SET value = '0' "
+                                 "WHERE key = 'version'")
+
+        with CommitIndex(self.git_dir) as index:
+            self.assertEqual(len(index), 0)
+        entries = read_history(self.run_git, self.git_dir)[1]
+        self.assertEqual(len(entries), len(self.log()))
+        self.assertTrue(os.path.exists(os.path.join(
+            self.git_dir, "blendgit", "commits.sqlite")))
+
+    def test_parse_log(self):
+        output = ("\x1e" + "a" * 40 + "\x1f" + "b" * 40 + " " + "c" * 40
+                  + "\x1f1700000000\x1f2023-11-14\x1fAuthor\x1fSubject"
+                  + "\0\nscene.blend\0textures/a b.png\0")
+        self.assertEqual(list(commit_index.parse_log(output)), [
+            ("a" * 40, ["b" * 40, "c" * 40], 1700000000, "2023-11-14",
+             "Author", "Subject", ["scene.blend", "textures/a b.png"])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Reads the index of a repository without running git"""
+import os
+import time
+import unittest
+
+import support
+import index_reader
+
+
+class IndexReaderTest(support.RepositoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Long paths sharing prefixes, which index v4 compresses
+        self.files = {
+            "scene.blend": b"BLENDER-v402" + b"\0" * 100,
+            "assets/characters/hero/hero.blend": b"hero",
+            "assets/characters/hero/textures/skin.png": b"skin" * 10,
+            "assets/characters/villain/villain.blend": b"villain",
+            "notes with spaces.txt": b"Notes\n",
+        }
+        self.commit(self.files, "Add files")
+
+    def entries(self):
+        entries, _ = index_reader.read_index(self.git_dir)
+        return {entry.path: entry for entry in entries}
+
+    def check_entries(self):
+        entries = self.entries()
+        self.assertEqual(sorted(entries), sorted(self.files))
+        for path, data in self.files.items():
+            entry = entries[path]
+            st = os.lstat(os.path.join(self.work_dir, path))
+            self.assertEqual(entry.size, len(data))
+            self.assertEqual(entry.mtime_s, int(st.st_mtime))
+            self.assertEqual(entry.mode, 0o100644)
+            self.assertEqual(entry.stage, 0)
+
+    def test_version_2(self):
+        self.git("update-index", "--index-version", "2")
+        self.check_entries()
+
+    def test_version_4(self):
+        self.git("update-index", "--index-version", "4")
+        self.check_entries()
+
+    def test_extended_flags(self):
+        self.git("update-index", "--index-version", "3")
+        self.git("update-index", "--skip-worktree", "scene.blend")
+        self.write({"new.txt": b"new"})
+        self.git("add", "--intent-to-add", "new.txt")
+
+        entries = self.entries()
+
+        self.assertTrue(entries["scene.blend"].skip_worktree)
+        self.assertTrue(entries["new.txt"].intent_to_add)
+        self.assertFalse(entries["notes with spaces.txt"].skip_worktree)
+
+    def test_worktree_status(self):
+        # Files written in the same instant as the index are ambiguous
+        time.sleep(0.01)
+        self.git("update-index", "--really-refresh")
+        self.assertTrue(index_reader.worktree_status(
+            self.work_dir, self.git_dir).clean)
+
+        self.write({"assets/characters/hero/hero.blend": b"changed hero"})
+        os.remove(os.path.join(self.work_dir, "notes with spaces.txt"))
+
+        status = index_reader.worktree_status(self.work_dir, self.git_dir)
+        self.assertEqual(sorted(status.dirty),
+                         ["assets/characters/hero/hero.blend",
+                          "notes with spaces.txt"])
+        self.assertFalse(status.clean)
+        self.assertEqual(index_reader.worktree_status(
+            self.work_dir, self.git_dir, paths=["scene.blend"]).dirty, [])
+
+    def test_read_varint(self):
+        self.assertEqual(index_reader.read_varint(b"\x05", 0), (5, 1))
+        # Each continuation adds one before shifting, as in git
+        self.assertEqual(index_reader.read_varint(b"\x80\x00", 0), (128, 2))
+        self.assertEqual(index_reader.read_varint(b"\x00\x81\x01", 1),
+                         (257, 3))
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            index_reader.parse_index(b"DIRC\0\0\0\x09\0\0\0\0")
+
+
+if __name__ == "__main__":
+    unittest.main()
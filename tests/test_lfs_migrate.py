@@ -0,0 +1,167 @@
+"""Analyzes and migrates a temporary repository with lfs_migrate.py
+
+Migrating is skipped without git lfs.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ADDON_DIR)
+import lfs_migrate  # noqa: E402
+from blend_filter import LFS_POINTER_HEADER  # noqa: E402
+
+
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "Blendgit", "GIT_AUTHOR_EMAIL": "blendgit@example.com",
+    "GIT_COMMITTER_NAME": "Blendgit",
+    "GIT_COMMITTER_EMAIL": "blendgit@example.com",
+}
+MAIN = "refs/heads/main"
+SIDE = "refs/heads/side"
+
+
+def has_lfs() -> bool:
+    try:
+        return subprocess.run(["git", "lfs", "version"],
+                              capture_output=True).returncode == 0
+    except OSError:
+        return False
+
+
+def git(cwd: str, *args: str) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True,
+                          capture_output=True).stdout.decode()
+
+
+class LfsMigrateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix="blendgit-migrate-")
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        self.common_dir = os.path.join(self.work_dir, ".git")
+        patcher = mock.patch.dict(os.environ, IDENTITY)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        git(self.work_dir, "init", "-q", "-b", "main")
+        self.commit({"scene.blend": os.urandom(32768),
+                     "textures/wood.png": os.urandom(16384),
+                     "notes.txt": b"Notes\n"}, "Add the scene")
+        self.commit({"scene.blend": os.urandom(32768)}, "Change the scene")
+        git(self.work_dir, "checkout", "-q", "-b", "side")
+        self.commit({"textures/stone.png": os.urandom(16384)},
+                    "Add a texture")
+        git(self.work_dir, "checkout", "-q", "main")
+
+    def commit(self, files, message: str):
+        for path, data in files.items():
+            path = os.path.join(self.work_dir, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        git(self.work_dir, "add", "--all")
+        git(self.work_dir, "commit", "-q", "-m", message)
+
+    def blob(self, rev: str, path: str) -> bytes:
+        return lfs_migrate.git(self.work_dir, "cat-file", "blob",
+                               f"{rev}:{path}")
+
+    def test_analyze_current_branch(self):
+        analysis = lfs_migrate.analyze(self.work_dir)
+
+        self.assertEqual(analysis["refs"], [MAIN])
+        self.assertEqual(analysis["count"], 3)
+        self.assertEqual({pattern: entry["count"] for pattern, entry
+                          in analysis["patterns"].items()},
+                         {"*.blend": 2, "*.png": 1})
+        self.assertEqual(analysis["patterns"]["*.blend"]["size"], 2 * 32768)
+        self.assertGreater(analysis["disk"], 0)
+        self.assertGreater(analysis["history_disk"], analysis["disk"])
+
+    def test_analyze_everything(self):
+        analysis = lfs_migrate.analyze(self.work_dir, everything=True)
+
+        self.assertEqual(sorted(analysis["refs"]), [MAIN, SIDE])
+        self.assertEqual(analysis["patterns"]["*.png"]["count"], 2)
+
+    def test_analyze_leaves_pointers_out(self):
+        pointer = (LFS_POINTER_HEADER + b"oid sha256:" + b"0" * 64
+                   + b"\nsize 12\n")
+        self.commit({"props.blend": pointer}, "Add a pointer")
+
+        analysis = lfs_migrate.analyze(self.work_dir)
+
+        self.assertEqual(analysis["patterns"]["*.blend"]["count"], 2)
+
+    def test_no_report_without_migration(self):
+        self.assertIsNone(lfs_migrate.size_report(self.work_dir,
+                                                  self.common_dir))
+
+    @unittest.skipUnless(has_lfs(), "git lfs is not installed")
+    def test_migrate(self):
+        original = git(self.work_dir, "rev-parse", MAIN).strip()
+        progress = []
+
+        self.assertTrue(lfs_migrate.migrate(
+            self.work_dir, self.common_dir, everything=True,
+            on_progress=lambda ref, done, total, line:
+                progress.append((ref, done, total))))
+
+        self.assertIn((MAIN, 0, 2), progress)
+        self.assertEqual(progress[-1], ("", 2, 2))
+        for ref, path in ((MAIN, "scene.blend"), (SIDE, "textures/stone.png"),
+                          (SIDE, "textures/wood.png")):
+            self.assertTrue(self.blob(ref, path).startswith(
+                LFS_POINTER_HEADER), f"{ref}:{path}")
+        self.assertEqual(self.blob(MAIN, "notes.txt"), b"Notes\n")
+        self.assertEqual(
+            git(self.work_dir, "rev-parse",
+                lfs_migrate.BACKUP_PREFIX + MAIN).strip(), original)
+
+        report = lfs_migrate.size_report(self.work_dir, self.common_dir)
+        self.assertTrue(report["complete"])
+        self.assertLess(report["after"], report["before"])
+        self.assertGreaterEqual(report["lfs"], 2 * 32768 + 2 * 16384)
+
+        lfs_migrate.finish(self.work_dir, self.common_dir)
+        self.assertIsNone(lfs_migrate.read_state(self.common_dir))
+        self.assertEqual(
+            git(self.work_dir, "for-each-ref", lfs_migrate.BACKUP_PREFIX),
+            "")
+
+    @unittest.skipUnless(has_lfs(), "git lfs is not installed")
+    def test_migrate_resumes(self):
+        # Stopped after the first ref, which is left as it is here to
+        # tell whether it is migrated again
+        refs = {ref: git(self.work_dir, "rev-parse", ref).strip()
+                for ref in (MAIN, SIDE)}
+        lfs_migrate.write_state(self.common_dir, {
+            "patterns": list(lfs_migrate.LFS_PATTERNS), "refs": refs,
+            "done": [MAIN]})
+        progress = []
+
+        # Everything is ignored in favour of the refs of the state
+        self.assertTrue(lfs_migrate.migrate(
+            self.work_dir, self.common_dir,
+            on_progress=lambda ref, done, total, line:
+                progress.append((ref, done, total))))
+
+        self.assertEqual(sorted(set(progress)),
+                         [("", 2, 2), (SIDE, 1, 2)])
+        self.assertEqual(git(self.work_dir, "rev-parse", MAIN).strip(),
+                         refs[MAIN])
+        self.assertTrue(self.blob(SIDE, "textures/stone.png").startswith(
+            LFS_POINTER_HEADER))
+        self.assertEqual(lfs_migrate.read_state(self.common_dir)["done"],
+                         [MAIN, SIDE])
+        report = lfs_migrate.size_report(self.work_dir, self.common_dir)
+        self.assertTrue(report["complete"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Filters and sorts list items the way Blender's lists do"""
+import sqlite3
+import unittest
+
+import support  # noqa: F401
+import list_filter
+
+
+class ListFilterTest(unittest.TestCase):
+
+    def test_name_pattern(self):
+        self.assertIsNone(list_filter.name_pattern(""))
+        pattern = list_filter.name_pattern("wood*png")
+        self.assertTrue(pattern.match("textures/Wood_01.PNG"))
+        self.assertFalse(pattern.match("textures/stone.png"))
+        self.assertTrue(list_filter.name_pattern("a?c").match("xabcx"))
+
+    def test_glob_and_grep_patterns(self):
+        names = ["2024-01-02 Fix the Wood [wip] abc123",
+                 "2024-01-03 Add stone.png def456", "2024-02-01 a+b 789"]
+        db = sqlite3.connect(":memory:")
+        for text in ("wood", "WOOD*wip", "2024-01-0?", "[wip]", "[!a]dd",
+                     "a+b", "st[o]ne", "[unclosed", ""):
+            expected = [name for name in names
+                        if list_filter.name_pattern(text) is None
+                        or list_filter.name_pattern(text).match(name)]
+            glob = list_filter.glob_pattern(text)
+            self.assertEqual([name for name in names if glob is None
+                              or db.execute("SELECT lower(?) GLOB ?",
+                                            (name, glob)).fetchone()[0]],
+                             expected, text)
+        self.assertEqual(list_filter.grep_pattern("a.b*c?(d)"),
+                         r"a\.b.*c.\(d\)")
+
+    def test_filter_flags(self):
+        names = ["scene.blend", "wood.png", "props.blend"]
+        self.assertEqual(list_filter.filter_flags(names, "", 1), [])
+        self.assertEqual(list_filter.filter_flags(names, "blend", 4),
+                         [4, 0, 4])
+        self.assertEqual(list_filter.filter_flags(
+            names, "blend", 4, keep=[False, True, True]), [0, 0, 4])
+        self.assertEqual(list_filter.filter_flags(
+            names, "", 4, keep=[False, True, True]), [0, 4, 4])
+
+    def test_invert_only_the_name(self):
+        names = ["scene.blend", "wood.png", "props.blend"]
+        keep = [False, True, True]
+        # Blender inverts the flags, which then show the kept files whose
+        # name does not match
+        flags = list_filter.filter_flags(names, "blend", 4, keep,
+                                         invert=True)
+        self.assertEqual([flag ^ 4 for flag in flags], [0, 4, 0])
+        flags = list_filter.filter_flags(names, "", 4, keep, invert=True)
+        self.assertEqual([flag ^ 4 for flag in flags], [0, 4, 4])
+
+    def test_sort_order(self):
+        self.assertEqual(list_filter.sort_order(None), [])
+        # Each item gets its position, equal keys keep their order
+        self.assertEqual(list_filter.sort_order(["c", "a", "b", "a"]),
+                         [3, 0, 2, 1])
+
+    def test_cached(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return [], []
+
+        list_filter.cached("test", ("a",), compute)
+        list_filter.cached("test", ("a",), compute)
+        self.assertEqual(len(calls), 1)
+        list_filter.cached("test", ("b",), compute)
+        list_filter.changed("test")
+        list_filter.cached("test", ("b",), compute)
+        self.assertEqual(len(calls), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""Brings a collection to a list of rows by writing only differences"""
+import unittest
+
+import support  # noqa: F401
+import list_sync
+
+
+FIELDS = ("name", "status")
+
+
+class Item(dict):
+    """Stands for a PropertyGroup item, with properties as keys"""
+
+    def __getattr__(self, name):
+        return self.get(name, False)
+
+
+class Collection(list):
+    """Stands for a CollectionProperty, counting what is written"""
+
+    def __init__(self):
+        super().__init__()
+        self.operations = 0
+        self.cleared = False
+
+    def add(self) -> Item:
+        self.operations += 1
+        self.append(Item())
+        return self[-1]
+
+    def remove(self, index: int):
+        self.operations += 1
+        del self[index]
+
+    def move(self, source: int, target: int):
+        self.operations += 1
+        self.insert(target, self.pop(source))
+
+    def clear(self):
+        self.operations += 1
+        self.cleared = True
+        super().clear()
+
+
+class Owner:
+    def __init__(self):
+        self.items = Collection()
+        self.index = 0
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+
+def rows(*names: str, status: str = "M"):
+    return [(name, status) for name in names]
+
+
+class ListSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.name = self.id()
+        self.owner = Owner()
+        self.addCleanup(list_sync._synced.pop, self.name, None)
+
+    def sync(self, new_rows):
+        return list_sync.sync(self.name, self.owner.items, FIELDS, new_rows,
+                              keep=("selected",), owner=self.owner,
+                              index_prop="index")
+
+    def check(self, new_rows):
+        self.assertEqual([tuple(item[field] for field in FIELDS)
+                          for item in self.owner.items], new_rows)
+
+    def active(self) -> str:
+        return self.owner.items[self.owner.index]["name"]
+
+    def test_fill_and_unchanged(self):
+        self.assertTrue(self.sync(rows("a", "b", "c")))
+        self.check(rows("a", "b", "c"))
+        self.owner.items.operations = 0
+        self.assertFalse(self.sync(rows("a", "b", "c")))
+        self.assertEqual(self.owner.items.operations, 0)
+
+    def test_changed_field(self):
+        self.sync(rows("a", "b", "c"))
+        self.owner.items.operations = 0
+        new_rows = rows("a", "b", "c")
+        new_rows[1] = ("b", "D")
+        self.assertTrue(self.sync(new_rows))
+        self.check(new_rows)
+        self.assertEqual(self.owner.items.operations, 0)
+
+    def test_selection_follows_items(self):
+        self.sync(rows("a", "b", "c", "d"))
+        self.owner.items[2]["selected"] = True
+        self.owner.index = 2
+
+        self.sync(rows("new", "a", "c", "d"))
+
+        self.check(rows("new", "a", "c", "d"))
+        self.assertEqual(self.active(), "c")
+        self.assertEqual([item.name for item in self.owner.items
+                          if item.selected], ["c"])
+
+    def test_active_item_removed(self):
+        self.sync(rows("a", "b", "c"))
+        self.owner.index = 2
+        self.sync(rows("a", "b"))
+        self.assertEqual(self.owner.index, 1)
+
+    def test_removed_added_and_moved(self):
+        self.sync(rows(*"abcdefgh"))
+        self.owner.items[4]["selected"] = True
+        self.owner.index = 2
+        self.owner.items.operations = 0
+
+        # b removed, x added, d and f swapped
+        new_rows = rows(*"axcfedgh")
+        self.assertTrue(self.sync(new_rows))
+
+        self.check(new_rows)
+        self.assertFalse(self.owner.items.cleared)
+        self.assertLess(self.owner.items.operations, 8)
+        self.assertEqual(self.active(), "c")
+        self.assertEqual([item.name for item in self.owner.items
+                          if item.selected], ["e"])
+
+    def test_mostly_moved_is_rebuilt(self):
+        self.sync(rows(*"abcdefgh"))
+        self.owner.items[1]["selected"] = True
+        self.owner.index = 6
+
+        new_rows = rows(*"hgfxedba", status="D")
+        self.assertTrue(self.sync(new_rows))
+
+        self.check(new_rows)
+        self.assertTrue(self.owner.items.cleared)
+        self.assertEqual(self.active(), "g")
+        self.assertEqual([item.name for item in self.owner.items
+                          if item.selected], ["b"])
+        # Synced with what was rebuilt
+        self.owner.items.operations = 0
+        self.assertFalse(self.sync(new_rows))
+        self.assertEqual(self.owner.items.operations, 0)
+
+    def test_duplicate_keys_are_dropped(self):
+        self.sync(rows("a", "b"))
+        self.owner.items.append(Item(name="a", status="M"))
+        self.sync(rows("a", "b", "c"))
+        self.check(rows("a", "b", "c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""Prefetches LFS objects from a bare repository acting as the remote
+
+The .blend file is committed through blend_filter.py, the way the
+"Store .blend Decompressed" operator sets it up, so what prefetch() finds
+in the history are the LFS pointers the filter hands on to git lfs.
+
+Skipped without git lfs.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ADDON_DIR)
+import core  # noqa: E402
+import process  # noqa: E402
+
+
+FILTER_SCRIPT = os.path.join(ADDON_DIR, "blend_filter.py")
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "Blendgit", "GIT_AUTHOR_EMAIL": "blendgit@example.com",
+    "GIT_COMMITTER_NAME": "Blendgit",
+    "GIT_COMMITTER_EMAIL": "blendgit@example.com",
+}
+
+
+def has_lfs() -> bool:
+    try:
+        return subprocess.run(["git", "lfs", "version"],
+                              capture_output=True).returncode == 0
+    except OSError:
+        return False
+
+
+def git(cwd: str, *args: str, env=None) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True,
+                          capture_output=True, env=env).stdout.decode()
+
+
+def blend_data(revision: int) -> bytes:
+    """Uncompressed .blend header followed by content unique to the
+    revision"""
+    return b"BLENDER-v300" + os.urandom(4096) + bytes([revision]) * 4096
+
+
+@unittest.skipUnless(has_lfs(), "git lfs is not installed")
+class PrefetchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="blendgit-prefetch-")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        patcher = mock.patch.dict(os.environ, IDENTITY)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(process.forget_environments)
+        process.forget_environments()
+        # The delay only leaves bandwidth to the user
+        patcher = mock.patch.object(core, "PREFETCH_DELAY", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        remote = os.path.join(self.directory, "remote.git")
+        git(self.directory, "init", "--bare", remote)
+        self.remote_url = "file://" + remote.replace(os.sep, "/")
+
+        source = os.path.join(self.directory, "source")
+        git(self.directory, "init", source)
+        git(source, "lfs", "install", "--local")
+        python = sys.executable.replace("\\", "/")
+        script = FILTER_SCRIPT.replace("\\", "/")
+        git(source, "config", "filter.blendgit.clean",
+            f'"{python}" "{script}" clean --lfs -- %f')
+        git(source, "config", "filter.blendgit.smudge",
+            f'"{python}" "{script}" smudge -- %f')
+        git(source, "config", "filter.blendgit.required", "true")
+        for revision in range(4):
+            # The first revision is from before the file was in LFS
+            if revision == 1:
+                with open(os.path.join(source, ".gitattributes"), "w") as f:
+                    f.write("*.blend filter=blendgit -diff -merge -text\n")
+                git(source, "add", ".gitattributes")
+            with open(os.path.join(source, "scene.blend"), "wb") as f:
+                f.write(blend_data(revision))
+            git(source, "add", "scene.blend")
+            git(source, "commit", "-m", f"Revision {revision}")
+        git(source, "remote", "add", "origin", self.remote_url)
+        git(source, "push", "origin", "HEAD:refs/heads/main")
+
+        self.work_dir = os.path.join(self.directory, "clone")
+        env = dict(os.environ, GIT_LFS_SKIP_SMUDGE="1")
+        git(self.directory, "clone", "-q", "-b", "main", self.remote_url,
+            self.work_dir, env=env)
+        self.common_dir = os.path.join(self.work_dir, ".git")
+
+    def revisions(self):
+        return git(self.work_dir, "rev-list", "HEAD").split()
+
+    def pointers(self):
+        """The LFS object id of scene.blend in each filtered revision"""
+        oids = {}
+        for rev in self.revisions():
+            data = subprocess.run(
+                ["git", "cat-file", "blob", f"{rev}:scene.blend"],
+                cwd=self.work_dir, capture_output=True, check=True).stdout
+            oid = core.pointer_oid(data)
+            if oid is not None:
+                oids[rev] = oid
+        return oids
+
+    def test_filter_stores_pointers(self):
+        self.assertEqual(len(self.pointers()), 3)
+
+    def test_prefetch_fetches_from_remote(self):
+        oids = self.pointers()
+        for oid in oids.values():
+            self.assertFalse(os.path.exists(
+                core.lfs_object_path(self.common_dir, oid)))
+
+        status = {}
+        core.prefetch(self.work_dir, self.common_dir, "scene.blend",
+                      self.revisions(), status, threading.Event())
+
+        self.assertEqual(status, {rev: "ready" for rev in self.revisions()})
+        for oid in oids.values():
+            self.assertTrue(os.path.exists(
+                core.lfs_object_path(self.common_dir, oid)))
+
+    def test_prefetch_without_remote_fails(self):
+        git(self.work_dir, "remote", "remove", "origin")
+        oids = self.pointers()
+
+        status = {}
+        core.prefetch(self.work_dir, self.common_dir, "scene.blend",
+                      self.revisions(), status, threading.Event())
+
+        for rev in self.revisions():
+            self.assertEqual(status[rev],
+                             "failed" if rev in oids else "ready")
+
+    def test_cancelled_prefetch_fetches_nothing(self):
+        cancel = threading.Event()
+        cancel.set()
+        oids = self.pointers()
+
+        status = {}
+        core.prefetch(self.work_dir, self.common_dir, "scene.blend",
+                      self.revisions(), status, cancel)
+
+        # Left out, to be looked at again on the next request
+        self.assertEqual(set(status), set(self.revisions()) - set(oids))
+        for oid in oids.values():
+            self.assertFalse(os.path.exists(
+                core.lfs_object_path(self.common_dir, oid)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Runs git with the environment of a work dir"""
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+import support
+import process
+
+
+class EnvironmentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = os.path.realpath(
+            tempfile.mkdtemp(prefix="blendgit-process-"))
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        self.addCleanup(process.forget_environments)
+        process.forget_environments()
+
+    def test_outside_of_a_repository(self):
+        self.assertNotIn("GIT_DIR", process.environment(self.work_dir))
+
+        # Not remembered, so the repository git init creates is found
+        process.run(["git", "init", "-q"], self.work_dir)
+
+        self.assertEqual(process.environment(self.work_dir)["GIT_DIR"],
+                         os.path.join(self.work_dir, ".git"))
+
+    def test_below_the_top_level(self):
+        support.git(self.work_dir, "init", "-q")
+        sub_dir = os.path.join(self.work_dir, "sub")
+        os.mkdir(sub_dir)
+
+        self.assertNotIn("GIT_DIR", process.environment(sub_dir))
+        self.assertEqual(process.run(["git", "rev-parse", "--show-prefix"],
+                                     sub_dir).stdout, b"sub/\n")
+
+    def test_input(self):
+        data = b"x" * (1 << 20)
+        oid = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+        self.assertEqual(process.run(["git", "hash-object", "--stdin"],
+                                     self.work_dir, input=data).stdout,
+                         oid.encode() + b"\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
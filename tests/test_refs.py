@@ -0,0 +1,71 @@
+"""Finds repositories and reads refs without running git"""
+import os
+import unittest
+
+import support
+import refs
+
+
+class RefsTest(support.RepositoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.first = self.commit({"scene.blend": b"1"}, "First")
+        self.git("branch", "feature/lighting")
+        self.second = self.commit({"scene.blend": b"2"}, "Second")
+        self.repository = refs.find_repository(self.work_dir)
+
+    def test_find_repository(self):
+        self.write({"assets/textures/wood.png": b""})
+        repository = refs.find_repository(
+            os.path.join(self.work_dir, "assets", "textures"))
+        self.assertEqual(repository.work_dir, self.work_dir)
+        self.assertEqual(repository.git_dir, self.git_dir)
+        self.assertEqual(repository.common_dir, self.git_dir)
+        self.assertIsNone(refs.find_repository(os.path.dirname(
+            self.work_dir) + os.sep + "missing-" + os.urandom(4).hex()))
+
+    def test_loose_refs(self):
+        self.assertEqual(refs.read_head(self.repository),
+                         ("main", self.second))
+        self.assertEqual(refs.resolve_ref(self.repository,
+                                          "refs/heads/feature/lighting"),
+                         self.first)
+        self.assertEqual(refs.list_local_branches(self.repository),
+                         ["feature/lighting", "main"])
+
+    def test_packed_refs(self):
+        self.git("tag", "-a", "-m", "Release", "v1", self.first)
+        self.git("pack-refs", "--all")
+
+        packed = refs.read_packed_refs(self.repository)
+        self.assertEqual(packed["refs/heads/main"], self.second)
+        self.assertIn("refs/tags/v1", packed)
+        self.assertEqual(refs.read_head(self.repository),
+                         ("main", self.second))
+        self.assertEqual(refs.list_local_branches(self.repository),
+                         ["feature/lighting", "main"])
+        self.assertTrue(refs.branch_exists(self.repository,
+                                           "feature/lighting"))
+        self.assertFalse(refs.branch_exists(self.repository, "missing"))
+
+    def test_detached_head(self):
+        self.git("checkout", "-q", "--detach", self.first)
+        self.assertEqual(refs.read_head(self.repository), (None, self.first))
+
+    def test_linked_worktree(self):
+        path = os.path.join(self.work_dir, "linked")
+        self.git("worktree", "add", "-q", "--detach", path, self.first)
+
+        repository = refs.find_repository(path)
+
+        self.assertEqual(repository.work_dir, path)
+        self.assertEqual(repository.common_dir, self.git_dir)
+        self.assertNotEqual(repository.git_dir, self.git_dir)
+        self.assertEqual(refs.read_head(repository), (None, self.first))
+        self.assertEqual(refs.resolve_ref(repository, "refs/heads/main"),
+                         self.second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Parses `git status --porcelain=v2 --branch -z` output"""
+import unittest
+
+import support  # noqa: F401
+from snapshot import parse_status
+
+
+OID = "1" * 40
+
+
+def status(*records: str) -> str:
+    return "".join(record + "\0" for record in records)
+
+
+class ParseStatusTest(unittest.TestCase):
+
+    def test_branch_headers(self):
+        snapshot = parse_status(status(
+            f"# branch.oid {OID}", "# branch.head main",
+            "# branch.upstream origin/main", "# branch.ab +2 -3"))
+
+        self.assertEqual(snapshot.oid, OID)
+        self.assertEqual(snapshot.branch, "main")
+        self.assertEqual(snapshot.upstream, "origin/main")
+        self.assertEqual((snapshot.ahead, snapshot.behind), (2, 3))
+        self.assertTrue(snapshot.clean)
+
+    def test_detached_and_initial(self):
+        snapshot = parse_status(status(f"# branch.oid {OID}",
+                                       "# branch.head (detached)"))
+        self.assertTrue(snapshot.detached)
+        self.assertEqual(snapshot.branch, OID[:7])
+
+        snapshot = parse_status(status("# branch.oid (initial)",
+                                       "# branch.head main"))
+        self.assertEqual(snapshot.oid, "")
+
+    def test_entries(self):
+        snapshot = parse_status(status(
+            f"1 .M N... 100644 100644 100644 {OID} {OID} scene.blend",
+            f"1 A. N... 000000 100644 100644 {OID} {OID} my textures/a b.png",
+            f"2 R. N... 100644 100644 100644 {OID} {OID} R100 new.blend",
+            "old.blend",
+            f"u UU N... 100644 100644 100644 100644 {OID} {OID} {OID} "
+            "conflict.txt",
+            "? untracked dir/file.txt"))
+
+        self.assertEqual(snapshot.entries, [
+            {"status": "modified", "file_path": "scene.blend",
+             "orig_path": None, "staged": False},
+            {"status": "added", "file_path": "my textures/a b.png",
+             "orig_path": None, "staged": True},
+            {"status": "renamed", "file_path": "new.blend",
+             "orig_path": "old.blend", "staged": True},
+            {"status": "unmerged", "file_path": "conflict.txt",
+             "orig_path": None, "staged": True},
+            {"status": "new", "file_path": "untracked dir/file.txt",
+             "orig_path": None, "staged": False},
+        ])
+        self.assertFalse(snapshot.clean)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Reads the preview thumbnails embedded in historic .blend files
+
+Thumbnails are taken from the TEST block near the start of the file as
+git stores it, so only the first blocks of each revision are read and
+nothing is opened in Blender. They are cached as PNG files named after
+the blob they came from, and the least recently used are evicted.
+
+tools/previews.py runs this in a separate process, so reading a page of
+revisions never holds up Blender's UI. Blobs not cached yet are read by
+a pool of worker processes, as decompressing and encoding each is CPU
+bound.
+
+Usage: thumbnails.py <cache dir> <path> <rev>...
+"""
+import json
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+try:
+    from .blend_filter import blob_ids, open_blob, read_exact
+    from .blendfile import MAX_HEADER_SIZE, FileHeader
+    from .refs import find_repository
+except ImportError:
+    # Run as a script
+    from blend_filter import blob_ids, open_blob, read_exact
+    from blendfile import MAX_HEADER_SIZE, FileHeader
+    from refs import find_repository
+
+
+# Thumbnails kept on disk, including markers for files without one
+MAX_CACHED = 1000
+# Processes reading blobs at once
+MAX_WORKERS = 4
+# Blender writes the thumbnail right after the render info, so there is
+# no point reading further than this
+MAX_SCAN = 4 * 1024 * 1024
+THUMBNAIL_CODE = b"TEST"
+END_CODE = b"ENDB"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def read_thumbnail(stream: BinaryIO) -> Optional[Tuple[int, int, bytes]]:
+    """Finds the thumbnail of a .blend file by walking its block headers
+
+    Returns:
+        tuple: Width, height and RGBA pixels (bottom row first), or None
+            if the file has no thumbnail
+    """
+    data = read_exact(stream, MAX_HEADER_SIZE)
+    try:
+        header = FileHeader(data)
+    except ValueError:
+        return None
+    data = data[header.size:]
+    scanned = header.size
+    while scanned < MAX_SCAN:
+        data += read_exact(stream, header.bhead.size - len(data))
+        if len(data) < header.bhead.size:
+            return None
+        block = header.block_header(data)
+        data = b""
+        scanned += header.bhead.size
+        if block.code == END_CODE:
+            return None
+        body = read_exact(stream, block.length) \
+            if block.code == THUMBNAIL_CODE \
+            else read_exact(stream, min(block.length, MAX_SCAN))
+        scanned += block.length
+        if block.code != THUMBNAIL_CODE:
+            continue
+        width, height = header.ints(body, 0, 2)
+        pixels = body[8:8 + width * height * 4]
+        if width <= 0 or height <= 0 or len(pixels) < width * height * 4:
+            return None
+        return width, height, pixels
+    return None
+
+
+def write_png(path: str, width: int, height: int, pixels: bytes):
+    """Writes RGBA pixels, stored bottom row first, as a PNG"""
+    stride = width * 4
+    rows = b"".join(b"\0" + pixels[y * stride:(y + 1) * stride]
+                    for y in reversed(range(height)))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data)))
+
+    png = (PNG_SIGNATURE
+           + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height,
+                                        8, 6, 0, 0, 0))
+           + chunk(b"IDAT", zlib.compress(rows))
+           + chunk(b"IEND", b""))
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                     suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(png)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def cache_paths(cache_dir: str, blob: str) -> Tuple[str, str]:
+    """Returns the thumbnail path of a blob and its "no thumbnail" marker"""
+    return (os.path.join(cache_dir, blob + ".png"),
+            os.path.join(cache_dir, blob + ".none"))
+
+
+def evict(cache_dir: str):
+    """Removes the least recently used thumbnails beyond MAX_CACHED"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith((".png", ".none")):
+            path = os.path.join(cache_dir, name)
+            entries.append((os.path.getmtime(path), path))
+    entries.sort(reverse=True)
+    for _, path in entries[MAX_CACHED:]:
+        os.unlink(path)
+
+
+def cache_thumbnail(work_dir: str, common_dir: str, cache_dir: str,
+                    blob: str) -> Optional[str]:
+    """Reads the thumbnail of a blob into the cache
+
+    Returns:
+        str: The thumbnail path, "" if the file has none, or None if the
+            blob is not available yet, like an LFS object not fetched
+    """
+    png_path, none_path = cache_paths(cache_dir, blob)
+    with open_blob(work_dir, common_dir, blob) as stream:
+        if stream is None:
+            return None
+        thumbnail = read_thumbnail(stream)
+    if thumbnail is None:
+        open(none_path, "wb").close()
+        return ""
+    write_png(png_path, *thumbnail)
+    return png_path
+
+
+def extract_thumbnails(work_dir: str, common_dir: str, cache_dir: str,
+                       path: str,
+                       revs: List[str]) -> Dict[str, Optional[str]]:
+    """Makes sure the thumbnails of path in revs are cached
+
+    Returns:
+        dict: The thumbnail path by revision, "" where there is none and
+            None where the file is not available yet, to try again later
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    thumbnails: Dict[str, Optional[str]] = {}
+    pending: Dict[str, List[str]] = {}
+    for rev, blob in blob_ids(work_dir, path, revs).items():
+        if blob is None:
+            thumbnails[rev] = ""
+            continue
+        png_path, none_path = cache_paths(cache_dir, blob)
+        if os.path.exists(png_path):
+            os.utime(png_path)
+            thumbnails[rev] = png_path
+        elif os.path.exists(none_path):
+            os.utime(none_path)
+            thumbnails[rev] = ""
+        else:
+            pending.setdefault(blob, []).append(rev)
+
+    blobs = list(pending)
+    args = ([work_dir] * len(blobs), [common_dir] * len(blobs),
+            [cache_dir] * len(blobs), blobs)
+    if len(blobs) > 1:
+        with ProcessPoolExecutor(
+                max_workers=min(len(blobs), MAX_WORKERS,
+                                os.cpu_count() or 1)) as pool:
+            results = list(pool.map(cache_thumbnail, *args))
+    else:
+        results = list(map(cache_thumbnail, *args))
+    for blob, thumbnail in zip(blobs, results):
+        for rev in pending[blob]:
+            thumbnails[rev] = thumbnail
+    evict(cache_dir)
+    return thumbnails
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 4:
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        return 2
+    repository = find_repository(os.getcwd())
+    if repository is None:
+        print("Not in a repository", file=sys.stderr)
+        return 1
+    thumbnails = extract_thumbnails(repository.work_dir,
+                                    repository.common_dir, argv[1],
+                                    argv[2], argv[3:])
+    json.dump(thumbnails, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
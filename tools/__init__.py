@@ -1,13 +1,25 @@
 from bpy.utils import register_class, unregister_class
 
-from . import lfs, branches, props, revisions, stash
+from . import (lfs, autosave, branches, commit, datablocks, diagnostics,
+               diff, migrate, prefetch, previews, props, revisions, stash,
+               storage, worktrees)
 
 modules = [
     lfs,
+    autosave,
     branches,
+    commit,
+    datablocks,
+    diagnostics,
+    diff,
+    migrate,
+    prefetch,
+    previews,
     props,
     revisions,
     stash,
+    storage,
+    worktrees,
 ]
 
 
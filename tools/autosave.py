@@ -0,0 +1,190 @@
+import logging
+import os
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import bpy
+from bpy import ops
+from bpy.props import StringProperty
+from bpy.types import Context, Operator
+
+from .. import executor
+from ..common import get_blendgit, get_repository, redraw_ui
+from ..core import autosave_dir, autosave_ref, list_snapshots, snapshot
+from ..refs import read_head
+from .datablocks import extract_revision, linked_libraries
+
+
+# How often the timer looks again while autosave is off
+IDLE_INTERVAL = 60.0
+
+# Snapshots of the open file's branch, newest first, and the ref they
+# were read from
+snapshots: List[Dict[str, str]] = []
+_snapshots_ref = ""
+
+
+def _file_info() -> Optional[Tuple]:
+    """Returns the repository, the open file's path in it and its branch"""
+    repository = get_repository()
+    if repository is None:
+        return None
+    path = os.path.relpath(bpy.data.filepath, repository.work_dir) \
+        .replace(os.sep, "/")
+    branch = read_head(repository)[0] or "detached"
+    return repository, path, branch
+
+
+def request_autosave() -> Optional[Future]:
+    """Snapshots the open file on the background executor
+
+    Unsaved changes are first written to a copy on the main thread, as
+    only Blender can write them; the open file keeps its path.
+    """
+    info = _file_info()
+    if info is None or executor.is_pending("autosave"):
+        return None
+    repository, path, branch = info
+    source = bpy.data.filepath
+    if bpy.data.is_dirty:
+        directory = autosave_dir(repository.common_dir)
+        os.makedirs(directory, exist_ok=True)
+        source = os.path.join(directory, os.path.basename(path))
+        try:
+            # Relative paths stay relative to the file, which the copy
+            # replaces when it is restored
+            ops.wm.save_as_mainfile(  # type: ignore
+                filepath=source, copy=True, check_existing=False,
+                relative_remap=False)
+        except RuntimeError as e:
+            logging.warning(f"Autosave could not write a copy: {e}")
+            return None
+    keep = get_blendgit().autosave_keep
+
+    def on_done(_commit: Optional[str]):
+        request_snapshot_list(force=True)
+
+    return executor.submit("autosave", snapshot, repository.work_dir,
+                           repository.common_dir, source, path, branch,
+                           keep, callback=on_done)
+
+
+def request_snapshot_list(force: bool = False) -> Optional[Future]:
+    """Reads the snapshots of the open file's branch, unless known"""
+    global _snapshots_ref
+    info = _file_info()
+    if info is None:
+        return None
+    repository, _, branch = info
+    ref = autosave_ref(branch)
+    if (ref == _snapshots_ref and not force) \
+            or executor.is_pending("autosave-list"):
+        return None
+    _snapshots_ref = ref
+
+    def on_done(result: List[Dict[str, str]]):
+        global snapshots
+        snapshots = result
+        redraw_ui()
+
+    return executor.submit("autosave-list", list_snapshots,
+                           repository.work_dir, ref, callback=on_done)
+
+
+def autosave_pending() -> bool:
+    return executor.is_pending("autosave")
+
+
+def _autosave_timer() -> float:
+    blendgit = get_blendgit()
+    interval = blendgit.autosave_interval * 60
+    if not blendgit.autosave or interval <= 0:
+        return IDLE_INTERVAL
+    request_autosave()
+    return interval
+
+
+def update_autosave(self, _context):
+    """Restarts the timer, so a new interval applies right away"""
+    if bpy.app.timers.is_registered(_autosave_timer):
+        bpy.app.timers.unregister(_autosave_timer)
+    bpy.app.timers.register(_autosave_timer,
+                            first_interval=max(self.autosave_interval * 60,
+                                               1),
+                            persistent=True)
+
+
+class AutosaveNow(Operator):
+    bl_idname = "blendgit.autosave_now"
+    bl_label = "Snapshot Now"
+    bl_description = ("Keep the current state of the file as an autosave "
+                      "snapshot, without committing")
+
+    def execute(self, context: Context):
+        if request_autosave() is None and not autosave_pending():
+            self.report({"ERROR"}, "The file is not in a repository")
+            return {"CANCELLED"}
+
+        return {"FINISHED"}
+
+
+class RestoreAutosave(Operator):
+    bl_idname = "blendgit.restore_autosave"
+    bl_label = "Restore Snapshot"
+    bl_description = ("Replace the file with this snapshot. The file as "
+                      "saved now is kept as a snapshot first")
+
+    commit: StringProperty()
+
+    def invoke(self, context: Context, event):
+        return context.window_manager.invoke_confirm(self, event)
+
+    def execute(self, context: Context):
+        if bpy.data.is_dirty:
+            self.report({"ERROR"}, "Need to save first")
+            return {"CANCELLED"}
+        info = _file_info()
+        if info is None:
+            self.report({"ERROR"}, "The file is not in a repository")
+            return {"CANCELLED"}
+        repository, path, branch = info
+        filepath = bpy.data.filepath
+        commit = self.commit
+        keep = get_blendgit().autosave_keep
+        libraries = linked_libraries()
+
+        def restore() -> str:
+            snapshot(repository.work_dir, repository.common_dir, filepath,
+                     path, branch, keep)
+            return extract_revision(repository.work_dir,
+                                    repository.common_dir, commit, path,
+                                    libraries)
+
+        def on_done(extracted: str):
+            ops.wm.open_mainfile(  # type: ignore
+                "EXEC_DEFAULT", filepath=extracted)
+            # The relative paths of the snapshot are relative to filepath
+            ops.wm.save_as_mainfile(  # type: ignore
+                "EXEC_DEFAULT", filepath=filepath, relative_remap=False)
+            request_snapshot_list(force=True)
+
+        executor.submit(f"autosave-restore-{commit}", restore,
+                        callback=on_done)
+
+        return {"FINISHED"}
+
+
+def register():
+    bpy.app.timers.register(_autosave_timer, first_interval=IDLE_INTERVAL,
+                            persistent=True)
+
+
+def unregister():
+    if bpy.app.timers.is_registered(_autosave_timer):
+        bpy.app.timers.unregister(_autosave_timer)
+
+
+registry = [
+    AutosaveNow,
+    RestoreAutosave,
+]
@@ -4,13 +4,16 @@ from bpy.types import Context, Operator
 import bpy
 
 from ..common import (do_git,
+                      current_branch,
+                      local_branches,
                       doc_saved, ui_refresh,
                       working_dir_clean,
-                      check_repo_exists)
+                      check_repo_exists,
+                      get_state_cache,
+                      query_state)
 from .revisions import get_main_branch
 
 branches_list = []
-force_refresh = False
 
 
 def list_branches(_self=None,
@@ -20,25 +23,26 @@ def list_branches(_self=None,
     Returns:
         list: List of branches in the repository
     """
-    global branches_list, force_refresh
-    if branches_list and not force_refresh:
+    global branches_list
+    if not check_repo_exists():
+        branches_list = [("", "No repo found", ""), ]
+        return branches_list
+    cache = get_state_cache()
+    if cache.is_fresh("branches"):
+        # Keep returning the same list, Blender needs the strings alive
+        branches_list = cache.get("branches")
         return branches_list
-    branches_list = []
-    if check_repo_exists():
-        current_branch = do_git(
-            'rev-parse',
-            '--abbrev-ref',
-            'HEAD').rstrip()
-        branches_list.append((current_branch, current_branch, ""))
-        for branch in do_git("branch", "'--format=%(refname:short)'") \
-                .splitlines():
-            if not branch:
-                break
-            elif branch == current_branch:
+
+    def query(_work_dir: str) -> List[Tuple[str, str, str]]:
+        current = current_branch()
+        branches = [(current, current, "")]
+        for branch in local_branches():
+            if branch == current:
                 continue
-            branches_list.append((branch, branch, ""))
-    else:
-        branches_list = [("", "No repo found", ""), ]
+            branches.append((branch, branch, ""))
+        return branches
+
+    branches_list = query_state("branches", query)
 
     return branches_list
 
@@ -55,7 +59,7 @@ class SwitchBranch(Operator):
         if not doc_saved():
             self.report({"ERROR"}, "Need to save first")
             return {"CANCELLED"}
-        elif not working_dir_clean():
+        elif not working_dir_clean(force_check=True):
             self.report(
                 {"ERROR"},
                 "Working directory must be clean (try saving or stashing)")
@@ -0,0 +1,118 @@
+import subprocess
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import bpy
+from bpy.types import Context, Operator
+
+from .. import executor, process
+from ..common import get_work_dir, redraw_ui, ui_refresh
+from ..core import CommitCancelled, commit_files
+
+
+REDRAW_INTERVAL = 0.25
+
+# What the running commit is doing ("Staging" or "Committing"), how far
+# along it is from 0 to 1, and why the last one failed. Written by the
+# worker thread.
+commit_progress: Dict = {"stage": "", "done": 0.0, "error": ""}
+_cancel = threading.Event()
+_process: Optional[subprocess.Popen] = None
+_process_lock = threading.Lock()
+
+
+def run_git(work_dir: str, args: List[str],
+            on_line: Optional[Callable[[str], None]] = None):
+    """Runs git like core.run_git(), in a way cancel_commit() can stop
+
+    Raises:
+        CommitCancelled: cancel_commit() stopped git
+        subprocess.CalledProcessError: git failed
+    """
+    def on_start(started: subprocess.Popen):
+        global _process
+        with _process_lock:
+            _process = started
+            if _cancel.is_set():
+                process.stop(started)
+
+    if _cancel.is_set():
+        raise CommitCancelled()
+    try:
+        process.stream(["git", "--literal-pathspecs", *args], work_dir,
+                       on_line, on_start)
+    except subprocess.CalledProcessError:
+        if _cancel.is_set():
+            raise CommitCancelled()
+        raise
+    finally:
+        with _process_lock:
+            _process = None
+
+
+def request_commit(paths: List[str], message: str,
+                   callback: Optional[Callable[[str], None]] = None
+                   ) -> Future:
+    """Commits on the background executor, after the file was saved
+
+    Args:
+        paths: Staged files, relative to the work dir. They are staged
+            again, so they are committed as they are now
+        callback: Called with the error message, empty on success
+    """
+    def on_done(error: str):
+        commit_progress["error"] = error
+        commit_progress["stage"] = ""
+        ui_refresh()
+        if callback is not None:
+            callback(error)
+
+    _cancel.clear()
+    commit_progress.update(stage="Saved", done=0.0, error="")
+    if not bpy.app.timers.is_registered(_redraw_progress):
+        bpy.app.timers.register(_redraw_progress,
+                                first_interval=REDRAW_INTERVAL)
+    return executor.submit("commit", commit_files, get_work_dir(), paths,
+                           message, commit_progress, run_git,
+                           callback=on_done)
+
+
+def commit_pending() -> bool:
+    return executor.is_pending("commit")
+
+
+def cancel_commit():
+    """Stops the running commit; the index and HEAD are left as they were
+    before the step that was running"""
+    _cancel.set()
+    with _process_lock:
+        if _process is not None:
+            process.stop(_process)
+
+
+def _redraw_progress() -> Optional[float]:
+    redraw_ui()
+    return REDRAW_INTERVAL if commit_pending() else None
+
+
+class CancelCommit(Operator):
+    bl_idname = "blendgit.cancel_commit"
+    bl_label = "Cancel Commit"
+    bl_description = "Stop committing; the file stays saved"
+
+    def execute(self, context: Context):
+        cancel_commit()
+
+        return {"FINISHED"}
+
+
+def unregister():
+    cancel_commit()
+    if bpy.app.timers.is_registered(_redraw_progress):
+        bpy.app.timers.unregister(_redraw_progress)
+
+
+registry = [
+    CancelCommit,
+]
@@ -0,0 +1,267 @@
+import os
+import subprocess
+import tempfile
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import bpy
+from bpy.props import BoolProperty
+from bpy.types import Context, Operator
+
+from .. import executor, process
+from ..common import get_blendgit, get_repository, redraw_ui
+
+
+# Historic files kept extracted, not counting ones linked as libraries
+MAX_EXTRACTED = 4
+# Names of extracted files start with this, and git is told to ignore
+# them
+EXTRACTED_PREFIX = ".blendgit-"
+# bpy.data collections offered for pulling, with their icons
+DATABLOCK_TYPES = [
+    ("objects", "OBJECT_DATA"),
+    ("collections", "OUTLINER_COLLECTION"),
+    ("meshes", "MESH_DATA"),
+    ("materials", "MATERIAL"),
+    ("node_groups", "NODETREE"),
+    ("images", "IMAGE_DATA"),
+    ("textures", "TEXTURE"),
+    ("actions", "ACTION"),
+    ("armatures", "ARMATURE_DATA"),
+    ("curves", "CURVE_DATA"),
+    ("cameras", "CAMERA_DATA"),
+    ("lights", "LIGHT"),
+    ("worlds", "WORLD"),
+    ("brushes", "BRUSH_DATA"),
+    ("scenes", "SCENE_DATA"),
+]
+DATABLOCK_ICONS = dict(DATABLOCK_TYPES)
+
+
+def extracted_dir(work_dir: str, path: str) -> str:
+    """Returns the directory revisions of a file are extracted to
+
+    That is the directory of the file itself, so relative paths to
+    images and libraries in a revision resolve as they do in the file.
+    """
+    return os.path.join(work_dir, os.path.dirname(path))
+
+
+def exclude_extracted(common_dir: str):
+    """Keeps extracted files out of git status"""
+    pattern = f"{EXTRACTED_PREFIX}*"
+    exclude_path = os.path.join(common_dir, "info", "exclude")
+    try:
+        with open(exclude_path, encoding="utf-8") as f:
+            if pattern in f.read().splitlines():
+                return
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(exclude_path), exist_ok=True)
+    with open(exclude_path, "a", encoding="utf-8") as f:
+        f.write(f"\n# Revisions extracted by Blendgit\n{pattern}\n")
+
+
+def extract_revision(work_dir: str, common_dir: str, rev: str, path: str,
+                     keep: Set[str]) -> str:
+    """Writes a file as it was in a revision, without changing the file
+
+    The revision is written next to the file, hidden and ignored by git.
+    Extracted files are reused, and only the MAX_EXTRACTED most recently
+    used are kept besides those in keep.
+
+    Args:
+        path: Path of the file relative to work_dir, with forward slashes
+        keep: Extracted files that must not be removed
+
+    Returns:
+        str: Path of the extracted file
+    """
+    directory = extracted_dir(work_dir, path)
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(
+        directory, f"{EXTRACTED_PREFIX}{rev}-{os.path.basename(path)}")
+    if os.path.exists(target):
+        os.utime(target)
+        return target
+
+    exclude_extracted(common_dir)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=EXTRACTED_PREFIX,
+                                     suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # --filters runs the smudge filters, so LFS objects and files
+            # stored by blend_filter.py come out as the real .blend
+            process.run(["git", "cat-file", "--filters", f"{rev}:{path}"],
+                        work_dir, stdout=f)
+        os.replace(temp_path, target)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    evict_extracted(directory, keep | {target})
+    return target
+
+
+def evict_extracted(directory: str, keep: Set[str]):
+    paths = [os.path.join(directory, name) for name in os.listdir(directory)
+             if name.startswith(EXTRACTED_PREFIX)
+             and name.endswith(".blend")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[MAX_EXTRACTED:]:
+        if path not in keep:
+            os.unlink(path)
+
+
+def linked_libraries() -> Set[str]:
+    """Returns the absolute paths of the libraries the open file links"""
+    return {os.path.normpath(bpy.path.abspath(library.filepath))
+            for library in bpy.data.libraries}
+
+
+def list_datablocks(filepath: str) -> List[Tuple[str, str]]:
+    """Lists the (type, name) of the datablocks in a .blend file
+
+    Only the names are read, nothing is loaded into the open file.
+    """
+    datablocks = []
+    with bpy.data.libraries.load(filepath) as (data_from, _):
+        for id_type, _ in DATABLOCK_TYPES:
+            for name in getattr(data_from, id_type, ()):
+                datablocks.append((id_type, name))
+    return datablocks
+
+
+def set_datablocks(rev: str, filepath: str, error: str = ""):
+    """Fills the datablock list of the revision properties"""
+    revision_props = get_blendgit().revision_properties
+    # Drop results of a revision that is no longer the one asked for
+    if revision_props.datablock_revision != rev:
+        return
+    revision_props.datablock_list.clear()
+    revision_props.datablock_source = filepath
+    revision_props.datablock_error = error
+    if filepath:
+        for id_type, name in list_datablocks(filepath):
+            datablock = revision_props.datablock_list.add()
+            datablock.name = name
+            datablock.id_type = id_type
+    redraw_ui()
+
+
+def request_datablocks(
+        rev: str,
+        callback: Optional[Callable[[str], None]] = None) -> Future:
+    """Extracts the open file as of rev on the background executor
+
+    The datablock list is filled once the file is extracted.
+    """
+    repository = get_repository()
+    if repository is None:
+        raise Exception("The file is not in a repository")
+    path = os.path.relpath(bpy.data.filepath, repository.work_dir) \
+        .replace(os.sep, "/")
+    keep = linked_libraries()
+
+    def extract() -> Tuple[str, str]:
+        try:
+            return extract_revision(repository.work_dir,
+                                    repository.common_dir, rev, path,
+                                    keep), ""
+        except subprocess.CalledProcessError as e:
+            return "", e.stderr.decode("utf-8", "replace").strip()
+        except OSError as e:
+            return "", str(e)
+
+    def on_done(result: Tuple[str, str]):
+        filepath, error = result
+        set_datablocks(rev, filepath, error)
+        if callback is not None:
+            callback(filepath)
+
+    revision_props = get_blendgit().revision_properties
+    revision_props.datablock_revision = rev
+    revision_props.datablock_list.clear()
+    revision_props.datablock_error = ""
+    return executor.submit(f"datablocks-{rev}", extract, callback=on_done)
+
+
+def datablocks_loading() -> bool:
+    rev = get_blendgit().revision_properties.datablock_revision
+    return bool(rev) and executor.is_pending(f"datablocks-{rev}")
+
+
+class ListRevisionDatablocks(Operator):
+    bl_idname = "blendgit.list_revision_datablocks"
+    bl_label = "List Datablocks"
+    bl_description = ("List the datablocks of the selected revision, "
+                      "without switching to it")
+
+    def execute(self, context: Context):
+        revision_props = context.window_manager.blendgit.revision_properties
+        revision_list = revision_props.revision_list
+        index = revision_props.revision_list_index
+        if not 0 <= index < len(revision_list):
+            self.report({"ERROR"}, "No revision selected")
+            return {"CANCELLED"}
+
+        request_datablocks(revision_list[index]["hash"])
+
+        return {"FINISHED"}
+
+
+class PullDatablocks(Operator):
+    bl_idname = "blendgit.pull_datablocks"
+    bl_label = "Pull Datablocks"
+    bl_description = ("Append or link the checked datablocks from the "
+                      "listed revision")
+    bl_options = {"REGISTER", "UNDO"}
+
+    link: BoolProperty(
+        name="Link",
+        description="Link the datablocks instead of appending them")
+
+    def execute(self, context: Context):
+        revision_props = context.window_manager.blendgit.revision_properties
+        source = revision_props.datablock_source
+        wanted: Dict[str, List[str]] = defaultdict(list)
+        for datablock in revision_props.datablock_list:
+            if datablock.selected:
+                wanted[datablock.id_type].append(datablock.name)
+        if not wanted:
+            self.report({"ERROR"}, "No datablocks checked")
+            return {"CANCELLED"}
+        if not os.path.exists(source):
+            self.report({"ERROR"}, "Revision file is gone, list it again")
+            return {"CANCELLED"}
+
+        with bpy.data.libraries.load(source, link=self.link) \
+                as (data_from, data_to):
+            for id_type, names in wanted.items():
+                available = set(getattr(data_from, id_type))
+                setattr(data_to, id_type,
+                        [name for name in names if name in available])
+
+        # Pulled objects and collections are not in any scene yet
+        scene_collection = context.scene.collection
+        for obj in getattr(data_to, "objects", ()):
+            if obj is not None and obj.name not in scene_collection.objects:
+                scene_collection.objects.link(obj)
+        for collection in getattr(data_to, "collections", ()):
+            if collection is not None \
+                    and collection.name not in scene_collection.children:
+                scene_collection.children.link(collection)
+
+        count = sum(len([datablock for datablock in getattr(data_to, id_type)
+                         if datablock is not None])
+                    for id_type in wanted)
+        verb = "Linked" if self.link else "Appended"
+        rev = revision_props.datablock_revision
+        self.report({"INFO"}, f"{verb} {count} datablocks from {rev[:7]}")
+
+        return {"FINISHED"}
+
+
+registry = [
+    ListRevisionDatablocks,
+    PullDatablocks,
+]
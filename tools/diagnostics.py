@@ -0,0 +1,59 @@
+import json
+
+from bpy.props import StringProperty
+from bpy.types import Context, Operator
+
+from .. import tracing
+from ..common import redraw_ui
+
+
+def update_tracing(self, _context):
+    tracing.set_enabled(self.tracing)
+
+
+class ExportTrace(Operator):
+    bl_idname = "blendgit.export_trace"
+    bl_label = "Export Trace"
+    bl_description = ("Save the traced git commands and panel draws as "
+                      "Chrome trace events, to open in chrome://tracing or "
+                      "Perfetto")
+
+    filepath: StringProperty(
+        subtype="FILE_PATH",
+        default="blendgit-trace.json")
+    filter_glob: StringProperty(
+        default="*.json",
+        options={"HIDDEN"})
+
+    def invoke(self, context: Context, event):
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context: Context):
+        try:
+            with open(self.filepath, "w") as f:
+                json.dump(tracing.chrome_trace(), f)
+        except OSError as e:
+            self.report({"ERROR"}, str(e))
+            return {"CANCELLED"}
+        self.report({"INFO"}, f"Trace saved to {self.filepath}")
+
+        return {"FINISHED"}
+
+
+class ClearTrace(Operator):
+    bl_idname = "blendgit.clear_trace"
+    bl_label = "Clear Trace"
+    bl_description = "Forget the traced git commands and panel draws"
+
+    def execute(self, context: Context):
+        tracing.clear()
+        redraw_ui()
+
+        return {"FINISHED"}
+
+
+registry = [
+    ExportTrace,
+    ClearTrace,
+]
@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import Future
+from typing import Any, Dict
+
+import bpy
+from bpy.props import EnumProperty
+from bpy.types import Context, Operator
+
+from .. import executor, process
+from ..common import get_repository, redraw_ui
+
+
+DIFF_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "blend_diff.py")
+
+# Last diff read by blend_diff.py, with the revisions it compares and an
+# "error" instead when it failed
+revision_diff: Dict[str, Any] = {}
+
+
+def diff_cache_dir(common_dir: str) -> str:
+    return os.path.join(common_dir, "blendgit", "diffs")
+
+
+def read_diff(work_dir: str, common_dir: str, path: str, old_rev: str,
+              new_rev: str) -> Dict[str, Any]:
+    """Runs blend_diff.py in its own process"""
+    try:
+        output = process.run(
+            [sys.executable, DIFF_SCRIPT, diff_cache_dir(common_dir), path,
+             old_rev, new_rev],
+            work_dir).stdout
+        diff = json.loads(output)
+    except subprocess.CalledProcessError as e:
+        diff = {"error": e.stderr.decode("utf-8", "replace").strip()}
+    except (OSError, ValueError) as e:
+        diff = {"error": str(e)}
+    diff["old_rev"] = old_rev
+    diff["new_rev"] = new_rev
+    return diff
+
+
+def request_diff(old_rev: str, new_rev: str) -> Future:
+    """Compares the open file between two revisions on the executor"""
+    repository = get_repository()
+    if repository is None:
+        raise Exception("The file is not in a repository")
+    path = os.path.relpath(bpy.data.filepath, repository.work_dir) \
+        .replace(os.sep, "/")
+
+    def on_done(diff: Dict[str, Any]):
+        global revision_diff
+        revision_diff = diff
+        redraw_ui()
+
+    return executor.submit("revision-diff", read_diff, repository.work_dir,
+                           repository.common_dir, path, old_rev, new_rev,
+                           callback=on_done)
+
+
+def diff_pending() -> bool:
+    return executor.is_pending("revision-diff")
+
+
+class DiffRevision(Operator):
+    bl_idname = "blendgit.diff_revision"
+    bl_label = "Compare Revision"
+    bl_description = ("List the datablocks the selected revision added, "
+                      "removed or changed, without opening it")
+
+    against: EnumProperty(
+        name="Against",
+        items=[
+            ("PARENT", "Parent", "Compare with the revision before it"),
+            ("HEAD", "Current", "Compare with the checked out revision"),
+        ])
+
+    def execute(self, context: Context):
+        revision_props = context.window_manager.blendgit.revision_properties
+        revision_list = revision_props.revision_list
+        index = revision_props.revision_list_index
+        if not 0 <= index < len(revision_list):
+            self.report({"ERROR"}, "No revision selected")
+            return {"CANCELLED"}
+
+        rev = revision_list[index]["hash"]
+        if self.against == "PARENT":
+            request_diff(f"{rev}^", rev)
+        else:
+            request_diff(rev, "HEAD")
+
+        return {"FINISHED"}
+
+
+registry = [
+    DiffRevision,
+]
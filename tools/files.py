@@ -1,14 +1,50 @@
-from typing import List
+from concurrent.futures import Future
+from typing import Callable, List, Optional
 
-from ..common import status
+from .. import executor
+from ..common import (get_snapshot, get_state_cache, redraw_ui,
+                      request_snapshot)
+from ..snapshot import RepoSnapshot
 
 
 files_list = []
+files_loaded = False
 
 
 def refresh_files() -> List:
-    global files_list
+    global files_list, files_loaded
 
-    files_list = status()
+    files_list = get_snapshot(force_check=True).entries
+    files_loaded = True
 
     return files_list
+
+
+def request_files_refresh(
+        callback: Optional[Callable[[List], None]] = None) -> Future:
+    """Refreshes files_list on the background executor
+
+    The previous files_list stays available to draw() until the new
+    snapshot arrives, at which point callback is invoked with its entries.
+    """
+    def on_done(snapshot: RepoSnapshot):
+        global files_list, files_loaded
+        files_list = snapshot.entries
+        files_loaded = True
+        if callback is not None:
+            callback(files_list)
+
+    return request_snapshot(callback=on_done)
+
+
+def files_refreshing() -> bool:
+    return executor.is_pending("snapshot")
+
+
+def invalidate_files():
+    """Has the Files panel read the status again when it is next drawn
+
+    However many changes were made before that, they cost one refresh.
+    """
+    get_state_cache().invalidate("files")
+    redraw_ui()
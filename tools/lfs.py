@@ -1,9 +1,24 @@
+import os
+from functools import partial
+from typing import Optional
+
 import bpy
 
 from shutil import which
 from os.path import exists, join as path_join, split as path_split
 
-from ..common import get_blendgit, ui_refresh, do_git
+from ..common import get_blendgit, get_work_dir, ui_refresh, do_git
+from ..blend_filter import (DECOMPRESSED_HEADER, LFS_POINTER_HEADER,
+                            MANIFEST_HEADER)
+from ..lfs_migrate import LFS_PATTERNS
+
+
+FILTER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "blend_filter.py")
+# Filter drivers: stored decompressed, or also split into chunks
+BLEND_FILTER = "blendgit"
+CHUNKED_BLEND_FILTER = "blendgit-chunks"
 
 def has_lfs() -> bool:
     """Checks if Git LFS is installed"""
@@ -38,32 +53,103 @@ def initialize_lfs(extra_filetypes=()):
     """Initializes LFS with default binary filetypes"""
     if check_lfs_initialized():
         return
-    filetypes = {
-        # Models
-        "*.fbx", "*.obj", "*.max", "*.blend", "*.blender", "*.dae", "*.mb",
-        "*.ma", "*.3ds", "*.dfx", "*.c4d", "*.lwo", "*.lwo2", "*.abc",
-        "*.3dm", "*.bin", "*.glb",
-        # Images
-        "*.jpg", "*.jpeg", "*.png", "*.apng", "*.atsc", "*.gif", "*.bmp",
-        "*.exr", "*.tga", "*.tiff", "*.tif", "*.iff", "*.pict", "*.dds",
-        "*.xcf", "*.leo", "*.kra", "*.kpp", "*.clip", "*.webm", "*.webp",
-        "*.svg", "*.svgz", "*.psd",
-        # Archives
-        "*.zip", "*.7z", "*.gz", "*.rar", "*.tar",
-        # Unity
-        "*.meta", "*.unity", "*.unitypackage", "*.asset", "*.prefab",
-        "*.mat", "*.anim", "*.controller", "*.overrideController",
-        "*.physicMaterial", "*.physicsMaterial2D", "*.playable",
-        "*.mask", "*.brush", "*.flare", "*.fontsettings", "*.guiskin",
-        "*.giparams", "*.renderTexture", "*.spriteatlas", "*.terrainlayer",
-        "*.mixer", "*.shadervariants", "*.preset", "*.asmdef",
-        # User specified
-        *extra_filetypes
-    }
+    filetypes = {*LFS_PATTERNS, *extra_filetypes}
     do_git("lfs", "track", *filetypes)
 
     ui_refresh()
 
 
+def filter_command(command: str) -> str:
+    """Command line git runs for one side of the filter
+
+    Git runs it through a shell, so paths are quoted and use forward
+    slashes, which works on Windows too. The interpreter is looked up
+    when the filter runs: git started by Blendgit passes Blender's Python
+    in BLENDGIT_PYTHON (see process.py), elsewhere python3 is used.
+    """
+    script = FILTER_SCRIPT.replace("\\", "/")
+    return f'"${{BLENDGIT_PYTHON:-python3}}" "{script}" {command}'
+
+
+def blend_filter(work_dir: Optional[str] = None) -> Optional[str]:
+    """Returns the filter driver .gitattributes sets for .blend files"""
+    if work_dir is None:
+        work_dir = get_work_dir()
+    driver = None
+    try:
+        with open(path_join(work_dir, ".gitattributes")) as f:
+            for line in f:
+                fields = line.split()
+                if fields[:1] == ["*.blend"] and len(fields) > 1 \
+                        and fields[1].startswith("filter=blendgit"):
+                    driver = fields[1][len("filter="):]
+    except OSError:
+        pass
+    return driver
+
+
+def install_blend_filter(chunks: bool = False,
+                         work_dir: Optional[str] = None):
+    """Routes .blend files through blend_filter.py
+
+    What the filter stores is handed on to LFS, so .blend files stay in
+    LFS as the attributes written by initialize_lfs() intend. The filter
+    commands point at this add-on's copy of blend_filter.py, so this
+    runs again whenever a filter is installed, to follow it being moved.
+
+    Args:
+        chunks: Also split files into deduplicated chunks
+    """
+    if work_dir is None:
+        work_dir = get_work_dir()
+    git = partial(do_git, work_dir=work_dir)
+    driver = CHUNKED_BLEND_FILTER if chunks else BLEND_FILTER
+    clean = "clean --chunks --lfs -- %f" if chunks else "clean --lfs -- %f"
+    git("config", "--local", f"filter.{driver}.clean", filter_command(clean))
+    git("config", "--local", f"filter.{driver}.smudge",
+        filter_command("smudge -- %f"))
+    # Checking out a stored form instead of the file must never pass
+    # silently
+    git("config", "--local", f"filter.{driver}.required", "true")
+    if blend_filter(work_dir) != driver:
+        gitattributes_path = path_join(work_dir, ".gitattributes")
+        lines = []
+        if exists(gitattributes_path):
+            with open(gitattributes_path) as f:
+                lines = [line for line in f.read().splitlines()
+                         if not line.startswith("*.blend filter=blendgit")]
+        # Later lines win, so this replaces the LFS filter of *.blend,
+        # which the filter runs itself
+        lines.append(f"*.blend filter={driver} -diff -merge -text")
+        with open(gitattributes_path, "w", newline="\n") as f:
+            f.write("\n".join(lines) + "\n")
+        git("add", ".gitattributes")
+    restore_blend_files(work_dir)
+
+
+def restore_blend_files(work_dir: str):
+    """Checks out again the .blend files that hold what the filter
+    stores, like in a clone made without Blendgit"""
+    git = partial(do_git, work_dir=work_dir)
+    stored = []
+    for path in git("ls-files", "-z", "--", "*.blend").split("\0"):
+        if not path:
+            continue
+        try:
+            with open(path_join(work_dir, path), "rb") as f:
+                head = f.read(len(LFS_POINTER_HEADER))
+        except OSError:
+            continue
+        if head.startswith((LFS_POINTER_HEADER, MANIFEST_HEADER,
+                            DECOMPRESSED_HEADER)):
+            stored.append(path)
+    if stored:
+        # Git takes files that match the index for up to date and would
+        # not write them again. They only hold what the index has
+        for path in stored:
+            os.remove(path_join(work_dir, path))
+        git("--literal-pathspecs", "checkout", "--", *stored)
+
+
 registry = [
 ]
@@ -0,0 +1,183 @@
+import subprocess
+import threading
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+import bpy
+from bpy.props import BoolProperty
+from bpy.types import Context, Operator
+
+from .. import executor
+from ..common import get_repository, redraw_ui, ui_refresh, working_dir_clean
+from ..lfs_migrate import (analyze, migrate, parse_progress, read_state,
+                           size_report)
+from .lfs import has_lfs
+
+
+REDRAW_INTERVAL = 0.5
+
+# Result of the last analysis
+analysis: Dict = {}
+# State of the migration: the ref being rewritten, refs done out of how
+# many, the step git lfs migrate is at, the fraction of it done, the
+# size report once finished and the error if it failed. Written by the
+# worker thread.
+migration: Dict = {}
+_cancel = threading.Event()
+
+
+def _error_message(e: Exception) -> str:
+    if isinstance(e, subprocess.CalledProcessError):
+        output = e.output or e.stderr or b""
+        if isinstance(output, bytes):
+            output = output.decode("utf-8", "replace")
+        return output.strip().splitlines()[-1] if output.strip() \
+            else str(e)
+    return str(e)
+
+
+def request_analysis(everything: bool) -> Optional[Future]:
+    repository = get_repository()
+    if repository is None:
+        return None
+
+    def run() -> Dict:
+        try:
+            return analyze(repository.work_dir, everything)
+        except (subprocess.CalledProcessError, OSError, ValueError) as e:
+            return {"error": _error_message(e)}
+
+    def on_done(result: Dict):
+        global analysis
+        analysis = result
+        redraw_ui()
+
+    return executor.submit("lfs-analyze", run, callback=on_done)
+
+
+def analysis_pending() -> bool:
+    return executor.is_pending("lfs-analyze")
+
+
+def request_migration(everything: bool) -> Optional[Future]:
+    """Migrates history to LFS on the background executor, or resumes
+    the migration that was interrupted"""
+    repository = get_repository()
+    if repository is None:
+        return None
+    work_dir, common_dir = repository.work_dir, repository.common_dir
+
+    def on_progress(ref: str, done: int, total: int, line: str):
+        migration.update(ref=ref, done=done, total=total)
+        progress = parse_progress(line)
+        if progress is not None:
+            migration["step"], migration["fraction"] = progress
+
+    def run():
+        try:
+            if migrate(work_dir, common_dir, everything, on_progress,
+                       _cancel.is_set):
+                migration["report"] = size_report(work_dir, common_dir)
+        except (subprocess.CalledProcessError, OSError, ValueError) as e:
+            migration["error"] = _error_message(e)
+
+    def on_done(_):
+        global analysis
+        analysis = {}
+        # History and the checked out files were rewritten
+        ui_refresh()
+
+    _cancel.clear()
+    migration.clear()
+    migration.update(ref="", done=0, total=0, step="", fraction=0.0)
+    if not bpy.app.timers.is_registered(_redraw_progress):
+        bpy.app.timers.register(_redraw_progress,
+                                first_interval=REDRAW_INTERVAL)
+    return executor.submit("lfs-migrate", run, callback=on_done)
+
+
+def migration_pending() -> bool:
+    return executor.is_pending("lfs-migrate")
+
+
+def migration_interrupted() -> bool:
+    """Checks for a migration that stopped before rewriting every ref"""
+    repository = get_repository()
+    if repository is None:
+        return False
+    state = read_state(repository.common_dir)
+    return state is not None and len(state["done"]) < len(state["refs"])
+
+
+def _redraw_progress() -> Optional[float]:
+    redraw_ui()
+    return REDRAW_INTERVAL if migration_pending() else None
+
+
+class AnalyzeLfsMigration(Operator):
+    bl_idname = "blendgit.analyze_lfs_migration"
+    bl_label = "Analyze History"
+    bl_description = ("Measure how much of the history is binary files "
+                      "that could move to LFS")
+
+    everything: BoolProperty(
+        name="All Branches",
+        description="Look at every branch and tag, not just this branch")
+
+    def execute(self, context: Context):
+        request_analysis(self.everything)
+
+        return {"FINISHED"}
+
+
+class MigrateToLfs(Operator):
+    bl_idname = "blendgit.migrate_to_lfs"
+    bl_label = "Migrate To LFS"
+    bl_description = ("Rewrite history so binary files are stored in LFS. "
+                      "An interrupted migration resumes where it stopped")
+
+    everything: BoolProperty(
+        name="All Branches",
+        description="Rewrite every branch and tag, not just this branch")
+
+    def invoke(self, context: Context, event):
+        return context.window_manager.invoke_confirm(self, event)
+
+    def execute(self, context: Context):
+        if not has_lfs():
+            self.report({"ERROR"}, "Git LFS is not installed")
+            return {"CANCELLED"}
+        if bpy.data.is_dirty or not working_dir_clean(force_check=True):
+            self.report({"ERROR"},
+                        "Working directory must be clean (try saving or "
+                        "stashing)")
+            return {"CANCELLED"}
+
+        request_migration(self.everything)
+
+        return {"FINISHED"}
+
+
+class CancelLfsMigration(Operator):
+    bl_idname = "blendgit.cancel_lfs_migration"
+    bl_label = "Cancel Migration"
+    bl_description = ("Stop migrating. Branches not rewritten yet are left "
+                      "as they were, and the migration can be resumed")
+
+    def execute(self, context: Context):
+        _cancel.set()
+
+        return {"FINISHED"}
+
+
+def unregister():
+    _cancel.set()
+    if bpy.app.timers.is_registered(_redraw_progress):
+        bpy.app.timers.unregister(_redraw_progress)
+
+
+registry = [
+    AnalyzeLfsMigration,
+    MigrateToLfs,
+    CancelLfsMigration,
+]
@@ -0,0 +1,149 @@
+import os
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import bpy
+from bpy.types import Context, Operator
+
+from .. import executor
+from ..common import get_blendgit, get_repository, redraw_ui
+from ..core import prefetch
+from ..refs import resolve_ref
+from .branches import list_branches
+from .lfs import has_lfs
+
+
+# Revisions from the top of the list whose file is fetched ahead
+PREFETCH_REVISIONS = 10
+REDRAW_INTERVAL = 0.5
+
+# Status of each revision looked at: "queued", "fetching", "ready" (its
+# file needs no transfer) or "failed". Written by the worker thread.
+PREFETCH_ICONS = {
+    "queued": "TIME",
+    "fetching": "IMPORT",
+    "failed": "ERROR",
+}
+prefetch_status: Dict[str, str] = {}
+# The .blend file prefetch_status is for
+_filepath = ""
+# Set when the user cancelled, so draw() does not start over
+_cancelled = False
+_cancel = threading.Event()
+
+
+def prefetch_candidates() -> List[str]:
+    """Returns the revisions worth fetching ahead: the top of the
+    revision list and the branch tips"""
+    revision_props = get_blendgit().revision_properties
+    revs = [item["hash"]
+            for item in revision_props.revision_list[:PREFETCH_REVISIONS]]
+    repository = get_repository()
+    if repository is not None:
+        # Resolved here, so the status follows the tips as they move
+        for branch, _, _ in list_branches():
+            tip = resolve_ref(repository, f"refs/heads/{branch}") \
+                if branch else None
+            if tip is not None:
+                revs.append(tip)
+    return list(dict.fromkeys(revs))
+
+
+def request_prefetch(revs: List[str],
+                     retry: bool = False) -> Optional[Future]:
+    """Fetches the LFS objects of the open file in revs in the background
+
+    Cheap to call from draw(): nothing happens while a prefetch runs,
+    once every revision was looked at, or after the user cancelled.
+
+    Args:
+        retry: Start again after a cancel, and retry failed revisions
+    """
+    global _filepath, prefetch_status, _cancelled
+    if bpy.data.filepath != _filepath:
+        cancel_prefetch()
+        _filepath = bpy.data.filepath
+        prefetch_status = {}
+        _cancelled = False
+    if (_cancelled and not retry) or executor.is_pending("lfs-prefetch"):
+        return None
+    missing = [rev for rev in revs if rev not in prefetch_status
+               or (retry and prefetch_status[rev] == "failed")]
+    if not missing or not has_lfs():
+        return None
+    repository = get_repository()
+    if repository is None:
+        return None
+    path = os.path.relpath(bpy.data.filepath, repository.work_dir) \
+        .replace(os.sep, "/")
+
+    _cancelled = False
+    _cancel.clear()
+    if not bpy.app.timers.is_registered(_redraw_progress):
+        bpy.app.timers.register(_redraw_progress,
+                                first_interval=REDRAW_INTERVAL)
+    return executor.submit("lfs-prefetch", prefetch, repository.work_dir,
+                           repository.common_dir, path, missing,
+                           prefetch_status, _cancel,
+                           callback=lambda _: redraw_ui())
+
+
+def cancel_prefetch():
+    global _cancelled
+    if executor.is_pending("lfs-prefetch"):
+        _cancelled = True
+        _cancel.set()
+
+
+def prefetch_pending() -> bool:
+    return executor.is_pending("lfs-prefetch")
+
+
+def prefetch_cancelled() -> bool:
+    return _cancelled
+
+
+def prefetch_icon(rev: str) -> str:
+    return PREFETCH_ICONS.get(prefetch_status.get(rev, ""), "NONE")
+
+
+def _redraw_progress() -> Optional[float]:
+    """Timer showing per revision progress while a prefetch runs"""
+    redraw_ui()
+    return REDRAW_INTERVAL if prefetch_pending() else None
+
+
+class PrefetchRevisions(Operator):
+    bl_idname = "blendgit.prefetch_revisions"
+    bl_label = "Prefetch Revisions"
+    bl_description = ("Download the file of recent revisions and branch "
+                      "tips from LFS, so loading them does not wait")
+
+    def execute(self, context: Context):
+        request_prefetch(prefetch_candidates(), retry=True)
+
+        return {"FINISHED"}
+
+
+class CancelPrefetch(Operator):
+    bl_idname = "blendgit.cancel_prefetch"
+    bl_label = "Cancel Prefetch"
+    bl_description = "Stop downloading revisions ahead"
+
+    def execute(self, context: Context):
+        cancel_prefetch()
+
+        return {"FINISHED"}
+
+
+def unregister():
+    _cancel.set()
+    if bpy.app.timers.is_registered(_redraw_progress):
+        bpy.app.timers.unregister(_redraw_progress)
+
+
+registry = [
+    PrefetchRevisions,
+    CancelPrefetch,
+]
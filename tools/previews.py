@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import bpy
+import bpy.utils.previews
+
+from .. import executor, process
+from ..common import get_repository, redraw_ui
+
+
+THUMBNAILS_SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "thumbnails.py")
+
+# Seconds before revisions whose file was not available are looked up
+# again
+RETRY_INTERVAL = 10.0
+
+# Icon of each revision whose thumbnail was looked up, 0 if it has none
+revision_icons: Dict[str, int] = {}
+# When revisions whose file was not available were last looked up
+_unavailable: Dict[str, float] = {}
+# The .blend file revision_icons are for
+_filepath = ""
+_previews = None
+
+
+def thumbnail_cache_dir(common_dir: str) -> str:
+    return os.path.join(common_dir, "blendgit", "thumbnails")
+
+
+def get_previews():
+    global _previews
+    if _previews is None:
+        _previews = bpy.utils.previews.new()
+    return _previews
+
+
+def read_thumbnails(work_dir: str, common_dir: str, path: str,
+                    revs: List[str]) -> Dict[str, Optional[str]]:
+    """Runs thumbnails.py in its own process
+
+    Returns:
+        dict: The cached thumbnail by revision, "" where there is none and
+            None where the file is not available yet
+    """
+    try:
+        output = process.run(
+            [sys.executable, THUMBNAILS_SCRIPT,
+             thumbnail_cache_dir(common_dir), path, *revs],
+            work_dir).stdout
+        return json.loads(output)
+    except (subprocess.CalledProcessError, OSError, ValueError) as e:
+        logging.warning(f"Could not read revision thumbnails: {e}")
+        # Marked as having none, so failures are not retried every redraw
+        return {rev: "" for rev in revs}
+
+
+def request_thumbnails(revs: List[str]) -> Optional[Future]:
+    """Loads the thumbnails of revisions not looked up yet
+
+    Cheap to call from draw(): nothing happens once every revision is
+    known or while a page is being read. Revisions whose file is not
+    available, like an LFS object not fetched yet, are looked up again
+    every RETRY_INTERVAL seconds.
+    """
+    global _filepath
+    if bpy.data.filepath != _filepath:
+        clear_thumbnails()
+        _filepath = bpy.data.filepath
+    now = time.monotonic()
+    missing = [rev for rev in revs if rev not in revision_icons
+               and (rev not in _unavailable
+                    or now - _unavailable[rev] >= RETRY_INTERVAL)]
+    if not missing or executor.is_pending("thumbnails"):
+        return None
+    repository = get_repository()
+    if repository is None:
+        return None
+    path = os.path.relpath(bpy.data.filepath, repository.work_dir) \
+        .replace(os.sep, "/")
+
+    def on_done(thumbnails: Dict[str, Optional[str]]):
+        previews = get_previews()
+        for rev, thumbnail in thumbnails.items():
+            if thumbnail is None:
+                # Looked up again once fetched, e.g. by the LFS prefetch
+                _unavailable[rev] = time.monotonic()
+                continue
+            _unavailable.pop(rev, None)
+            icon = 0
+            if thumbnail:
+                # Named after the blob, so revisions sharing it share it
+                name = os.path.basename(thumbnail)
+                preview = previews.get(name)
+                if preview is None:
+                    preview = previews.load(name, thumbnail, "IMAGE")
+                icon = preview.icon_id
+            revision_icons[rev] = icon
+        redraw_ui()
+
+    return executor.submit("thumbnails", read_thumbnails,
+                           repository.work_dir, repository.common_dir, path,
+                           missing, callback=on_done)
+
+
+def revision_icon(rev: str) -> int:
+    return revision_icons.get(rev, 0)
+
+
+def clear_thumbnails():
+    """Forgets loaded thumbnails, e.g. after switching files"""
+    global _previews
+    revision_icons.clear()
+    _unavailable.clear()
+    if _previews is not None:
+        bpy.utils.previews.remove(_previews)
+        _previews = None
+
+
+def unregister():
+    clear_thumbnails()
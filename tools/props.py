@@ -5,8 +5,21 @@ from bpy.props import (BoolProperty, CollectionProperty,
                        PointerProperty)
 from bpy.types import PropertyGroup, WindowManager
 
+from ..core import AUTOSAVE_KEEP
+from .autosave import update_autosave
 from .constants import GIT_STATUS_ENUM
+from .diagnostics import update_tracing
 from .branches import list_branches
+from .revisions import scroll_revisions
+from ..watcher import ensure_watching
+
+
+def update_watch_repository(self, _context):
+    ensure_watching()
+
+
+def update_revision_list_index(self, _context):
+    scroll_revisions(self)
 
 
 class BranchProperties(PropertyGroup):
@@ -32,22 +45,60 @@ class GitCommit(PropertyGroup):
         name="Message")
 
 
+class RevisionDatablock(PropertyGroup):
+    """Represents a datablock in a historic revision
+
+    Attributes:
+        name: Name of the datablock
+        id_type: Name of its collection in bpy.data, like "objects"
+        selected: Whether it is checked for pulling
+    """
+    name: StringProperty(
+        name="Name")
+
+    id_type: StringProperty(
+        name="Type")
+
+    selected: BoolProperty(
+        name="Selected",
+        description="Pull this datablock")
+
+
 class RevisionProperties(PropertyGroup):
     """Properties for revisions
 
     Attributes:
-        revision_list: List of revisions
+        revision_list: Window of the revision history shown in the UI
         revision_list_index: Selected index in the list
+        revision_offset: Position of the window in the history
+        datablock_list: Datablocks of the revision datablock_revision,
+            read from its extracted file datablock_source
     """
     revision_list: CollectionProperty(
         name="Revision List",
         type=GitCommit)
 
-    revision_list_index: IntProperty()
+    revision_list_index: IntProperty(
+        update=update_revision_list_index)
+
+    revision_offset: IntProperty()
 
     pending_commit_message: StringProperty(
         name="Pending Commit")
 
+    datablock_list: CollectionProperty(
+        name="Datablock List",
+        type=RevisionDatablock)
+
+    datablock_list_index: IntProperty()
+
+    datablock_revision: StringProperty()
+
+    datablock_source: StringProperty(
+        subtype="FILE_PATH")
+
+    datablock_error: StringProperty()
+
 
 class GitFile(PropertyGroup):
     """Represents a file in the repository
@@ -56,6 +107,7 @@ class GitFile(PropertyGroup):
         name: Name of the file
         path: Path to the file
         status: Commit status
+        selected: Picked for Stage, Unstage and Discard
     """
     name: StringProperty(
         name="File Name")
@@ -67,6 +119,11 @@ class GitFile(PropertyGroup):
         name="Commit Status",
         items=GIT_STATUS_ENUM)  # type: ignore
 
+    selected: BoolProperty(
+        name="Selected",
+        description="Stage, unstage or discard this file with the others "
+                    "selected")
+
 
 class FileBrowserProperties(PropertyGroup):
     files_list: CollectionProperty(
@@ -83,9 +140,39 @@ class BlendgitProperties(PropertyGroup):
     branch_properties: PointerProperty(type=BranchProperties)
     file_properties: PointerProperty(type=FileBrowserProperties)
     revision_properties: PointerProperty(type=RevisionProperties)
-    num_revision_list_refreshes: IntProperty()
-    num_file_list_refreshes: IntProperty()
     working_dir_is_clean: BoolProperty()
+    watch_repository: BoolProperty(
+        name="Watch Repository",
+        description="Update the sidebar when files or git state change on "
+                    "disk, instead of checking on every redraw",
+        default=True,
+        update=update_watch_repository)
+    autosave: BoolProperty(
+        name="Autosave Snapshots",
+        description="Periodically keep the open file as a snapshot on a "
+                    "hidden ref, without committing. Each snapshot stores "
+                    "the whole file in the repository, unless it did not "
+                    "change",
+        default=False)
+    autosave_interval: IntProperty(
+        name="Interval",
+        description="Minutes between autosave snapshots",
+        default=5,
+        min=1,
+        update=update_autosave)
+    autosave_keep: IntProperty(
+        name="Keep",
+        description="Autosave snapshots kept for each branch. Older "
+                    "ones are dropped once there are twice as many, so "
+                    "the repository can grow by up to twice this many "
+                    "times the size of the file",
+        default=AUTOSAVE_KEEP,
+        min=1)
+    tracing: BoolProperty(
+        name="Trace Git Commands",
+        description="Record the git commands Blendgit runs and how long "
+                    "panels take to draw",
+        update=update_tracing)
     current_branch: StringProperty()
     git_checks_done: PointerProperty(type=PropertyGroup)
 
@@ -95,6 +182,7 @@ registry = [
     GitFile,
     FileBrowserProperties,
     GitCommit,
+    RevisionDatablock,
     RevisionProperties,
     BlendgitProperties,
 ]
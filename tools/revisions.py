@@ -1,18 +1,56 @@
-from typing import List
+from concurrent.futures import Future
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 import os
+import sqlite3
 
-from bpy.props import StringProperty
+from bpy.props import BoolProperty, StringProperty
 from bpy.types import Operator, Context
 from bpy.ops import wm
 import bpy
 
+from .. import executor, list_filter, list_sync
+from ..commit_index import read_history, search_history
+from ..core import search_log
+from ..history import CommitStore
 from ..common import (do_git,
+                      log,
+                      current_branch,
+                      local_branches,
                       working_dir_clean,
                       check_repo_exists,
                       ui_refresh,
+                      redraw_ui,
                       git_log,
-                      get_work_dir,)
+                      get_blendgit,
+                      get_snapshot,
+                      get_state_cache,
+                      get_work_dir,
+                      needs_refresh,
+                      query_state,
+                      request_snapshot,)
+from .commit import commit_pending, request_commit
+from .files import invalidate_files
 from .lfs import initialize_lfs
+from .worktrees import previewed_revision
+
+
+# Commits read per git log call
+PAGE_SIZE = 100
+# Commits materialized into revision_list at a time
+WINDOW_SIZE = 50
+# Rows from either edge of the window at which it slides
+WINDOW_MARGIN = 5
+# Matches of a search materialized into revision_list at most
+SEARCH_LIMIT = 200
+
+history = CommitStore()
+# Filter text and invert setting of the last search asked for, and of
+# the one whose matches revision_list holds instead of the window
+_search_request: Tuple[str, bool] = ("", False)
+search_shown: Tuple[str, bool] = ("", False)
+# Whether there were more matches than SEARCH_LIMIT
+search_truncated = False
 
 
 # Loading
@@ -21,20 +59,17 @@ from .lfs import initialize_lfs
 def get_main_branch() -> str:
     """Returns the main branch of the repo"""
     ensure_repo_exists()
-    for branch in do_git("branch").splitlines():
-        if "main" in branch:
-            return "main"
+    if "main" in local_branches():
+        return "main"
     return 'master'
 
 
 def which_branch() -> str:
-    """Returns the current branch (if not in a commit)"""
-    ensure_repo_exists()
-    ref = do_git("rev-parse", "--abbrev-ref", "HEAD").rstrip()
-    if ref != get_main_branch():
-        ref = do_git("rev-parse", "--short", "HEAD").rstrip()
+    """Returns the current branch (or the commit if HEAD is detached)
 
-    return ref
+    Called from draw(), so it neither creates a repository nor runs git.
+    """
+    return current_branch(cached=True)
 
 
 class LoadCommit(Operator):
@@ -50,7 +85,7 @@ class LoadCommit(Operator):
         revision_list_index = revision_props.revision_list_index
         selected_revision = revision_list[revision_list_index]
 
-        if not working_dir_clean():
+        if not working_dir_clean(force_check=True):
             self.report({"ERROR"}, "Working directory not clean")
             return {"CANCELLED"}
 
@@ -94,20 +129,147 @@ def ensure_repo_exists():
         create_gitignore()
 
 
+def selected_entries(file_props) -> List[Dict]:
+    """Returns the status entries of the selected files, or of the active
+    one when none is selected"""
+    names = {item.name for item in file_props.files_list if item.selected}
+    if not names and 0 <= file_props.files_list_index \
+            < len(file_props.files_list):
+        names = {file_props.files_list[file_props.files_list_index].name}
+    return [entry for entry in get_snapshot().entries
+            if entry["file_path"] in names]
+
+
+def run_on_paths(paths: List[str], *args):
+    """Runs a git command on many paths with a single process
+
+    The paths are fed through stdin, so no command line gets too long,
+    and taken literally, so names with wildcards match only themselves.
+    """
+    do_git("--literal-pathspecs", *args, "--pathspec-from-file=-",
+           "--pathspec-file-nul", input="\0".join(paths).encode("utf-8"))
+
+
+def refuse_preview(operator: Operator) -> bool:
+    """Reports an error when the open file is a revision preview
+
+    Previews are checked out in pooled worktrees that are reset on reuse,
+    so what would be staged or committed there is lost.
+    """
+    if previewed_revision() is None:
+        return False
+    operator.report({"ERROR"}, "Previews are read-only, go back to the "
+                                "working copy first")
+    return True
+
+
+def entry_paths(entries: List[Dict]) -> List[str]:
+    """Lists the paths of entries, with where renamed files came from"""
+    paths = []
+    for entry in entries:
+        paths.append(entry["file_path"])
+        if entry["orig_path"]:
+            paths.append(entry["orig_path"])
+    return paths
+
+
 class StageFile(Operator):
     bl_idname = "blendgit.stage_file"
-    bl_label = "Stage File"
-    bl_description = "Stage a file"
+    bl_label = "Stage Files"
+    bl_description = "Stage the selected files, or the active one"
 
     def execute(self, context: Context):
-        blendgit = context.window_manager.blendgit
-        file_props = blendgit.file_properties
-        files_list: List[str] = file_props.files_list
-        files_list_index: int = file_props.files_list_index
-        file_to_stage: str = files_list[files_list_index].name
+        if refuse_preview(self):
+            return {"CANCELLED"}
+
+        file_props = context.window_manager.blendgit.file_properties
+        entries = selected_entries(file_props)
+        if not entries:
+            self.report({"ERROR"}, "No files selected")
+            return {"CANCELLED"}
 
         ensure_repo_exists()
-        add_files(file=file_to_stage)
+        run_on_paths(entry_paths(entries), "add", "--all")
+        invalidate_files()
+
+        return {"FINISHED"}
+
+
+class UnstageFiles(Operator):
+    bl_idname = "blendgit.unstage_files"
+    bl_label = "Unstage Files"
+    bl_description = ("Remove the selected files, or the active one, from "
+                      "the next commit. Their changes are kept")
+
+    def execute(self, context: Context):
+        if refuse_preview(self):
+            return {"CANCELLED"}
+
+        file_props = context.window_manager.blendgit.file_properties
+        entries = [entry for entry in selected_entries(file_props)
+                   if entry["staged"]]
+        if not entries:
+            self.report({"ERROR"}, "No staged files selected")
+            return {"CANCELLED"}
+
+        run_on_paths(entry_paths(entries), "reset", "--quiet")
+        invalidate_files()
+
+        return {"FINISHED"}
+
+
+class DiscardFiles(Operator):
+    bl_idname = "blendgit.discard_files"
+    bl_label = "Discard Changes"
+    bl_description = ("Put the selected files, or the active one, back as "
+                      "they were last committed. Added files are only "
+                      "unstaged and untracked files are left alone")
+
+    def invoke(self, context: Context, event):
+        return context.window_manager.invoke_confirm(self, event)
+
+    def execute(self, context: Context):
+        if refuse_preview(self):
+            return {"CANCELLED"}
+
+        file_props = context.window_manager.blendgit.file_properties
+        entries = [entry for entry in selected_entries(file_props)
+                   if entry["status"] != "new"]
+        if not entries:
+            self.report({"ERROR"}, "No tracked files selected")
+            return {"CANCELLED"}
+
+        # Restoring would delete files that are not in HEAD
+        added = [entry for entry in entries if entry["status"] == "added"]
+        if added:
+            run_on_paths(entry_paths(added), "reset", "--quiet")
+        paths = entry_paths([entry for entry in entries
+                             if entry["status"] != "added"])
+        if paths:
+            run_on_paths(paths, "restore", "--source=HEAD", "--staged",
+                         "--worktree")
+        invalidate_files()
+        open_path = os.path.relpath(bpy.data.filepath, get_work_dir()) \
+            .replace(os.sep, "/")
+        if open_path in paths:
+            # The open file was replaced on disk
+            wm.open_mainfile(
+                "EXEC_DEFAULT", filepath=bpy.data.filepath)  # type: ignore
+
+        return {"FINISHED"}
+
+
+class SelectAllFiles(Operator):
+    bl_idname = "blendgit.select_all_files"
+    bl_label = "Select All"
+    bl_description = "Select every file, or none if some are selected"
+
+    def execute(self, context: Context):
+        files_list = context.window_manager.blendgit.file_properties \
+            .files_list
+        select = not any(item.selected for item in files_list)
+        for item in files_list:
+            item.selected = select
 
         return {"FINISHED"}
 
@@ -118,6 +280,9 @@ class StageAll(Operator):
     bl_description = "Stage all files in project"
 
     def execute(self, context: Context):
+        if refuse_preview(self):
+            return {"CANCELLED"}
+
         ensure_repo_exists()
         add_files()
 
@@ -130,6 +295,9 @@ class ResetStaged(Operator):
     bl_description = "Reset all staged files in project"
 
     def execute(self, context: Context):
+        if refuse_preview(self):
+            return {"CANCELLED"}
+
         do_git("reset", ".")
 
         return {"FINISHED"}
@@ -146,18 +314,20 @@ class SaveCommit(Operator):
         description="Commit message")
 
     def execute(self, context: Context):
-        def has_staged_files() -> bool:
-            files_list = blendgit.file_properties.files_list
-            for file in files_list:
-                if file["staged"]:
-                    return True
+        if refuse_preview(self):
+            return {"CANCELLED"}
 
-            return False
         blendgit = context.window_manager.blendgit
         revision_props = blendgit.revision_properties
         msg = revision_props.pending_commit_message
+        staged = [entry["file_path"]
+                  for entry in get_snapshot(force_check=True).entries
+                  if entry["staged"]]
 
-        if not has_staged_files():
+        if commit_pending():
+            self.report({"ERROR"}, "A commit is already running")
+            result = {"CANCELLED"}
+        elif not staged:
             self.report({"ERROR"}, "No files staged for commit")
             result = {"CANCELLED"}
         elif not msg.strip():
@@ -166,12 +336,12 @@ class SaveCommit(Operator):
         else:
             ensure_repo_exists()
 
+            # Saving has to happen here, the rest runs in the background
             wm.save_as_mainfile(
                 "EXEC_DEFAULT", filepath=bpy.data.filepath)  # type: ignore
 
-            do_git("commit", "-m", msg)
-            self.report({"INFO"}, "Success!")
-            ui_refresh()
+            request_commit(staged, msg)
+            self.report({"INFO"}, "Committing in the background")
             result = {"FINISHED"}
 
         return result
@@ -179,14 +349,265 @@ class SaveCommit(Operator):
 # Revisions
 
 
-def refresh_revisions() -> List:
-    return git_log()
+def read_revisions(work_dir: str) -> Tuple[List, bool, str]:
+    """Reads the first page of the history of HEAD, from the commit index
+    when possible
+
+    Returns:
+        tuple: The entries, whether they are the complete history and the
+            commit they were read from, empty when not from the index
+    """
+    git = partial(do_git, work_dir=work_dir)
+    try:
+        head, entries = read_history(git,
+                                     get_state_cache(work_dir).common_dir,
+                                     count=PAGE_SIZE)
+        return entries, len(entries) < PAGE_SIZE, head
+    except (sqlite3.Error, OSError) as e:
+        log(f"Commit index unavailable, reading git log instead: {e}")
+        entries = git_log(work_dir, count=PAGE_SIZE)
+        return entries, len(entries) < PAGE_SIZE, ""
+
+
+def read_older_revisions(work_dir: str, head: str, skip: int,
+                         indexed: bool) -> List:
+    """Reads a page of history the way its first page was read"""
+    if indexed:
+        git = partial(do_git, work_dir=work_dir)
+        return read_history(git, get_state_cache(work_dir).common_dir,
+                            head, skip, PAGE_SIZE)[1]
+    return git_log(work_dir, skip, PAGE_SIZE, head)
+
+
+def set_history(entries: List, complete: bool,
+                indexed_head: str = "") -> CommitStore:
+    global history
+    history = CommitStore(indexed_head
+                          or (entries[0]["hash"] if entries else ""))
+    history.extend(entries)
+    history.complete = complete
+    history.indexed = bool(indexed_head)
+    return history
+
+
+def refresh_revisions() -> CommitStore:
+    return set_history(*read_revisions(get_work_dir()))
+
+
+def request_revisions_refresh(
+        callback: Optional[Callable[[CommitStore], None]] = None) -> Future:
+    """Reloads the history on the background executor
+
+    The commit index only has to learn about commits made since the last
+    refresh, so this stays fast however long the history is. The panel
+    keeps drawing the previous state until the job finishes. Branch and
+    cleanliness come from the shared snapshot, which is requested
+    alongside the history.
+    """
+    def on_done(result: Tuple[List, bool, str]):
+        set_history(*result)
+        if callback is not None:
+            callback(history)
+        redraw_ui()
+
+    if needs_refresh("files"):
+        request_snapshot()
+    return executor.submit("revisions", query_state, "revisions",
+                           read_revisions, get_work_dir(), callback=on_done)
+
+
+def request_older_revisions() -> Optional[Future]:
+    """Streams the next page of history into the store"""
+    if history.complete or not history.head:
+        return None
+    store = history
+
+    def on_done(entries: List):
+        # Drop the page if the history was reloaded in the meantime
+        if store is not history:
+            return
+        store.extend(entries)
+        store.complete = len(entries) < PAGE_SIZE
+        redraw_ui()
+
+    return executor.submit("revisions-page", read_older_revisions,
+                           get_work_dir(), store.head, len(store),
+                           store.indexed, callback=on_done)
+
+
+def revisions_refreshing() -> bool:
+    return executor.is_pending("revisions") \
+        or executor.is_pending("revisions-page")
+
+
+def show_revisions(entries: List[Dict]):
+    """Makes revision_list hold entries"""
+    revision_props = get_blendgit().revision_properties
+    rows = [(entry["hash"], entry["date"], entry["message"])
+            for entry in entries]
+    if list_sync.sync("revisions", revision_props.revision_list,
+                      ("hash", "date", "message"), rows,
+                      owner=revision_props,
+                      index_prop="revision_list_index"):
+        list_filter.changed("revisions")
+
+
+def materialize_revisions(offset: int = 0):
+    """Copies the window of history starting at offset into revision_list
+
+    Only WINDOW_SIZE items ever live in the CollectionProperty, however
+    long the history is. While a search is shown, it is done again on
+    the history instead.
+    """
+    revision_props = get_blendgit().revision_properties
+    offset = max(0, min(offset, len(history) - WINDOW_SIZE))
+    revision_props.revision_offset = offset
+    if _search_request[0]:
+        request_search(*_search_request, again=True)
+        return
+    show_revisions(history.window(offset, offset + WINDOW_SIZE))
+
+
+def search_revisions(work_dir: str, store: CommitStore, text: str,
+                     invert: bool) -> List:
+    """Finds the revisions in the history of store whose date, message
+    or hash match text, the way the revision list filters them
+
+    The whole history is searched, not only the pages loaded into the
+    store: by the commit index, or git log without it, which only
+    matches messages.
+
+    Args:
+        invert: Find the revisions that do not match instead
+
+    Returns:
+        list: Up to SEARCH_LIMIT + 1 matches, newest first
+    """
+    pattern = list_filter.name_pattern(text)
+    if pattern is None:
+        return []
+    if store.indexed:
+        git = partial(do_git, work_dir=work_dir)
+        return search_history(git, get_state_cache(work_dir).common_dir,
+                              store.head, list_filter.glob_pattern(text),
+                              invert, SEARCH_LIMIT + 1)
+    if not store.complete:
+        return search_log(work_dir, list_filter.grep_pattern(text), invert,
+                          SEARCH_LIMIT + 1, store.head)
+    matches = []
+    for entry in store.window(0, len(store)):
+        name = f"{entry['date']} {entry['message']} {entry['hash']}"
+        if (pattern.match(name) is None) == invert:
+            matches.append(entry)
+            if len(matches) > SEARCH_LIMIT:
+                break
+    return matches
+
+
+def request_search(text: str, invert: bool = False,
+                   again: bool = False) -> Optional[Future]:
+    """Searches the history on the background executor, then shows the
+    matches in revision_list instead of the window
+
+    Called from the revision list's filter, as it only sees the window.
+    An empty text brings the window back.
+
+    Args:
+        again: Search even if text was the last search, as the history
+            changed
+    """
+    global _search_request
+    request = (text, invert)
+    if (request == _search_request and not again) or not history.head:
+        return None
+    _search_request = request
+    store = history
+
+    def on_done(matches: List):
+        global search_shown, search_truncated
+        # Drop results of a search or a history that was replaced
+        if request != _search_request or store is not history:
+            return
+        search_shown = request
+        search_truncated = len(matches) > SEARCH_LIMIT
+        if text:
+            show_revisions(matches[:SEARCH_LIMIT])
+            get_blendgit().revision_properties.revision_list_index = 0
+        else:
+            materialize_revisions(
+                get_blendgit().revision_properties.revision_offset)
+        redraw_ui()
+
+    # Even an empty text goes through the executor, as its callback is
+    # where revision_list can be written, unlike the list's filter
+    return executor.submit(f"revisions-search-{invert}-{text}",
+                           search_revisions, get_work_dir(), store, text,
+                           invert, callback=on_done)
+
+
+def searching_revisions() -> bool:
+    text, invert = _search_request
+    return executor.is_pending(f"revisions-search-{invert}-{text}")
+
+
+def scroll_revisions(revision_props):
+    """Slides the window to follow the selection
+
+    Called whenever the selected revision changes. Moving close to the
+    end of the loaded history also streams in the next page.
+    """
+    if search_shown[0]:
+        # The list holds the matches of a search, not the window
+        return
+    index = revision_props.revision_list_index
+    offset = revision_props.revision_offset
+    selected = offset + index
+    if selected >= len(history) - PAGE_SIZE // 2:
+        request_older_revisions()
+
+    if index >= WINDOW_SIZE - WINDOW_MARGIN \
+            and offset + WINDOW_SIZE < len(history):
+        materialize_revisions(selected - WINDOW_MARGIN)
+    elif index < WINDOW_MARGIN and offset > 0:
+        materialize_revisions(selected - WINDOW_SIZE + WINDOW_MARGIN + 1)
+    else:
+        return
+    revision_props.revision_list_index = \
+        selected - revision_props.revision_offset
+
+
+class RevisionPage(Operator):
+    """Show older or newer revisions"""
+    bl_idname = "blendgit.revision_page"
+    bl_label = "Revision Page"
+
+    older: BoolProperty(
+        name="Older",
+        description="Page towards older revisions")
+
+    def execute(self, context: Context):
+        revision_props = context.window_manager.blendgit.revision_properties
+        offset = revision_props.revision_offset
+        if self.older:
+            offset += WINDOW_SIZE
+            if offset + WINDOW_SIZE >= len(history):
+                request_older_revisions()
+        else:
+            offset -= WINDOW_SIZE
+        materialize_revisions(offset)
+        revision_props.revision_list_index = 0
+
+        return {"FINISHED"}
 
 
 registry = [
     LoadCommit,
+    RevisionPage,
     SaveCommit,
     StageFile,
+    UnstageFiles,
+    DiscardFiles,
+    SelectAllFiles,
     StageAll,
     ResetStaged,
 ]
@@ -0,0 +1,111 @@
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from bpy.types import Context, Operator
+
+from .. import executor
+from ..blend_filter import has_remote, storage_report
+from ..common import get_work_dir, redraw_ui, ui_refresh
+from .lfs import (BLEND_FILTER, CHUNKED_BLEND_FILTER, blend_filter,
+                  has_lfs, install_blend_filter)
+from .revisions import ensure_repo_exists
+
+
+report_rows: List[Dict] = []
+
+
+def chunked_storage_enabled(work_dir: Optional[str] = None) -> bool:
+    return blend_filter(work_dir) == CHUNKED_BLEND_FILTER
+
+
+def decompressed_storage_enabled(work_dir: Optional[str] = None) -> bool:
+    return blend_filter(work_dir) == BLEND_FILTER
+
+
+def request_storage_report(work_dir: Optional[str] = None) -> Future:
+    """Builds the storage report on the background executor"""
+    def on_done(rows: List[Dict]):
+        global report_rows
+        report_rows = rows
+        redraw_ui()
+
+    if work_dir is None:
+        work_dir = get_work_dir()
+    return executor.submit("storage-report", storage_report, work_dir,
+                           callback=on_done)
+
+
+def storage_report_pending() -> bool:
+    return executor.is_pending("storage-report")
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TiB"
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+class EnableDecompressedStorage(Operator):
+    bl_idname = "blendgit.enable_decompressed_storage"
+    bl_label = "Store .blend Decompressed"
+    bl_description = ("Store .blend files saved with compression "
+                      "decompressed in LFS, and compress them again on "
+                      "checkout. Every clone has to enable this too, "
+                      "until then its .blend files cannot be opened")
+
+    def execute(self, context: Context):
+        if not has_lfs():
+            self.report({"ERROR"}, "Git LFS is not installed")
+            return {"CANCELLED"}
+        ensure_repo_exists()
+        install_blend_filter()
+        ui_refresh()
+        self.report({"INFO"}, "Compressed .blend files are stored "
+                              "decompressed")
+
+        return {"FINISHED"}
+
+
+class EnableChunkedStorage(Operator):
+    bl_idname = "blendgit.enable_chunked_storage"
+    bl_label = "Enable Chunked Storage"
+    bl_description = ("Store .blend files as deduplicated chunks, so "
+                      "commits only add the parts that changed. Chunks "
+                      "are only kept in this repository and are never "
+                      "pushed, so this is refused for repositories with "
+                      "a remote")
+
+    def execute(self, context: Context):
+        ensure_repo_exists()
+        if has_remote(get_work_dir()):
+            self.report({"ERROR"}, "Chunks cannot be pushed, so "
+                                   "repositories with a remote are not "
+                                   "chunked")
+            return {"CANCELLED"}
+        install_blend_filter(chunks=True)
+        ui_refresh()
+        self.report({"INFO"}, "Chunked storage enabled for .blend files")
+
+        return {"FINISHED"}
+
+
+class StorageReport(Operator):
+    bl_idname = "blendgit.storage_report"
+    bl_label = "Storage Report"
+    bl_description = "Measure how much space chunking saves per commit"
+
+    def execute(self, context: Context):
+        request_storage_report()
+
+        return {"FINISHED"}
+
+
+registry = [
+    EnableDecompressedStorage,
+    EnableChunkedStorage,
+    StorageReport,
+]
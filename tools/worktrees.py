@@ -0,0 +1,237 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import Future
+from typing import Callable, Optional, Set, Tuple
+
+import bpy
+from bpy import ops
+from bpy.props import BoolProperty
+from bpy.types import Context, Operator
+
+from .. import executor, process
+from ..common import get_repository, redraw_ui
+from ..refs import find_repository, read_head
+from .datablocks import linked_libraries
+
+
+# Revisions kept checked out at once
+MAX_WORKTREES = 3
+
+# Revision being checked out for OpenRevision, and why it failed
+_opening = ""
+open_error = ""
+
+
+def pool_dir(common_dir: str) -> str:
+    return os.path.join(common_dir, "blendgit", "worktrees")
+
+
+def run_git(cwd: str, *args: str):
+    process.run(["git", *args], cwd, stdout=subprocess.DEVNULL)
+
+
+def worktree_head(path: str) -> Optional[str]:
+    """Returns the commit a pooled worktree has checked out, None if the
+    directory is not a working worktree"""
+    repository = find_repository(path)
+    if repository is None or os.path.normpath(repository.work_dir) \
+            != os.path.normpath(path):
+        return None
+    return read_head(repository)[1]
+
+
+def checkout_revision(work_dir: str, common_dir: str, rev: str,
+                      busy: Set[str]) -> str:
+    """Returns a pooled worktree with rev checked out
+
+    A worktree already at rev is reused as is. Otherwise a new one is
+    added while the pool has room, or else the least recently used one
+    is pointed at rev, which only rewrites the files that differ.
+    Worktrees share the objects of the main repository, LFS and chunk
+    stores included, so nothing is downloaded twice.
+
+    Args:
+        rev: Full hash of the commit
+        busy: Worktrees that must not be pointed elsewhere, like the one
+            of the open file
+
+    Returns:
+        str: Top level of the worktree
+    """
+    directory = pool_dir(common_dir)
+    os.makedirs(directory, exist_ok=True)
+    slots = [os.path.join(directory, name)
+             for name in sorted(os.listdir(directory))]
+    heads = {slot: worktree_head(slot) for slot in slots}
+    for slot, head in heads.items():
+        if head == rev:
+            os.utime(slot)
+            return slot
+
+    broken = [slot for slot, head in heads.items() if head is None]
+    if broken or len(slots) < MAX_WORKTREES:
+        if broken:
+            path = broken[0]
+            shutil.rmtree(path)
+        else:
+            path = next(os.path.join(directory, f"slot-{n}")
+                        for n in range(len(slots) + 1)
+                        if os.path.join(directory, f"slot-{n}") not in heads)
+        # Forget worktrees whose directory is gone
+        run_git(work_dir, "worktree", "prune")
+        run_git(work_dir, "worktree", "add", "--detach", path, rev)
+    else:
+        idle = [slot for slot in slots if slot not in busy]
+        if not idle:
+            raise RuntimeError("Every pooled worktree is in use")
+        path = min(idle, key=os.path.getmtime)
+        # Pooled worktrees are read-only previews, so changes are dropped
+        run_git(path, "checkout", "--detach", "--force", rev)
+        run_git(path, "clean", "-fdx")
+    os.utime(path)
+    return path
+
+
+def previewed_revision() -> Optional[Tuple[str, str]]:
+    """Checks if the open file comes from a pooled worktree
+
+    Returns:
+        tuple: The revision shown and the path of the file in the main
+            working tree, or None for files that are not previews
+    """
+    repository = get_repository()
+    if repository is None or os.path.dirname(repository.work_dir) \
+            != os.path.normpath(pool_dir(repository.common_dir)):
+        return None
+    relpath = os.path.relpath(bpy.data.filepath, repository.work_dir)
+    main_work_dir = os.path.dirname(repository.common_dir)
+    return (read_head(repository)[1] or "",
+            os.path.join(main_work_dir, relpath))
+
+
+def link_collections(filepath: str):
+    """Links every collection of a file into the scene as instances"""
+    with bpy.data.libraries.load(filepath, link=True) \
+            as (data_from, data_to):
+        data_to.collections = list(data_from.collections)
+    scene_collection = bpy.context.scene.collection
+    for collection in data_to.collections:
+        if collection is None:
+            continue
+        instance = bpy.data.objects.new(collection.name, None)
+        instance.instance_type = "COLLECTION"
+        instance.instance_collection = collection
+        scene_collection.objects.link(instance)
+
+
+def request_revision_file(rev: str,
+                          callback: Callable[[str], None]) -> Future:
+    """Checks out rev in a pooled worktree on the background executor
+
+    The callback gets the path of the open file in that worktree, and is
+    not called when the checkout fails.
+    """
+    repository = get_repository()
+    if repository is None:
+        raise Exception("The file is not in a repository")
+    common_dir = repository.common_dir
+    directory = os.path.normpath(pool_dir(common_dir))
+    preview = previewed_revision()
+    main_file = bpy.data.filepath if preview is None else preview[1]
+    main_work_dir = os.path.dirname(common_dir)
+    relpath = os.path.relpath(main_file, main_work_dir)
+    # Keep the worktree of the open file and of linked libraries
+    busy = set()
+    for path in linked_libraries() | {bpy.data.filepath}:
+        if path.startswith(directory + os.sep):
+            slot = os.path.relpath(path, directory).split(os.sep)[0]
+            busy.add(os.path.join(directory, slot))
+
+    def checkout() -> Tuple[str, str]:
+        try:
+            worktree = checkout_revision(main_work_dir, common_dir, rev,
+                                         busy)
+        except subprocess.CalledProcessError as e:
+            return "", e.stderr.decode("utf-8", "replace").strip()
+        except (OSError, RuntimeError) as e:
+            return "", str(e)
+        filepath = os.path.join(worktree, relpath)
+        if not os.path.exists(filepath):
+            return "", f"The file is not in revision {rev[:7]}"
+        return filepath, ""
+
+    def on_done(result: Tuple[str, str]):
+        global open_error
+        filepath, open_error = result
+        if filepath:
+            callback(filepath)
+        else:
+            redraw_ui()
+
+    global _opening, open_error
+    _opening = rev
+    open_error = ""
+    return executor.submit(f"worktree-{rev}", checkout, callback=on_done)
+
+
+def opening_revision() -> bool:
+    return bool(_opening) and executor.is_pending(f"worktree-{_opening}")
+
+
+class OpenRevision(Operator):
+    bl_idname = "blendgit.open_revision"
+    bl_label = "Open Revision"
+    bl_description = ("Open the selected revision from a separate checkout, "
+                      "leaving the working tree as it is")
+
+    link: BoolProperty(
+        name="Link",
+        description=("Link the collections of the revision into the open "
+                     "file instead of opening it"))
+
+    def execute(self, context: Context):
+        revision_props = context.window_manager.blendgit.revision_properties
+        revision_list = revision_props.revision_list
+        index = revision_props.revision_list_index
+        if not 0 <= index < len(revision_list):
+            self.report({"ERROR"}, "No revision selected")
+            return {"CANCELLED"}
+        if not self.link and bpy.data.is_dirty:
+            self.report({"ERROR"}, "Need to save first")
+            return {"CANCELLED"}
+
+        link = self.link
+
+        def on_checked_out(filepath: str):
+            if link:
+                link_collections(filepath)
+            else:
+                ops.wm.open_mainfile(  # type: ignore
+                    "EXEC_DEFAULT", filepath=filepath)
+
+        request_revision_file(revision_list[index]["hash"], on_checked_out)
+
+        return {"FINISHED"}
+
+
+class CloseRevision(Operator):
+    bl_idname = "blendgit.close_revision"
+    bl_label = "Back To Working Copy"
+    bl_description = "Reopen the file from the working tree"
+
+    def execute(self, context: Context):
+        preview = previewed_revision()
+        if preview is None:
+            return {"CANCELLED"}
+        # Previews are read-only, so unsaved changes are not kept
+        ops.wm.open_mainfile(  # type: ignore
+            "EXEC_DEFAULT", filepath=preview[1])
+
+        return {"FINISHED"}
+
+
+registry = [
+    OpenRevision,
+    CloseRevision,
+]
@@ -0,0 +1,230 @@
+import functools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+
+# Spans kept, older ones are dropped
+MAX_SPANS = 4096
+# Redraws whose git processes are counted
+MAX_REDRAWS = 200
+
+# Everything below is skipped while this is off, so the only cost left
+# is checking it
+enabled = False
+spans: Deque["Span"] = deque(maxlen=MAX_SPANS)
+redraws: Deque["Redraw"] = deque(maxlen=MAX_REDRAWS)
+_local = threading.local()
+# Functions that only pass commands on, skipped when naming the caller
+_forwarders: Set = set()
+_lock = threading.Lock()
+_epoch = time.perf_counter()
+
+
+class Redraw:
+    """Panels drawn in one redraw of the sidebar
+
+    Attributes:
+        panels: Panels drawn so far, a panel drawn again starts the next
+            redraw
+        draw_time: Seconds spent in draw()
+        spawns: Git processes started by the draws, including those of
+            the background jobs they submitted
+    """
+    __slots__ = ("start", "panels", "draw_time", "spawns")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.panels: List[str] = []
+        self.draw_time = 0.0
+        self.spawns = 0
+
+
+class Span:
+    """A traced git command or panel draw
+
+    Attributes:
+        category: "git" or "draw"
+        name: The git command, like "git status", or the panel
+        command: The whole command line
+        caller: Function that ran the command
+        job: Background job it ran in, empty on the main thread
+        start: Seconds since tracing was loaded
+        duration: Wall time in seconds
+        exit_code: Exit code of git, 0 for draws
+        output_bytes: Bytes git printed to stdout
+    """
+    __slots__ = ("category", "name", "command", "caller", "job", "thread",
+                 "start", "duration", "exit_code", "output_bytes", "redraw")
+
+    def __init__(self, category: str, name: str, caller: str,
+                 command: str = ""):
+        self.category = category
+        self.name = name
+        self.command = command
+        self.caller = caller
+        self.job: str = getattr(_local, "job", "")
+        self.thread = threading.get_ident()
+        self.redraw: Optional[Redraw] = getattr(_local, "redraw", None)
+        self.start = time.perf_counter() - _epoch
+        self.duration = 0.0
+        self.exit_code = 0
+        self.output_bytes = 0
+
+
+def set_enabled(value: bool):
+    global enabled
+    enabled = value
+
+
+def clear():
+    with _lock:
+        spans.clear()
+        redraws.clear()
+
+
+def forwarder(function: Callable) -> Callable:
+    """Marks a function that runs git for its caller, so spans name the
+    caller instead"""
+    _forwarders.add(function.__code__)
+    return function
+
+
+def caller_name(depth: int) -> str:
+    """Names the function depth frames above the caller, as file:function"""
+    frame = sys._getframe(depth + 1)
+    while frame.f_code in _forwarders and frame.f_back is not None:
+        frame = frame.f_back
+    return (f"{os.path.basename(frame.f_code.co_filename)}:"
+            f"{frame.f_code.co_name}")
+
+
+def start_git(args: List[str]) -> Span:
+    """Starts the span of a git command, called by the function running it
+
+    Args:
+        args: Arguments given to git
+    """
+    name = next((f"git {arg}" for arg in args if not arg.startswith("-")),
+                "git")
+    span = Span("git", name, caller_name(2), "git " + " ".join(args))
+    if span.redraw is not None:
+        with _lock:
+            span.redraw.spawns += 1
+    return span
+
+
+def finish(span: Span, exit_code: int = 0, output_bytes: int = 0):
+    span.duration = time.perf_counter() - _epoch - span.start
+    span.exit_code = exit_code
+    span.output_bytes = output_bytes
+    with _lock:
+        spans.append(span)
+
+
+def traced_draw(draw: Callable) -> Callable:
+    """Wraps a panel's draw() to time it and count the git processes it
+    causes"""
+    @functools.wraps(draw)
+    def wrapper(self, context):
+        if not enabled:
+            return draw(self, context)
+        name = self.bl_idname
+        with _lock:
+            redraw = redraws[-1] if redraws else None
+            if redraw is None or name in redraw.panels:
+                redraw = Redraw(time.perf_counter() - _epoch)
+                redraws.append(redraw)
+            redraw.panels.append(name)
+        _local.redraw = redraw
+        span = Span("draw", name, name)
+        try:
+            return draw(self, context)
+        finally:
+            _local.redraw = None
+            finish(span)
+            redraw.draw_time += span.duration
+
+    return wrapper
+
+
+def carry_origin(job: str, function: Callable) -> Callable:
+    """Wraps a background job, so the git processes it starts are counted
+    against the redraw that submitted it"""
+    redraw = getattr(_local, "redraw", None)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        _local.job = job
+        _local.redraw = redraw
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.job = ""
+            _local.redraw = None
+
+    return wrapper
+
+
+def top_offenders(category: str = "git",
+                  count: int = 5) -> List[Tuple[str, str, int, float]]:
+    """Sums the spans of a category by name and caller
+
+    Returns:
+        list: (name, caller, calls, total seconds), slowest first
+    """
+    totals: Dict[Tuple[str, str], List] = {}
+    with _lock:
+        recorded = list(spans)
+    for span in recorded:
+        if span.category != category:
+            continue
+        total = totals.setdefault((span.name, span.caller), [0, 0.0])
+        total[0] += 1
+        total[1] += span.duration
+    ranked = sorted(totals.items(), key=lambda item: item[1][1],
+                    reverse=True)
+    return [(name, caller, calls, seconds)
+            for (name, caller), (calls, seconds) in ranked[:count]]
+
+
+def spawns_per_redraw() -> Tuple[float, int]:
+    """Returns the mean and the most git processes of the recent redraws"""
+    with _lock:
+        counts = [redraw.spawns for redraw in redraws]
+    if not counts:
+        return 0.0, 0
+    return sum(counts) / len(counts), max(counts)
+
+
+def chrome_trace() -> Dict:
+    """Returns the spans as Chrome trace events, for chrome://tracing or
+    Perfetto"""
+    pid = os.getpid()
+    main_thread = threading.main_thread().ident
+    with _lock:
+        recorded = list(spans)
+    events = []
+    for thread in sorted({span.thread for span in recorded}):
+        events.append({
+            "name": "thread_name", "ph": "M", "pid": pid, "tid": thread,
+            "args": {"name": "main" if thread == main_thread
+                     else f"worker {thread}"}})
+    for span in recorded:
+        events.append({
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": round(span.start * 1e6, 3),
+            "dur": round(span.duration * 1e6, 3),
+            "pid": pid,
+            "tid": span.thread,
+            "args": {"command": span.command, "caller": span.caller,
+                     "job": span.job,
+                     "exit_code": span.exit_code,
+                     "output_bytes": span.output_bytes},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -3,11 +3,17 @@ from bpy.app import handlers
 
 from ..common import ui_refresh_for_handler
 
-from . import files, revisions
+from . import (autosave, datablocks, diagnostics, diff, files, revisions,
+               storage)
 
 modules = [
     files,
     revisions,
+    datablocks,
+    diff,
+    storage,
+    autosave,
+    diagnostics,
 ]
 
 
@@ -0,0 +1,50 @@
+from bpy.types import Context
+
+from ..common import check_repo_exists, get_blendgit, has_git
+from ..templates import ToolPanel
+from ..tools import autosave
+from ..tools.autosave import (AutosaveNow, RestoreAutosave,
+                              autosave_pending, request_snapshot_list)
+
+
+class AutosavePanel(ToolPanel):
+    """Panel that lists the autosave snapshots of the open file"""
+    bl_idname = "BLENDGIT_PT_autosave"
+    bl_label = "Autosave"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context: Context):
+        layout = self.layout
+
+        main_col = layout.column()
+        if not has_git() or not check_repo_exists():
+            main_col.label(text="No repository")
+            return
+
+        blendgit = get_blendgit()
+        main_col.prop(blendgit, "autosave")
+        row = main_col.row(align=True)
+        row.enabled = blendgit.autosave
+        row.prop(blendgit, "autosave_interval")
+        row.prop(blendgit, "autosave_keep")
+
+        row = main_col.row()
+        row.operator(AutosaveNow.bl_idname, icon="FILE_TICK")
+        if autosave_pending():
+            main_col.label(text="Saving snapshot...", icon="SORTTIME")
+
+        request_snapshot_list()
+        if not autosave.snapshots:
+            main_col.label(text="No snapshots yet")
+            return
+        box = main_col.box()
+        for snapshot in autosave.snapshots:
+            split = box.split(factor=0.7)
+            split.label(text=snapshot["date"])
+            split.operator(RestoreAutosave.bl_idname, text="",
+                           icon="RECOVER_LAST").commit = snapshot["hash"]
+
+
+registry = [
+    AutosavePanel,
+]
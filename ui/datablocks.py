@@ -0,0 +1,72 @@
+from typing import Any
+
+from bpy.types import Context, UILayout, UIList
+
+from ..templates import ToolPanel
+from ..tools.datablocks import (DATABLOCK_ICONS, ListRevisionDatablocks,
+                                PullDatablocks, datablocks_loading)
+from .revisions import RevisionsPanel
+
+
+class DatablockList(UIList):
+    bl_idname = "BLENDGIT_UL_datablock_list"
+    bl_label = "Datablock List"
+
+    def draw_item(self,
+                  context: Context | None,
+                  layout: UILayout,
+                  data: Any | None,
+                  item: Any | None,
+                  icon: int | None,
+                  active_data: Any,
+                  active_property: str | None,
+                  index: Any | None = 0,
+                  flt_flag: Any | None = 0):
+        if item is not None:
+            row = layout.row(align=True)
+            row.prop(item, "selected", text="")
+            row.label(text=item.name,
+                      icon=DATABLOCK_ICONS.get(item.id_type, "BLANK1"))
+
+
+class RevisionDatablocksPanel(ToolPanel):
+    """Panel that pulls datablocks out of a historic revision"""
+    bl_idname = "BLENDGIT_PT_revision_datablocks"
+    bl_label = "Pull Datablocks"
+    bl_parent_id = RevisionsPanel.bl_idname
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context: Context):
+        layout = self.layout
+        revision_props = context.window_manager.blendgit.revision_properties
+
+        main_col = layout.column()
+        main_col.operator(ListRevisionDatablocks.bl_idname, icon="VIEWZOOM")
+        if datablocks_loading():
+            main_col.label(text="Reading revision...", icon="SORTTIME")
+            return
+        if revision_props.datablock_error:
+            main_col.label(text=revision_props.datablock_error, icon="ERROR")
+            return
+        if not revision_props.datablock_source:
+            return
+
+        main_col.label(
+            text=f"Revision {revision_props.datablock_revision[:7]}")
+        main_col.template_list(DatablockList.bl_idname,
+                               "",
+                               revision_props,
+                               "datablock_list",
+                               revision_props,
+                               "datablock_list_index")
+        row = main_col.row()
+        row.operator(PullDatablocks.bl_idname, icon="APPEND_BLEND",
+                     text="Append").link = False
+        row.operator(PullDatablocks.bl_idname, icon="LINK_BLEND",
+                     text="Link").link = True
+
+
+registry = [
+    DatablockList,
+    RevisionDatablocksPanel,
+]
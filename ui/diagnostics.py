@@ -0,0 +1,53 @@
+from bpy.types import Context
+
+from .. import tracing
+from ..templates import ToolPanel
+from ..tools.diagnostics import ClearTrace, ExportTrace
+
+
+# Commands and panels listed, slowest first
+OFFENDER_ROWS = 5
+
+
+class DiagnosticsPanel(ToolPanel):
+    """Panel that shows what the sidebar spends its time on"""
+    bl_idname = "BLENDGIT_PT_diagnostics"
+    bl_label = "Blendgit Diagnostics"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context: Context):
+        layout = self.layout
+
+        main_col = layout.column()
+        main_col.prop(context.window_manager.blendgit, "tracing")
+        if not tracing.enabled and not tracing.spans:
+            return
+
+        mean, most = tracing.spawns_per_redraw()
+        main_col.label(text=f"{len(tracing.spans)} spans, "
+                            f"{mean:.1f} git processes per redraw "
+                            f"(up to {most})")
+
+        for category, title in (("git", "Git commands"),
+                                ("draw", "Panels")):
+            offenders = tracing.top_offenders(category, OFFENDER_ROWS)
+            if not offenders:
+                continue
+            main_col.label(text=title)
+            box = main_col.box()
+            for name, caller, calls, seconds in offenders:
+                split = box.split(factor=0.6)
+                split.label(text=name if category == "draw"
+                            else f"{name} ({caller})")
+                split = split.split(factor=0.4)
+                split.label(text=f"{calls}x")
+                split.label(text=f"{1000 * seconds:.1f} ms")
+
+        row = main_col.row(align=True)
+        row.operator(ExportTrace.bl_idname, icon="EXPORT")
+        row.operator(ClearTrace.bl_idname, text="", icon="TRASH")
+
+
+registry = [
+    DiagnosticsPanel,
+]
@@ -0,0 +1,98 @@
+from bpy.types import Context
+
+from ..common import check_repo_exists, has_git
+from ..templates import ToolPanel
+from ..tools import diff
+from ..tools.diff import DiffRevision, diff_pending
+from ..tools.storage import format_size
+
+
+# Datablocks listed per kind of change, largest changes first
+DIFF_ROWS = 15
+# Icons of the ID codes blend_diff.py reports
+ID_ICONS = {
+    "OB": "OBJECT_DATA",
+    "GR": "OUTLINER_COLLECTION",
+    "ME": "MESH_DATA",
+    "MA": "MATERIAL",
+    "NT": "NODETREE",
+    "IM": "IMAGE_DATA",
+    "TE": "TEXTURE",
+    "AC": "ACTION",
+    "AR": "ARMATURE_DATA",
+    "CU": "CURVE_DATA",
+    "CA": "CAMERA_DATA",
+    "LA": "LIGHT",
+    "WO": "WORLD",
+    "BR": "BRUSH_DATA",
+    "SC": "SCENE_DATA",
+}
+
+
+def format_delta(delta: int) -> str:
+    sign = "-" if delta < 0 else "+"
+    return sign + format_size(abs(delta))
+
+
+class RevisionDiffPanel(ToolPanel):
+    """Panel that compares the datablocks of two revisions"""
+    bl_idname = "BLENDGIT_PT_revision_diff"
+    bl_label = "Revision Diff"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context: Context):
+        layout = self.layout
+
+        main_col = layout.column()
+        if not has_git() or not check_repo_exists():
+            main_col.label(text="No repository")
+            return
+
+        row = main_col.row()
+        row.operator(DiffRevision.bl_idname, text="Against Parent",
+                     icon="TRIA_DOWN_BAR").against = "PARENT"
+        row.operator(DiffRevision.bl_idname, text="Against Current",
+                     icon="FILE_BLEND").against = "HEAD"
+        if diff_pending():
+            main_col.label(text="Comparing...", icon="SORTTIME")
+            return
+
+        result = diff.revision_diff
+        if not result:
+            return
+        if "error" in result:
+            main_col.label(text=result["error"] or "Comparison failed",
+                           icon="ERROR")
+            return
+
+        old_rev = result["old_rev"][:7]
+        new_rev = result["new_rev"][:7]
+        delta = result["new_size"] - result["old_size"]
+        main_col.label(text=f"{old_rev} to {new_rev}: {format_delta(delta)}")
+        main_col.label(text=f"{len(result['added'])} added, "
+                            f"{len(result['removed'])} removed, "
+                            f"{len(result['changed'])} changed, "
+                            f"{result['unchanged']} unchanged")
+
+        rows = [(name, size, "ADD") for name, size in result["added"]]
+        rows += [(name, -size, "REMOVE") for name, size in result["removed"]]
+        rows += [(name, new - old, "FILE_REFRESH")
+                 for name, old, new in result["changed"]]
+        if not rows:
+            return
+        rows.sort(key=lambda row: abs(row[1]), reverse=True)
+        box = main_col.box()
+        for name, delta, change_icon in rows[:DIFF_ROWS]:
+            code, _, id_name = name.partition(":")
+            split = box.split(factor=0.7)
+            row = split.row(align=True)
+            row.label(text="", icon=change_icon)
+            row.label(text=id_name, icon=ID_ICONS.get(code, "BLANK1"))
+            split.label(text=format_delta(delta))
+        if len(rows) > DIFF_ROWS:
+            box.label(text=f"{len(rows) - DIFF_ROWS} more")
+
+
+registry = [
+    RevisionDiffPanel,
+]
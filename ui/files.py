@@ -1,17 +1,111 @@
-from typing import Any
+import os
+from typing import Any, Dict, List
+from bpy.props import EnumProperty
 from bpy.types import Context, UILayout, UIList
 
+from .. import list_filter, list_sync
 from ..templates import ToolPanel
-from ..common import get_num_operations, has_git, needs_refresh
-from ..tools.files import refresh_files
-from ..tools.revisions import SaveCommit, StageAll, StageFile, ResetStaged
+from ..common import (get_blendgit, get_state_cache, get_work_dir, has_git,
+                      needs_refresh)
+from ..tools.files import files_refreshing, request_files_refresh
+from ..tools.commit import CancelCommit, commit_pending, commit_progress
+from ..tools.revisions import (DiscardFiles, ResetStaged, SaveCommit,
+                               SelectAllFiles, StageAll, StageFile,
+                               UnstageFiles)
 from ..tools.stash import Stash, StashPop
+from ..tools.worktrees import previewed_revision
 from ..tools.lfs import has_lfs
+from ..watcher import ensure_watching
+
+
+FILTER_STATUS_ITEMS = [
+    ("all", "All Statuses", "Show files whatever their status"),
+    ("modified", "Modified", "Show modified files"),
+    ("new", "New", "Show untracked files"),
+    ("added", "Added", "Show files added to the index"),
+    ("deleted", "Deleted", "Show deleted files"),
+    ("renamed", "Renamed", "Show renamed files"),
+]
 
 
 class GitFileList(UIList):
     bl_idname = "BLENDGIT_UL_file_list"
 
+    filter_status: EnumProperty(
+        name="Status",
+        items=FILTER_STATUS_ITEMS)
+
+    filter_staged: EnumProperty(
+        name="Staged",
+        items=[
+            ("all", "Staged Or Not", "Show staged and unstaged files"),
+            ("staged", "Staged", "Show staged files"),
+            ("unstaged", "Not Staged", "Show files not staged"),
+        ])
+
+    sort_by: EnumProperty(
+        name="Sort By",
+        items=[
+            ("path", "Path", "Sort files by path"),
+            ("status", "Status", "Sort files by status, then path"),
+            ("size", "Size", "Sort files by size, largest first"),
+        ])
+
+    def draw_filter(self, context: Context, layout: UILayout):
+        row = layout.row(align=True)
+        row.prop(self, "filter_name", text="")
+        row.prop(self, "use_filter_invert", text="", icon="ARROW_LEFTRIGHT")
+        row = layout.row(align=True)
+        row.prop(self, "filter_status", text="")
+        row.prop(self, "filter_staged", text="")
+        row = layout.row(align=True)
+        row.prop(self, "sort_by", expand=True)
+        row.prop(self, "use_filter_sort_reverse", text="",
+                 icon=("SORT_DESC" if self.use_filter_sort_reverse
+                       else "SORT_ASC"))
+
+    def filter_items(self, context: Context, data: Any, propname: str):
+        items = getattr(data, propname)
+        settings = (self.filter_name, self.use_filter_invert,
+                    self.filter_status, self.filter_staged, self.sort_by,
+                    len(items))
+        if self.sort_by == "size":
+            # Sizes change without the status of the files changing
+            settings += (get_state_cache().stored_signature("files"),)
+        return list_filter.cached("files", settings,
+                                  lambda: self.filter_files(items))
+
+    def filter_files(self, items) -> list_filter.Result:
+        """Computes the flags and order of the files, when they or the
+        filter changed"""
+        names = [item["name"] for item in items]
+        keep = None
+        if self.filter_status != "all" or self.filter_staged != "all":
+            staged = self.filter_staged == "staged"
+            keep = [(self.filter_status in ("all", item["status"]))
+                    and (self.filter_staged == "all"
+                         or bool(item["staged"]) == staged)
+                    for item in items]
+        flags = list_filter.filter_flags(names, self.filter_name,
+                                         self.bitflag_filter_item, keep,
+                                         self.use_filter_invert)
+
+        keys = None
+        if self.sort_by == "status":
+            keys = [(item["status"], name)
+                    for item, name in zip(items, names)]
+        elif self.sort_by == "size":
+            work_dir = get_work_dir()
+            keys = []
+            for name in names:
+                try:
+                    size = os.lstat(os.path.join(work_dir, name)).st_size
+                except OSError:
+                    # Deleted
+                    size = 0
+                keys.append(-size)
+        return flags, list_filter.sort_order(keys)
+
     def draw_item(self,
                   context: Context | None,
                   layout: UILayout,
@@ -34,7 +128,8 @@ class GitFileList(UIList):
             staged_ui = split.row(align=True)
             staged_ui.alignment = "CENTER"
 
-            filepath_ui.label(text=" " * 2 + item["name"])
+            filepath_ui.prop(item, "selected", text="")
+            filepath_ui.label(text=item["name"])
             status_ui.label(text=item["status"])
             staged_ui.label(text="",
                             icon=("CHECKMARK" if item["staged"] else "NONE"))
@@ -44,17 +139,18 @@ class GitFileBrowserPanel(ToolPanel):
     bl_idname = 'BLENDGIT_PT_file_browser'
     bl_label = 'Files'
 
-    def draw_files(self,
-                   context: Context):
-        blendgit = context.window_manager.blendgit
+    @staticmethod
+    def draw_files(files: List[Dict]):
+        blendgit = get_blendgit()
         file_props = blendgit.file_properties
-        files = refresh_files()
-        file_props.files_list.clear()
-        for entry in files:
-            file_entry = file_props.files_list.add()
-            file_entry["name"] = entry["file_path"]
-            file_entry["status"] = entry["status"]
-            file_entry["staged"] = entry["staged"]
+        rows = [(entry["file_path"], entry["status"], entry["staged"])
+                for entry in files]
+        # Files stay selected across refreshes
+        if list_sync.sync("files", file_props.files_list,
+                          ("name", "status", "staged"), rows,
+                          keep=("selected",), owner=file_props,
+                          index_prop="files_list_index"):
+            list_filter.changed("files")
 
     def draw(self, context: Context):
         layout = self.layout
@@ -87,9 +183,11 @@ class GitFileBrowserPanel(ToolPanel):
         staged_row = split.row()
         staged_row.label(text="Staged")
 
-        if len(file_props.files_list) == 0 or needs_refresh("files"):
-            blendgit.num_file_list_refreshes = get_num_operations()
-            self.draw_files(context)
+        ensure_watching()
+        if needs_refresh("files"):
+            request_files_refresh(callback=self.draw_files)
+        if files_refreshing():
+            main_col.label(text="Refreshing...", icon="SORTTIME")
 
         # Add the GitFileList to the panel
         list_row = main_col.row()
@@ -102,10 +200,21 @@ class GitFileBrowserPanel(ToolPanel):
 
         col = list_row.column()
 
+        # What is staged or committed in a preview worktree is lost
+        previewing = previewed_revision() is not None
+
         col.separator()
-        col.operator(StageFile.bl_idname, icon="ADD", text="")
-        col.operator(StageAll.bl_idname, icon="COLLECTION_NEW", text="")
-        col.operator(ResetStaged.bl_idname, icon="LOOP_BACK", text="")
+        col.operator(SelectAllFiles.bl_idname, icon="CHECKBOX_HLT", text="")
+        stage_col = col.column()
+        stage_col.enabled = not previewing
+        stage_col.operator(StageFile.bl_idname, icon="ADD", text="")
+        stage_col.operator(UnstageFiles.bl_idname, icon="REMOVE", text="")
+        stage_col.operator(DiscardFiles.bl_idname, icon="TRASH", text="")
+
+        stage_col.separator()
+        stage_col.operator(StageAll.bl_idname, icon="COLLECTION_NEW",
+                           text="")
+        stage_col.operator(ResetStaged.bl_idname, icon="LOOP_BACK", text="")
 
         col.separator()
         col.operator(Stash.bl_idname, icon="TRIA_DOWN_BAR", text="")
@@ -117,8 +226,18 @@ class GitFileBrowserPanel(ToolPanel):
         list_row.separator_spacer()
         list_row = main_col.row()
         list_row.operator(SaveCommit.bl_idname, icon="IMPORT")
+        list_row.enabled = not commit_pending() and not previewing
         list_row.separator_spacer()
         list_row.separator_spacer()
+        if commit_pending():
+            row = main_col.row(align=True)
+            row.label(text=f"{commit_progress['stage']}... "
+                           f"{commit_progress['done']:.0%}",
+                      icon="SORTTIME")
+            row.operator(CancelCommit.bl_idname, text="", icon="X")
+        elif commit_progress["error"]:
+            main_col.label(text=commit_progress["error"].splitlines()[-1],
+                           icon="ERROR")
 
 
 registry = [
@@ -1,19 +1,78 @@
 from typing import Any
 
+from bpy.props import EnumProperty
 from bpy.types import Context, UILayout, UIList
 
-from ..common import get_num_operations, needs_refresh, ui_refresh, working_dir_clean, has_git
+from .. import list_filter
+from ..common import check_repo_exists, needs_refresh, has_git
+from ..history import CommitStore
+from ..tools import prefetch
+from ..tools.prefetch import (CancelPrefetch, PrefetchRevisions,
+                              prefetch_cancelled, prefetch_candidates,
+                              prefetch_icon, prefetch_pending,
+                              request_prefetch)
+from ..tools.previews import request_thumbnails, revision_icon
+from ..tools import worktrees
+from ..tools.worktrees import (CloseRevision, OpenRevision,
+                               opening_revision, previewed_revision)
 from ..tools.stash import Stash
 from ..tools.lfs import has_lfs
 from ..templates import ToolPanel
-from ..tools.revisions import SaveCommit, refresh_revisions, LoadCommit, which_branch
+from ..watcher import ensure_watching
+from ..tools import revisions as git_revisions
+from ..tools.revisions import (SaveCommit, LoadCommit, RevisionPage,
+                               WINDOW_SIZE,
+                               materialize_revisions,
+                               request_revisions_refresh,
+                               request_search,
+                               revisions_refreshing,
+                               searching_revisions,
+                               which_branch)
 from ..tools.branches import SwitchToMainBranch
+from ..tools.files import files_refreshing
 
 
 class RevisionList(UIList):
     bl_idname = "BLENDGIT_UL_revision_list"
     bl_label = "Revision List"
 
+    sort_by: EnumProperty(
+        name="Sort By",
+        items=[
+            ("date", "Date", "Keep the order of the history"),
+            ("message", "Message", "Sort revisions by message"),
+        ])
+
+    def draw_filter(self, context: Context, layout: UILayout):
+        row = layout.row(align=True)
+        row.prop(self, "filter_name", text="")
+        row.prop(self, "use_filter_invert", text="", icon="ARROW_LEFTRIGHT")
+        row = layout.row(align=True)
+        row.prop(self, "sort_by", expand=True)
+        row.prop(self, "use_filter_sort_reverse", text="",
+                 icon=("SORT_DESC" if self.use_filter_sort_reverse
+                       else "SORT_ASC"))
+
+    def filter_items(self, context: Context, data: Any, propname: str):
+        # The items are only a window of the history, so the history is
+        # searched too and the items become its matches
+        request_search(self.filter_name, self.use_filter_invert)
+        items = getattr(data, propname)
+        settings = (self.filter_name, self.sort_by, len(items))
+        return list_filter.cached("revisions", settings,
+                                  lambda: self.filter_revisions(items))
+
+    def filter_revisions(self, items) -> list_filter.Result:
+        """Computes the flags and order of the revisions shown, matching
+        the filter text against their date, message and hash"""
+        names = [f"{item['date']} {item['message']} {item['hash']}"
+                 for item in items]
+        flags = list_filter.filter_flags(names, self.filter_name,
+                                         self.bitflag_filter_item)
+        keys = [item["message"].lower() for item in items] \
+            if self.sort_by == "message" else None
+        return flags, list_filter.sort_order(keys)
+
     def draw_item(self,
                   context: Context | None,
                   layout: UILayout,
@@ -28,7 +87,12 @@ class RevisionList(UIList):
             date = item["date"]
             message = item["message"]
             sep = " " * 5
-            layout.label(text=f"{date}{sep}{message}")
+            row = layout.row()
+            row.label(text=f"{date}{sep}{message}",
+                      icon_value=revision_icon(item["hash"]))
+            status_icon = prefetch_icon(item["hash"])
+            if status_icon != "NONE":
+                row.label(text="", icon=status_icon)
 
 
 class RevisionsPanel(ToolPanel):
@@ -36,6 +100,10 @@ class RevisionsPanel(ToolPanel):
     bl_idname = "BLENDGIT_PT_revision_history"
     bl_label = "Revision History"
 
+    @staticmethod
+    def draw_revisions(_history: CommitStore):
+        materialize_revisions(0)
+
     def draw(self, context: Context):
         layout = self.layout
         blendgit = context.window_manager.blendgit
@@ -48,18 +116,23 @@ class RevisionsPanel(ToolPanel):
         main_col.enabled = git_installed and lfs_installed
         if not git_installed:
             return
+        # Repositories are only created by operators, never while drawing
+        if not check_repo_exists():
+            main_col.label(text="No repository")
+            return
 
-        if len(revision_props.revision_list) == 0 \
-                or needs_refresh("revisions"):
-            blendgit.num_revision_list_refreshes = get_num_operations()
-            revisions = refresh_revisions()
-            revision_props.revision_list.clear()
-            for entry in revisions:
-                revision_entry = revision_props.revision_list.add()
-                revision_entry["date"] = entry["date"]
-                revision_entry["message"] = entry["message"]
-                revision_entry["hash"] = entry["hash"]
-            ui_refresh()
+        preview = previewed_revision()
+        if preview is not None:
+            box = main_col.box()
+            box.label(text=f"Previewing revision {preview[0][:7]} "
+                           "(changes are not kept)", icon="HIDE_OFF")
+            box.operator(CloseRevision.bl_idname, icon="LOOP_BACK")
+
+        ensure_watching()
+        if needs_refresh("revisions"):
+            request_revisions_refresh(callback=self.draw_revisions)
+        if revisions_refreshing() or files_refreshing():
+            main_col.label(text="Refreshing...", icon="SORTTIME")
 
         row = main_col.row()
         row.template_list(RevisionList.bl_idname,
@@ -68,26 +141,71 @@ class RevisionsPanel(ToolPanel):
                           "revision_list",
                           revision_props,
                           "revision_list_index")
-
+        revision_list = revision_props.revision_list
+        request_thumbnails([item["hash"] for item in revision_list])
+        request_prefetch(prefetch_candidates())
+        index = revision_props.revision_list_index
+        if 0 <= index < len(revision_list):
+            icon = revision_icon(revision_list[index]["hash"])
+            if icon:
+                main_col.template_icon(icon_value=icon, scale=6)
+
+        history = git_revisions.history
+        offset = revision_props.revision_offset
+        shown = len(revision_props.revision_list)
+        if searching_revisions():
+            main_col.label(text="Searching...", icon="SORTTIME")
+        if git_revisions.search_shown[0]:
+            more = "+" if git_revisions.search_truncated else ""
+            main_col.label(text=f"{shown}{more} matches "
+                                "in the whole history")
+        row = main_col.row(align=True)
+        row.enabled = not git_revisions.search_shown[0]
+        col = row.column(align=True)
+        col.enabled = offset > 0
+        col.operator(RevisionPage.bl_idname, icon="TRIA_LEFT",
+                     text="").older = False
+        total = f"{len(history)}{'' if history.complete else '+'}"
+        row.label(text=f"{offset + min(1, shown)}-{offset + shown} "
+                       f"of {total}")
+        col = row.column(align=True)
+        col.enabled = offset + WINDOW_SIZE < len(history) \
+            or not history.complete
+        col.operator(RevisionPage.bl_idname, icon="TRIA_RIGHT",
+                     text="").older = True
+
+        statuses = list(prefetch.prefetch_status.values())
+        if prefetch_pending():
+            row = main_col.row(align=True)
+            waiting = statuses.count("queued") + statuses.count("fetching")
+            row.label(text=f"Prefetching {waiting} revisions",
+                      icon="SORTTIME")
+            row.operator(CancelPrefetch.bl_idname, text="", icon="X")
+        elif prefetch_cancelled() or "failed" in statuses:
+            main_col.operator(PrefetchRevisions.bl_idname, icon="IMPORT")
+
+        row = main_col.row(align=True)
+        row.operator(OpenRevision.bl_idname, icon="HIDE_OFF").link = False
+        row.operator(OpenRevision.bl_idname, text="",
+                     icon="LINK_BLEND").link = True
+        if opening_revision():
+            main_col.label(text="Checking out revision...", icon="SORTTIME")
+        elif worktrees.open_error:
+            main_col.label(text=worktrees.open_error, icon="ERROR")
         row = main_col.row()
         row.operator(LoadCommit.bl_idname, icon="LOOP_BACK")
-        row.enabled = working_dir_clean()
+        row.enabled = blendgit.working_dir_is_clean and preview is None
         row = main_col.row()
         row.operator(SwitchToMainBranch.bl_idname,
                      icon="FILE_PARENT",
                      text="Switch To Main")
-        row.enabled = working_dir_clean()
+        row.enabled = blendgit.working_dir_is_clean and preview is None
 
         row = main_col.row()
-        if not blendgit.current_branch or needs_refresh("revisions"):
-            blendgit.current_branch = which_branch()
-            current_branch = blendgit.current_branch
-        else:
-            current_branch = blendgit.current_branch
         row.alignment = "CENTER"
-        row.label(text="Current Branch: " + current_branch)
+        row.label(text="Current Branch: " + which_branch())
 
-        if not working_dir_clean():
+        if not blendgit.working_dir_is_clean and preview is None:
             row = main_col.row()
             row.label(text="Must stash or commit before switching branch",
                       icon="INFO")
@@ -0,0 +1,136 @@
+from bpy.types import Context
+
+from ..common import check_repo_exists, has_git
+from ..templates import ToolPanel
+from ..tools import storage
+from ..tools import migrate
+from ..tools.migrate import (AnalyzeLfsMigration, CancelLfsMigration,
+                             MigrateToLfs, analysis_pending,
+                             migration_interrupted, migration_pending)
+from ..tools.storage import (EnableChunkedStorage,
+                             EnableDecompressedStorage, StorageReport,
+                             chunked_storage_enabled,
+                             decompressed_storage_enabled, format_size,
+                             storage_report_pending)
+
+
+# Most recent commits listed in the report
+REPORT_ROWS = 10
+
+
+class StoragePanel(ToolPanel):
+    """Panel that shows how .blend files are stored"""
+    bl_idname = "BLENDGIT_PT_storage"
+    bl_label = "Storage"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context: Context):
+        layout = self.layout
+
+        main_col = layout.column()
+        if not has_git() or not check_repo_exists():
+            main_col.label(text="No repository")
+            return
+
+        if not chunked_storage_enabled():
+            if decompressed_storage_enabled():
+                main_col.label(text="Decompressed .blend storage enabled",
+                               icon="CHECKMARK")
+            else:
+                main_col.operator(EnableDecompressedStorage.bl_idname,
+                                  icon="FILE_BLEND")
+            main_col.operator(EnableChunkedStorage.bl_idname,
+                              icon="MOD_EXPLODE")
+            return
+        main_col.label(text="Chunked .blend storage enabled",
+                       icon="CHECKMARK")
+
+        row = main_col.row()
+        row.operator(StorageReport.bl_idname, icon="INFO")
+        if storage_report_pending():
+            main_col.label(text="Measuring...", icon="SORTTIME")
+
+        rows = storage.report_rows
+        if not rows:
+            return
+        size = sum(row["size"] for row in rows)
+        stored = sum(row["stored"] for row in rows)
+        main_col.label(text=f"{format_size(stored)} stored for "
+                            f"{format_size(size)} of .blend history")
+        box = main_col.box()
+        for row in reversed(rows[-REPORT_ROWS:]):
+            split = box.split(factor=0.3)
+            split.label(text=row["date"])
+            split = split.split(factor=0.3)
+            split.label(text=f"{row['ratio']:.1f}x")
+            split.label(text=f"+{format_size(row['stored'])}")
+
+
+class LfsMigrationPanel(ToolPanel):
+    """Panel that moves binary files committed to git into LFS"""
+    bl_idname = "BLENDGIT_PT_lfs_migration"
+    bl_label = "LFS Migration"
+    bl_parent_id = StoragePanel.bl_idname
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context: Context):
+        layout = self.layout
+
+        main_col = layout.column()
+        if not has_git() or not check_repo_exists():
+            main_col.label(text="No repository")
+            return
+
+        if migration_pending():
+            state = migrate.migration
+            row = main_col.row(align=True)
+            row.label(text=f"Branch {state['done'] + 1} of "
+                           f"{max(state['total'], 1)}: {state['step']} "
+                           f"{state['fraction']:.0%}", icon="SORTTIME")
+            row.operator(CancelLfsMigration.bl_idname, text="", icon="X")
+            return
+
+        row = main_col.row(align=True)
+        row.operator(AnalyzeLfsMigration.bl_idname,
+                     icon="VIEWZOOM").everything = False
+        row.operator(AnalyzeLfsMigration.bl_idname, text="",
+                     icon="OUTLINER").everything = True
+        if migration_interrupted():
+            main_col.operator(MigrateToLfs.bl_idname, text="Resume Migration",
+                              icon="PLAY")
+        if analysis_pending():
+            main_col.label(text="Analyzing...", icon="SORTTIME")
+
+        result = migrate.analysis
+        if "error" in result:
+            main_col.label(text=result["error"], icon="ERROR")
+        elif result:
+            main_col.label(text=f"{result['count']} files, "
+                                f"{format_size(result['disk'])} of "
+                                f"{format_size(result['history_disk'])} "
+                                "could move to LFS")
+            box = main_col.box()
+            for pattern, entry in list(result["patterns"].items())[:5]:
+                split = box.split(factor=0.5)
+                split.label(text=pattern)
+                split.label(text=format_size(entry["disk"]))
+            if result["count"]:
+                row = main_col.row()
+                row.operator(MigrateToLfs.bl_idname,
+                             icon="EXPORT").everything = \
+                    len(result["refs"]) > 1
+
+        if migrate.migration.get("error"):
+            main_col.label(text=migrate.migration["error"], icon="ERROR")
+        report = migrate.migration.get("report")
+        if report:
+            main_col.label(text=f"History: {format_size(report['before'])} "
+                                f"to {format_size(report['after'])}, "
+                                f"{format_size(report['lfs'])} in LFS",
+                           icon="CHECKMARK")
+
+
+registry = [
+    StoragePanel,
+    LfsMigrationPanel,
+]
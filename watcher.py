@@ -0,0 +1,273 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Optional, Set
+
+import bpy
+
+from .cache import DEPENDENCIES, RepoStateCache
+from .common import get_blendgit, get_state_cache, get_work_dir, redraw_ui
+
+
+# Changes are held back until this long without new events...
+QUIET_PERIOD = 0.1
+# ...but never longer than this after the first one
+MAX_DELAY = 0.5
+POLL_INTERVAL = 0.5
+FLUSH_INTERVAL = 0.25
+MAX_WATCHES = 4096
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+              | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")
+
+ALL_KINDS = frozenset(DEPENDENCIES)
+GIT_FILE_KINDS = {
+    "HEAD": ALL_KINDS,
+    "index": frozenset({"files"}),
+    "packed-refs": frozenset({"revisions", "branches"}),
+}
+REF_KINDS = frozenset({"revisions", "branches"})
+
+active_watcher: Optional["Watcher"] = None
+_changes: "queue.SimpleQueue" = queue.SimpleQueue()
+
+
+class Watcher(threading.Thread):
+    """Base class for threads reporting repository changes
+
+    Subclasses call notify() with the cache kinds affected by a change.
+    Bursts are coalesced and handed to the main thread through _changes.
+    """
+
+    def __init__(self, cache: RepoStateCache):
+        super().__init__(name="blendgit-watcher", daemon=True)
+        self.cache = cache
+        self.stopping = threading.Event()
+        self._kinds: Set[str] = set()
+        self._first_event = 0.0
+        self._last_event = 0.0
+
+    def notify(self, kinds):
+        if not kinds:
+            return
+        now = time.monotonic()
+        if not self._kinds:
+            self._first_event = now
+        self._last_event = now
+        self._kinds.update(kinds)
+
+    def flush_due(self):
+        """Hands coalesced changes over once the burst has settled"""
+        if not self._kinds:
+            return
+        now = time.monotonic()
+        if now - self._last_event >= QUIET_PERIOD \
+                or now - self._first_event >= MAX_DELAY:
+            _changes.put((self.cache, frozenset(self._kinds)))
+            self._kinds.clear()
+
+    def stop(self):
+        self.stopping.set()
+
+
+class InotifyWatcher(Watcher):
+    """Watches the work tree and .git with Linux inotify"""
+
+    def __init__(self, cache: RepoStateCache):
+        super().__init__(cache)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"),
+                                use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, str] = {}
+        try:
+            self.add_tree(cache.work_dir)
+            self.add_watch(cache.git_dir)
+            if cache.common_dir != cache.git_dir:
+                self.add_watch(cache.common_dir)
+            self.add_tree(os.path.join(cache.common_dir, "refs"))
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def add_watch(self, path: str):
+        if len(self.watches) >= MAX_WATCHES:
+            raise OSError("Too many directories to watch")
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                         WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+        self.watches[wd] = path
+
+    def add_tree(self, path: str):
+        for dirpath, dirnames, _ in os.walk(path):
+            if ".git" in dirnames:
+                dirnames.remove(".git")
+            self.add_watch(dirpath)
+
+    def kinds_for(self, directory: str, name: str) -> Set[str]:
+        git_dir = self.cache.git_dir
+        common_dir = self.cache.common_dir
+        if directory == git_dir:
+            return GIT_FILE_KINDS.get(name, set())
+        elif directory == common_dir:
+            # Only refs are shared with the main repository
+            return REF_KINDS if name == "packed-refs" else set()
+        elif directory.startswith(common_dir + os.sep):
+            return REF_KINDS
+        return {"files"}
+
+    def handle(self, wd: int, mask: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            self.notify(ALL_KINDS)
+            return
+        directory = self.watches.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            del self.watches[wd]
+            return
+        if name.endswith(".lock"):
+            return
+        if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) \
+                and directory not in (self.cache.git_dir,
+                                      self.cache.common_dir):
+            try:
+                self.add_tree(os.path.join(directory, name))
+            except OSError:
+                self.notify(ALL_KINDS)
+        self.notify(self.kinds_for(directory, name))
+
+    def run(self):
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        try:
+            while not self.stopping.is_set():
+                timeout = QUIET_PERIOD if self._kinds else POLL_INTERVAL
+                if poller.poll(timeout * 1000):
+                    data = os.read(self.fd, 64 * 1024)
+                    offset = 0
+                    while offset < len(data):
+                        wd, mask, _, length = EVENT_HEADER.unpack_from(
+                            data, offset)
+                        offset += EVENT_HEADER.size
+                        name = data[offset:offset + length] \
+                            .rstrip(b"\0").decode("utf-8", "replace")
+                        offset += length
+                        self.handle(wd, mask, name)
+                self.flush_due()
+        finally:
+            os.close(self.fd)
+
+
+class PollingWatcher(Watcher):
+    """Compares stat signatures on a background thread
+
+    Used where inotify is unavailable or the tree has too many
+    directories. Only the files the cache depends on are checked.
+    """
+
+    def run(self):
+        signatures = {kind: self.cache.file_signature(kind)
+                      for kind in DEPENDENCIES}
+        while not self.stopping.wait(POLL_INTERVAL):
+            for kind in DEPENDENCIES:
+                signature = self.cache.file_signature(kind)
+                if signature != signatures[kind]:
+                    signatures[kind] = signature
+                    self.notify({kind})
+            # Polling already spaces events out, so hand them over now
+            self._last_event = 0.0
+            self.flush_due()
+
+
+def _flush() -> Optional[float]:
+    """Timer applying watcher changes on the main thread"""
+    changed = False
+    while True:
+        try:
+            cache, kinds = _changes.get_nowait()
+        except queue.Empty:
+            break
+        cache.mark_dirty(kinds)
+        changed = True
+    if changed:
+        redraw_ui()
+    if active_watcher is None:
+        return None
+    return FLUSH_INTERVAL
+
+
+def start_watching(work_dir: str) -> Watcher:
+    """Starts watching a repository, replacing any previous watcher"""
+    global active_watcher
+    stop_watching()
+    cache = get_state_cache(work_dir)
+    watcher: Watcher
+    try:
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        watcher = InotifyWatcher(cache)
+    except (OSError, AttributeError) as e:
+        logging.info(f"Falling back to polling for changes: {e}")
+        watcher = PollingWatcher(cache)
+    watcher.start()
+    cache.set_watched(True)
+    active_watcher = watcher
+    if not bpy.app.timers.is_registered(_flush):
+        bpy.app.timers.register(_flush, first_interval=FLUSH_INTERVAL,
+                                persistent=True)
+    return watcher
+
+
+def stop_watching():
+    global active_watcher
+    if active_watcher is None:
+        return
+    active_watcher.stop()
+    active_watcher.cache.set_watched(False)
+    active_watcher = None
+
+
+def ensure_watching():
+    """Keeps the watcher pointed at the repository of the open file"""
+    if not get_blendgit().watch_repository:
+        stop_watching()
+        return
+    work_dir = os.path.abspath(get_work_dir())
+    if active_watcher is not None \
+            and active_watcher.cache.work_dir == work_dir \
+            and active_watcher.is_alive():
+        return
+    start_watching(work_dir)
+
+
+def unregister():
+    stop_watching()
+    if bpy.app.timers.is_registered(_flush):
+        bpy.app.timers.unregister(_flush)